@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Script to execute the main function from src.benchmarks.pipeline_benchmark module.
+
+This script imports and executes the main function from src.benchmarks.pipeline_benchmark
+module, which benchmarks the data pipeline on a synthetic dataset.
+"""
+
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.benchmarks.pipeline_benchmark import main
+
+if __name__ == "__main__":
+    # Execute the main function from src.benchmarks.pipeline_benchmark module
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Throughput benchmark of the data pipeline.
+
+A synthetic dataset is generated with ShapeImageGenerator, then
+1. every stage of the per-sample dataset path (decode, RGB conversion, mask
+   encoding, normalisation, ToTensor, resize, whole __getitem__) is timed per sample,
+2. ISNDataModule's train loader is timed end-to-end for every combination of
+   worker count and batch size, including the batched transform stage.
+
+Results are written as JSON and/or CSV. Given a baseline JSON from an earlier run,
+stages that got slower and loaders that got slower by more than the tolerance are
+reported as regressions and the run exits with status 1.
+
+Run from the parent directory:
+    python scripts/run_benchmark.py --num_images 200 --workers 0 2 4 --batch_sizes 8 16
+"""
+
+import argparse
+import csv
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from torchvision import transforms
+
+from src.data.datamodule import ISNDataModule
+from src.data.dataset import ISNSet, ClassIndexLUT, one_hot_encode
+from src.data.loader_tuning import machine_key
+from src.data.normalization import EncoderNormalizer
+from src.data_preparation.dataset_generator import ShapeImageGenerator
+
+# ShapeImageGenerator masks: white rectangles on black
+CLASS_RGB_VALUES = [[255, 255, 255], [0, 0, 0]]
+
+
+def generate_dataset(data_dir, num_images, img_height, img_width, seed=0):
+    """
+    Generate a synthetic dataset and describe it like load_metadata does.
+
+    Args:
+    - data_dir (str): Directory to write 'images' and 'masks' to.
+    - num_images (int): Number of image/mask pairs.
+    - img_height (int): Height of the generated images.
+    - img_width (int): Width of the generated images.
+    - seed (int): Seed of the shape generator.
+
+    Returns:
+    - pd.DataFrame: image_id, split, image_path and mask_path of every pair.
+    """
+    generator = ShapeImageGenerator(
+        img_height=img_height,
+        img_width=img_width,
+        num_images=num_images,
+        image_dir=os.path.join(data_dir, "images"),
+        mask_dir=os.path.join(data_dir, "masks"),
+        seed=seed,
+    )
+    generator.generate_and_save_images_and_masks()
+    ids = [str(i) for i in range(1, num_images + 1)]
+    return pd.DataFrame(
+        {
+            "image_id": ids,
+            "split": "experiment",
+            "image_path": [os.path.join(generator.image_dir, f"{i}_image.png") for i in ids],
+            "mask_path": [os.path.join(generator.mask_dir, f"{i}_mask.png") for i in ids],
+        }
+    )
+
+
+def _time_ms(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - start) * 1000
+
+
+def time_stages(df, img_size, normalizer, num_samples=50):
+    """
+    Time every stage of the per-sample dataset path.
+
+    Args:
+    - df (pd.DataFrame): Dataset description from generate_dataset.
+    - img_size (tuple): (height, width) the samples are resized to.
+    - normalizer (EncoderNormalizer): Encoder normalisation used as preprocess_fn.
+    - num_samples (int): Number of samples to time.
+
+    Returns:
+    - dict: Stage name to {"mean_ms", "median_ms"} per sample.
+    """
+    to_tensor = transforms.ToTensor()
+    resize = transforms.Resize(size=img_size)
+    class_lut = ClassIndexLUT(CLASS_RGB_VALUES)
+    datasets = {
+        f"getitem_{mask_mode}": ISNSet(
+            df,
+            transform=to_tensor,
+            preprocess_fn=normalizer,
+            class_rgb_values=CLASS_RGB_VALUES,
+            mask_mode=mask_mode,
+            img_size=img_size,
+        )
+        for mask_mode in ("onehot", "index")
+    }
+    times = {}
+
+    def record(name, ms):
+        times.setdefault(name, []).append(ms)
+
+    for idx in range(min(num_samples, len(df))):
+        img, ms = _time_ms(lambda path: Image.open(path).copy(), df["image_path"].iloc[idx])
+        record("open_decode_image", ms)
+        mask, ms = _time_ms(lambda path: Image.open(path).copy(), df["mask_path"].iloc[idx])
+        record("open_decode_mask", ms)
+        img, ms = _time_ms(lambda im: np.array(im.convert("RGB")), img)
+        record("convert_rgb_image", ms)
+        rgb_mask, ms = _time_ms(lambda im: np.array(im.convert("RGB")), mask)
+        record("convert_rgb_mask", ms)
+        _, ms = _time_ms(one_hot_encode, rgb_mask, CLASS_RGB_VALUES)
+        record("one_hot_encode", ms)
+        _, ms = _time_ms(class_lut, np.array(mask))
+        record("class_index_lut", ms)
+        normalised, ms = _time_ms(normalizer, img)
+        record("preprocess_fn", ms)
+        tensor, ms = _time_ms(to_tensor, normalised)
+        record("to_tensor", ms)
+        _, ms = _time_ms(resize, tensor)
+        record("resize", ms)
+        for name, dataset in datasets.items():
+            _, ms = _time_ms(dataset.__getitem__, idx)
+            record(name, ms)
+
+    return {
+        name: {
+            "mean_ms": round(statistics.mean(values), 4),
+            "median_ms": round(statistics.median(values), 4),
+        }
+        for name, values in times.items()
+    }
+
+
+def time_loaders(df, img_size, normalizer, worker_counts, batch_sizes, num_batches=20):
+    """
+    Time ISNDataModule's train loader end-to-end, batched transform stage included.
+
+    Args:
+    - df (pd.DataFrame): Dataset description from generate_dataset.
+    - img_size (tuple): (height, width) of the model input.
+    - normalizer (EncoderNormalizer): Encoder normalisation.
+    - worker_counts (list): num_workers values to try.
+    - batch_sizes (list): Batch sizes to try.
+    - num_batches (int): Batches timed per configuration, after one start-up batch.
+
+    Returns:
+    - list: One {"num_workers", "batch_size", "samples_per_sec"} dict per configuration.
+    """
+    results = []
+    empty_df = df.iloc[:0]
+    for batch_size in batch_sizes:
+        for num_workers in worker_counts:
+            data_module = ISNDataModule(
+                df,
+                empty_df,
+                empty_df,
+                batch_size,
+                img_size,
+                normalizer,
+                CLASS_RGB_VALUES,
+                mask_mode="index",
+                batch_transforms=True,
+                num_workers=num_workers,
+            )
+            data_module.setup()
+            samples = 0
+            start = None
+            step = 0
+            # cycle through epochs until enough batches have been timed
+            while step <= num_batches:
+                for batch in data_module.train_dataloader():
+                    imgs, _ = data_module.on_after_batch_transfer(batch, 0)
+                    if start is None:
+                        start = time.perf_counter()
+                    else:
+                        samples += len(imgs)
+                    step += 1
+                    if step > num_batches:
+                        break
+            rate = samples / (time.perf_counter() - start)
+            print(f"{num_workers} workers, batch {batch_size}: {rate:.1f} samples/s")
+            results.append(
+                {
+                    "num_workers": num_workers,
+                    "batch_size": batch_size,
+                    "samples_per_sec": round(rate, 2),
+                }
+            )
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    """
+    Find stages and loader configurations that got slower than in a baseline run.
+
+    Args:
+    - results (dict): Results of the current run.
+    - baseline (dict): Results of the baseline run.
+    - tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+    - list: Human-readable description of every regression.
+    """
+    regressions = []
+    for name, stats in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if old and stats["median_ms"] > old["median_ms"] * (1 + tolerance):
+            regressions.append(
+                f"stage {name}: {old['median_ms']:.3f} ms -> {stats['median_ms']:.3f} ms"
+            )
+    old_loaders = {
+        (row["num_workers"], row["batch_size"]): row["samples_per_sec"]
+        for row in baseline.get("loaders", [])
+    }
+    for row in results["loaders"]:
+        old = old_loaders.get((row["num_workers"], row["batch_size"]))
+        if old and row["samples_per_sec"] < old * (1 - tolerance):
+            regressions.append(
+                f"loader {row['num_workers']} workers, batch {row['batch_size']}: "
+                f"{old:.1f} -> {row['samples_per_sec']:.1f} samples/s"
+            )
+    return regressions
+
+
+def write_csv(results, csv_path):
+    """
+    Write the results as flat (section, name, metric, value) rows.
+
+    Args:
+    - results (dict): Benchmark results.
+    - csv_path (str): Output CSV path.
+    """
+    with open(csv_path, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["section", "name", "metric", "value"])
+        for name, stats in results["stages"].items():
+            for metric, value in stats.items():
+                writer.writerow(["stage", name, metric, value])
+        for row in results["loaders"]:
+            name = f"workers={row['num_workers']},batch={row['batch_size']}"
+            writer.writerow(["loader", name, "samples_per_sec", row["samples_per_sec"]])
+
+
+def main():
+    """Generate the synthetic dataset, run the benchmarks and report."""
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline.")
+    parser.add_argument("--num_images", type=int, default=200, help="Synthetic dataset size.")
+    parser.add_argument("--img_height", type=int, default=256, help="Generated image height.")
+    parser.add_argument("--img_width", type=int, default=256, help="Generated image width.")
+    parser.add_argument(
+        "--img_size", type=int, nargs=2, default=[224, 224], help="Model input height width."
+    )
+    parser.add_argument(
+        "--encoder", type=str, default="efficientnet-b2", help="Encoder for the normalisation."
+    )
+    parser.add_argument(
+        "--stage_samples", type=int, default=50, help="Samples timed per dataset stage."
+    )
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[0, 2, 4], help="Worker counts to time."
+    )
+    parser.add_argument(
+        "--batch_sizes", type=int, nargs="+", default=[8], help="Batch sizes to time."
+    )
+    parser.add_argument(
+        "--num_batches", type=int, default=20, help="Batches timed per loader configuration."
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        default=None,
+        help="Directory for the synthetic dataset, a temporary directory by default.",
+    )
+    parser.add_argument("--output", type=str, default=None, help="Path of the JSON results.")
+    parser.add_argument("--csv", type=str, default=None, help="Path of the CSV results.")
+    parser.add_argument(
+        "--baseline", type=str, default=None, help="JSON results of a run to compare with."
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed relative slowdown (0.2 = 20%%)."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic dataset.")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df = generate_dataset(
+            args.data_dir or tmp_dir, args.num_images, args.img_height, args.img_width, args.seed
+        )
+        img_size = tuple(args.img_size)
+        normalizer = EncoderNormalizer.from_encoder(args.encoder)
+        results = {
+            "machine": machine_key(),
+            "config": vars(args),
+            "stages": time_stages(df, img_size, normalizer, args.stage_samples),
+            "loaders": time_loaders(
+                df, img_size, normalizer, args.workers, args.batch_sizes, args.num_batches
+            ),
+        }
+
+    for name, stats in results["stages"].items():
+        print(f"{name:>20}: {stats['median_ms']:8.3f} ms median, {stats['mean_ms']:8.3f} ms mean")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.csv:
+        write_csv(results, args.csv)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("machine") != results["machine"]:
+            print(f"Warning: baseline was recorded on {baseline.get('machine')}.")
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
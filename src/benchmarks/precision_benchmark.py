@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Step time and accuracy of the precision and memory-format modes on CPU.
+
+Every mode (fp32, bf16 autocast, channels_last and bf16 + channels_last) trains a
+UNet++ from the same initial weights on the same procedural batches, the way
+SegmentationModel does under Lightning with PRECISION "bf16-mixed" and
+CHANNELS_LAST. The median training step time is reported, and after training the
+models are evaluated on the same held-out batches: the metric deltas and the largest
+output difference against fp32 show what the faster modes cost in accuracy.
+
+Results are written as JSON and/or CSV.
+
+Run from the parent directory:
+    python scripts/run_precision_benchmark.py --steps 10 --batch_size 8
+"""
+
+import argparse
+import csv
+import json
+import statistics
+import time
+from contextlib import nullcontext
+
+import segmentation_models_pytorch as smp
+import torch
+from torch import nn
+from torch.utils.data import default_collate
+from torchvision import transforms
+
+from src.constants import IGNORE_INDEX
+from src.data.loader_tuning import machine_key
+from src.data.normalization import EncoderNormalizer
+from src.data.procedural_dataset import ProceduralShapeSet
+from src.models.segmentation_model import SegmentationModel
+from src.utils.metrics import compute_metrics
+
+# ProceduralShapeSet masks: white rectangles on black
+CLASS_RGB_VALUES = [[255, 255, 255], [0, 0, 0]]
+MODES = {
+    "fp32": {"bf16": False, "channels_last": False},
+    "bf16": {"bf16": True, "channels_last": False},
+    "channels_last": {"bf16": False, "channels_last": True},
+    "bf16_channels_last": {"bf16": True, "channels_last": True},
+}
+
+
+def make_batches(img_size, normalizer, batch_size, num_batches, seed):
+    """
+    Collate batches of procedural samples.
+
+    Args:
+    - img_size (tuple): (height, width) of the samples.
+    - normalizer (EncoderNormalizer): Encoder normalisation used as preprocess_fn.
+    - batch_size (int): Samples per batch.
+    - num_batches (int): Number of batches.
+    - seed (int): Seed of the sample stream.
+
+    Returns:
+    - list: (images, class index masks) batches.
+    """
+    dataset = ProceduralShapeSet(
+        length=batch_size * num_batches,
+        seed=seed,
+        transform=transforms.ToTensor(),
+        preprocess_fn=normalizer,
+        class_rgb_values=CLASS_RGB_VALUES,
+        mask_mode="index",
+        img_size=img_size,
+    )
+    return [
+        default_collate([dataset[i] for i in range(start, start + batch_size)])
+        for start in range(0, len(dataset), batch_size)
+    ]
+
+
+def run_mode(initial_state, encoder, train_batches, eval_batches, bf16, channels_last, lr, warmup):
+    """
+    Train one mode from the shared initial weights and evaluate it.
+
+    Args:
+    - initial_state (dict): State dict every mode starts from.
+    - encoder (str): Encoder of the UNet++.
+    - train_batches (list): Training batches, the first warmup steps are not timed.
+    - eval_batches (list): Held-out batches.
+    - bf16 (bool): Run forward and loss under bfloat16 autocast.
+    - channels_last (bool): channels_last weights and batches.
+    - lr (float): Learning rate.
+    - warmup (int): Untimed steps at the start.
+
+    Returns:
+    - tuple: (step times in ms, metrics on eval_batches, float32 probabilities on
+      eval_batches).
+    """
+    net = smp.UnetPlusPlus(
+        encoder_name=encoder, encoder_weights=None, in_channels=3, classes=len(CLASS_RGB_VALUES)
+    )
+    net.load_state_dict(initial_state)
+    model = SegmentationModel(
+        net,
+        nn.CrossEntropyLoss(ignore_index=IGNORE_INDEX),
+        lr,
+        activation="softmax2d",
+        channels_last=channels_last,
+    )
+    optimizer = model.configure_optimizers()[0]
+
+    def autocast():
+        return torch.autocast("cpu", dtype=torch.bfloat16) if bf16 else nullcontext()
+
+    def to_memory_format(imgs):
+        # what ISNDataModule(channels_last=True) delivers
+        return imgs.contiguous(memory_format=torch.channels_last) if channels_last else imgs
+
+    model.train()
+    step_ms = []
+    for step, (imgs, labels) in enumerate(train_batches):
+        start = time.perf_counter()
+        optimizer.zero_grad()
+        with autocast():
+            loss = model.loss(model(to_memory_format(imgs)), labels.long())
+        loss.backward()
+        optimizer.step()
+        if step >= warmup:
+            step_ms.append((time.perf_counter() - start) * 1000)
+
+    model.eval()
+    outputs = []
+    with torch.no_grad(), autocast():
+        for imgs, _ in eval_batches:
+            outputs.append(model.predict_proba(to_memory_format(imgs)).float())
+    outputs = torch.cat(outputs)
+    labels = torch.cat([labels for _, labels in eval_batches])
+    metrics = {name: float(value) for name, value in compute_metrics(outputs, labels).items()}
+    return step_ms, metrics, outputs
+
+
+def run_benchmark(img_size, encoder, batch_size, steps, warmup, eval_batches, lr, modes, seed):
+    """
+    Run every mode and compare it to fp32.
+
+    Args:
+    - img_size (tuple): (height, width) of the model input.
+    - encoder (str): Encoder of the UNet++.
+    - batch_size (int): Samples per batch.
+    - steps (int): Timed training steps per mode.
+    - warmup (int): Untimed training steps per mode before the timed ones.
+    - eval_batches (int): Held-out batches for the accuracy comparison.
+    - lr (float): Learning rate.
+    - modes (list): Names of MODES to run, fp32 is always run as the reference.
+    - seed (int): Seed of the initial weights and the samples.
+
+    Returns:
+    - list: One result dict per mode.
+    """
+    normalizer = EncoderNormalizer.from_encoder(encoder)
+    train = make_batches(img_size, normalizer, batch_size, warmup + steps, seed)
+    held_out = make_batches(img_size, normalizer, batch_size, eval_batches, seed + 1)
+    torch.manual_seed(seed)
+    initial_state = smp.UnetPlusPlus(
+        encoder_name=encoder, encoder_weights=None, in_channels=3, classes=len(CLASS_RGB_VALUES)
+    ).state_dict()
+
+    results = []
+    reference = None
+    for name in ["fp32"] + [mode for mode in modes if mode != "fp32"]:
+        step_ms, metrics, outputs = run_mode(
+            initial_state, encoder, train, held_out, lr=lr, warmup=warmup, **MODES[name]
+        )
+        result = {
+            "mode": name,
+            "median_step_ms": round(statistics.median(step_ms), 2),
+            "mean_step_ms": round(statistics.mean(step_ms), 2),
+            **{metric: round(value, 5) for metric, value in metrics.items()},
+        }
+        if reference is None:
+            reference = result, outputs
+        else:
+            ref_result, ref_outputs = reference
+            result["speedup"] = round(ref_result["median_step_ms"] / result["median_step_ms"], 3)
+            for metric in metrics:
+                result[f"{metric}_delta"] = round(result[metric] - ref_result[metric], 5)
+            result["max_output_diff"] = round(float((outputs - ref_outputs).abs().max()), 5)
+        results.append(result)
+        print(
+            f"{name:>20}: {result['median_step_ms']:9.2f} ms/step, "
+            f"speedup {result.get('speedup', 1.0):5.2f}x, iou {result['iou_score']:.4f}"
+            + (f" ({result['iou_score_delta']:+.4f})" if "iou_score_delta" in result else "")
+        )
+    return results
+
+
+def write_csv(results, csv_path):
+    """
+    Write the results as flat (mode, metric, value) rows.
+
+    Args:
+    - results (dict): Benchmark results.
+    - csv_path (str): Output CSV path.
+    """
+    with open(csv_path, mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["mode", "metric", "value"])
+        for row in results["modes"]:
+            for metric, value in row.items():
+                if metric != "mode":
+                    writer.writerow([row["mode"], metric, value])
+
+
+def main():
+    """Run the precision benchmark and report."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark bf16 autocast and channels_last training on CPU."
+    )
+    parser.add_argument(
+        "--img_size", type=int, nargs=2, default=[224, 224], help="Model input height width."
+    )
+    parser.add_argument(
+        "--encoder", type=str, default="efficientnet-b2", help="Encoder of the UNet++."
+    )
+    parser.add_argument("--batch_size", type=int, default=8, help="Samples per batch.")
+    parser.add_argument("--steps", type=int, default=10, help="Timed training steps per mode.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed steps per mode.")
+    parser.add_argument(
+        "--eval_batches", type=int, default=4, help="Held-out batches for the accuracy delta."
+    )
+    parser.add_argument("--lr", type=float, default=0.001, help="Learning rate.")
+    parser.add_argument(
+        "--modes",
+        type=str,
+        nargs="+",
+        choices=list(MODES),
+        default=list(MODES),
+        help="Modes to run, fp32 always runs as the reference.",
+    )
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads.")
+    parser.add_argument("--output", type=str, default=None, help="Path of the JSON results.")
+    parser.add_argument("--csv", type=str, default=None, help="Path of the CSV results.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of weights and samples.")
+
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    results = {
+        "machine": machine_key(),
+        "config": vars(args),
+        "modes": run_benchmark(
+            tuple(args.img_size),
+            args.encoder,
+            args.batch_size,
+            args.steps,
+            args.warmup,
+            args.eval_batches,
+            args.lr,
+            args.modes,
+            args.seed,
+        ),
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.csv:
+        write_csv(results, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,7 +17,7 @@ ENCODER = "efficientnet-b2"
 ENCODER_WEIGHTS = "imagenet"
 CHANNELS = 3
 CLASSES = 2  # including background
-ACTIVATION = "sigmoid"
+ACTIVATION = "softmax2d"  # probabilities of the CrossEntropyLoss logits, for inference only
 LR = 0.001
 BATCH_SIZE = 8
 IMG_SIZE = (224, 224)
@@ -28,9 +28,30 @@ DEVICE, NUM_DEVICES = (
 )
 WORKERS = mp.cpu_count()
 EPOCHS = 3
+METRIC_EVERY_N_STEPS = 1  # training batches counted for the epoch metrics, every Nth
+PRECISION = "32-true"  # Lightning precision, "bf16-mixed" for bfloat16 autocast (also on CPU)
+CHANNELS_LAST = False  # NHWC weights and batches, fastest with bf16 on CPU
+COMPILE = False  # run the network through torch.compile (static IMG_SIZE batches)
+COMPILE_CACHE_DIR = "./working/compile_cache"  # compiled graphs kept across runs
+COMPILE_BENCHMARK_STEPS = 3  # forward passes timed eager vs compiled once, 0 disables
+FOLD = None  # cross-validation fold to validate on, None for the fixed valid subset
 OUTPUT_DIR = "./working"
 DATA_DIR = "./data/preprocessed"
 CHECKPOINT_DIR = './working/savedckpt/'
+DATA_BACKEND = "png"  # "png", "packed" (dataset_packer.py), "shards" (shard_writer.py) or "procedural"
+PACKED_DIR = "./data/packed"
+PACKED_SPLIT = None  # packed split used without metadata.csv (dataset_generator.py --binary_dir), e.g. "generated"
+SHARD_DIR = "./data/shards"
+PROCEDURAL_SAMPLES = (10000, 1000, 1000)  # generated train samples per epoch, valid, test
+PROCEDURAL_SEED = 0
+MASK_MODE = "index"  # "index" (uint8 class maps) or "onehot" (float64 one-hot masks)
+BITMASKS = False  # read 1-bit binary masks (dataset_preprocessing.py --bitmasks)
+INPUT_DTYPE = "float32"  # normalised image dtype, "float32" or "float16" (cast to the model dtype outside autocast)
+BATCH_TRANSFORMS = True  # resize/normalise once per batch after the device transfer
+CACHE_BYTES = 0  # shared-memory decoded sample cache budget, e.g. 512 * 1024**2; 0 disables
+LOADER_AUTOTUNE = False  # time worker/prefetch settings per loader on first run
+LOADER_TUNING_FILE = "./working/loader_tuning.json"  # autotuned settings, per machine
+EXCLUDE_INVALID = False  # drop pairs rejected by integrity_checker.py (integrity.csv)
 
 
 def main():
@@ -13,11 +13,17 @@ import os
 
 DATA_DIR = "./data/preprocessed"
 CLASS_DICT_FILE = os.path.join(DATA_DIR, "class_dict.csv")
+IGNORE_INDEX = 255  # class index of mask colours missing from class_dict.csv
+NATIVE_RESOLUTION = "native"  # metadata.csv resolution of the original (not pre-resized) files
+SPLIT_RATIOS = (0.8, 0.1, 0.1)  # train, valid, test fractions of the experiment split
+NUM_FOLDS = 5  # cross-validation folds over train + valid, see src/data/splits.py
 
 
 def main():
     print(f"Data directory: {DATA_DIR}")
     print(f"Class dictionary file: {CLASS_DICT_FILE}")
+    print(f"Ignored class index: {IGNORE_INDEX}")
+    print(f"Split ratios: {SPLIT_RATIOS}, folds: {NUM_FOLDS}")
 
 
 if __name__ == "__main__":
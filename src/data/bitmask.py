@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Bit-packed storage for binary masks (1 bit per pixel).
+
+A '.bits' file holds an 8-byte header with the mask height and width as
+little-endian uint32, followed by np.packbits of the flattened mask. Set bits are
+foreground (white in the PNG masks), cleared bits background (black). Decoding is
+one np.unpackbits call, no PNG decoder involved.
+
+Functions:
+- encode_bitmask(mask): Pack a binary mask into the '.bits' byte layout.
+- decode_bitmask(data): Unpack '.bits' bytes into a 0/1 mask.
+- save_bitmask(path, mask): Write a binary mask as a '.bits' file.
+- load_bitmask(path): Read the raw bytes of a '.bits' file.
+- bitmask_path(mask_path): '.bits' path next to a PNG mask.
+"""
+
+import os
+
+import numpy as np
+
+BITMASK_EXT = ".bits"
+HEADER_BYTES = 8
+
+
+def bitmask_path(mask_path):
+    """Path of the '.bits' file stored next to a PNG mask."""
+    return os.path.splitext(mask_path)[0] + BITMASK_EXT
+
+
+def encode_bitmask(mask):
+    """
+    Pack a binary mask.
+
+    Args:
+    - mask (np.ndarray): Mask of shape (H, W), any non-zero value is foreground.
+
+    Returns:
+    - np.ndarray: uint8 buffer, header followed by the packed bits.
+    """
+    if mask.ndim != 2:
+        raise ValueError(f"Bit-packed masks must be 2D, got shape {mask.shape}.")
+    header = np.array(mask.shape, dtype="<u4").view(np.uint8)
+    return np.concatenate([header, np.packbits(mask.reshape(-1) != 0)])
+
+
+def decode_bitmask(data):
+    """
+    Unpack a bit-packed mask.
+
+    Args:
+    - data (np.ndarray or bytes): Buffer as returned by encode_bitmask/load_bitmask.
+
+    Returns:
+    - np.ndarray: uint8 mask of shape (H, W) with values 0 and 1.
+    """
+    data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, bytes) else data
+    height, width = data[:HEADER_BYTES].view("<u4")
+    bits = np.unpackbits(data[HEADER_BYTES:], count=int(height) * int(width))
+    return bits.reshape(int(height), int(width))
+
+
+def save_bitmask(path, mask):
+    """
+    Write a binary mask as a '.bits' file.
+
+    Args:
+    - path (str): Output path.
+    - mask (np.ndarray): Mask of shape (H, W), any non-zero value is foreground.
+    """
+    encode_bitmask(mask).tofile(path)
+
+
+def load_bitmask(path):
+    """
+    Read a '.bits' file without unpacking it.
+
+    Args:
+    - path (str): Path of the '.bits' file.
+
+    Returns:
+    - np.ndarray: uint8 buffer to pass to decode_bitmask.
+    """
+    return np.fromfile(path, dtype=np.uint8)
+
+
+def main():
+    print("Bit-packed mask format is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
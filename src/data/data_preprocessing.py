@@ -18,47 +18,150 @@ class names and RGB values.
 """
 
 import os
+import numpy as np
 import pandas as pd
 
-from src.constants import DATA_DIR, CLASS_DICT_FILE
+from src.constants import DATA_DIR, CLASS_DICT_FILE, NATIVE_RESOLUTION
+from src.data.metadata_index import METADATA_INDEX_DIR, MANIFEST_FILE, MetadataIndex
+from src.data.packed_store import packed_paths
+from src.data.splits import add_split_columns
 
 
-def load_metadata(data_dir):
+def resolution_name(img_size):
+    """
+    Name of a pre-resized variant as stored in the metadata 'resolution' column.
+
+    Args:
+    - img_size (tuple): (height, width) of the variant.
+
+    Returns:
+    - str: Resolution name, e.g. '224x224'.
+    """
+    return f"{img_size[0]}x{img_size[1]}"
+
+
+def select_resolution(df, img_size=None):
+    """
+    Keep one row per image: its pre-resized copy matching img_size when metadata has
+    one, the original file otherwise. The fallback is per image, since
+    dataset_preprocessing.py --resize writes no copy of images that already have the
+    size, and of a dataset with mixed source sizes only some images get one.
+
+    Args:
+    - df (pd.DataFrame): Metadata, optionally with a 'resolution' column.
+    - img_size (tuple): Wanted (height, width), or None for the original files.
+
+    Returns:
+    - pd.DataFrame: Metadata with one row per split and image_id.
+    """
+    if "resolution" not in df.columns:
+        return df
+    native = df["resolution"] == NATIVE_RESOLUTION
+    resolution = resolution_name(img_size) if img_size else NATIVE_RESOLUTION
+    if resolution == NATIVE_RESOLUTION:
+        return df[native]
+    variant = df["resolution"] == resolution
+    keys = pd.MultiIndex.from_arrays([df["split"], df["image_id"].astype(str)])
+    has_variant = keys.isin(keys[variant.to_numpy()])
+    return df[variant | (native & ~has_variant)]
+
+
+def _index_is_current(data_dir):
+    manifest_path = os.path.join(data_dir, METADATA_INDEX_DIR, MANIFEST_FILE)
+    metadata_path = os.path.join(data_dir, "metadata.csv")
+    return os.path.exists(manifest_path) and (
+        not os.path.exists(metadata_path)
+        or os.path.getmtime(manifest_path) >= os.path.getmtime(metadata_path)
+    )
+
+
+def load_metadata(data_dir, img_size=None, split="experiment"):
     """
     Load metadata from a CSV file located in the specified data directory.
 
+    The columnar index written by metadata_generator.py is used instead of the CSV when it
+    is at least as recent, which only reads the rows of the requested split. Rows carry
+    their 'subset' and 'fold' (see src/data/splits.py): stored in the index, or computed
+    from the image ids with the default ratios when reading the CSV.
+
     Args:
     - data_dir (str): Path to the directory containing the metadata CSV file.
+    - img_size (tuple): Optional (height, width). Images with a pre-resized copy of that
+      size in metadata use it instead of the original file.
+    - split (str): Split to load, "experiment" or "holding" (default: "experiment").
 
     Returns:
     - pd.DataFrame: DataFrame containing loaded metadata with image and mask paths.
     """
+    if _index_is_current(data_dir):
+        index = MetadataIndex(os.path.join(data_dir, METADATA_INDEX_DIR))
+        return index.frame(data_dir, split, img_size)
+
     metadata_path = os.path.join(data_dir, "metadata.csv")
     df = pd.read_csv(metadata_path)
-    df = df[df["split"] == "experiment"]
+    df = df[df["split"] == split]
+    df = select_resolution(df, img_size)
     df["image_path"] = df["image_path"].apply(lambda x: os.path.join(data_dir, x))
     df["mask_path"] = df["mask_path"].apply(lambda x: os.path.join(data_dir, x))
-    df = df.sample(frac=1).reset_index(drop=True)
+    if "bitmask_path" in df.columns:
+        df["bitmask_path"] = df["bitmask_path"].apply(
+            lambda x: os.path.join(data_dir, x) if isinstance(x, str) else x
+        )
+    df = add_split_columns(df.reset_index(drop=True))
     return df
 
 
-def split_data(df):
+def load_packed_metadata(packed_dir, split="generated"):
+    """
+    Metadata of a packed split without metadata.csv, e.g. written by
+    dataset_generator.py --binary_dir. Rows only have an image id, no files behind them,
+    so they are for the "packed" backend only.
+
+    Args:
+    - packed_dir (str): Directory containing the packed files.
+    - split (str): Packed split name (default: "generated").
+
+    Returns:
+    - pd.DataFrame: image_id, split, empty image and mask paths, resolution and the
+      'subset' and 'fold' columns.
+    """
+    index_df = pd.read_csv(packed_paths(packed_dir, split)[2])
+    df = pd.DataFrame(
+        {
+            "image_id": index_df["image_id"].astype(str),
+            "split": split,
+            "image_path": np.nan,
+            "mask_path": np.nan,
+            "resolution": NATIVE_RESOLUTION,
+        }
+    )
+    return add_split_columns(df)
+
+
+def split_data(df, fold=None):
     """
     Split the metadata DataFrame into training, validation, and test sets.
 
+    Membership comes from the 'subset' and 'fold' columns of load_metadata, so it is the
+    same in every run. The training loader shuffles, no shuffling is done here.
+
     Args:
     - df (pd.DataFrame): DataFrame containing metadata to be split.
+    - fold (int): Cross-validation fold to validate on, None for the fixed valid subset.
+      The test set is the same for every fold.
 
     Returns:
     - pd.DataFrame, pd.DataFrame, pd.DataFrame: Three DataFrames for training, validation, and test sets.
     """
-    valid_df = df.sample(
-        frac=0.1, random_state=42
-    )  # A bit nonsensed style of splitting should have used sklearn direclty
-    remaining_df = df.drop(valid_df.index)
-    test_df = remaining_df.sample(frac=0.1, random_state=42)
-    train_df = remaining_df.drop(test_df.index)
-    return train_df, valid_df, test_df
+    if "subset" not in df.columns:
+        df = add_split_columns(df.copy())
+    test = (df["subset"] == "test").to_numpy()
+    if fold is None:
+        valid = (df["subset"] == "valid").to_numpy()
+    else:
+        valid = ~test & (df["fold"] == fold).to_numpy()
+    train = ~test & ~valid
+    return df[train], df[valid], df[test]
 
 
 def load_class_info(data_dir):
@@ -10,10 +10,22 @@
 # ----------------------------------------------------------------------------
 
 import pytorch_lightning as pl
-from torch.utils.data import DataLoader
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, IterableDataset
 from torchvision import transforms
 
 from src.data.dataset import ISNSet
+from src.data.loader_tuning import LoaderAutotuner
+from src.data.integrity import exclude_invalid
+from src.data.procedural_dataset import (
+    UNBOUNDED_LENGTH,
+    FreshSampleSampler,
+    ProceduralShapeSet,
+)
+from src.data.shard_dataset import ISNShardSet
+from src.data.splits import SUBSETS
+from src.data.sample_cache import SharedSampleCache
 from src.config import WORKERS
 
 
@@ -32,8 +44,47 @@ class ISNDataModule(pl.LightningDataModule):
     - test_df (pd.DataFrame): DataFrame containing test set metadata.
     - batch_size (int): Batch size for DataLoader (default: 2).
     - img_size (tuple): Tuple specifying image size (default: (256, 256)).
-    - preprocess_fn (callable): Preprocessing function for input images (default: None).
+    - preprocess_fn (callable): Preprocessing function for input images, e.g. an
+      EncoderNormalizer (default: None).
     - class_rgb_values (list): List of RGB values for dataset classes (default: None).
+    - backend (str): Sample source, "png" to decode the files listed in the DataFrames,
+      "packed" to read the memory-mapped arrays written by the pack stage, "shards" to
+      stream the tar shards written by the shard writer or "procedural" to generate
+      synthetic shape samples on the fly, in which case the DataFrames are not used and
+      may be None (default: "png").
+    - packed_dir (str): Directory of the packed arrays, required for the "packed" backend.
+    - shard_dir (str): Directory of the tar shards, required for the "shards" backend. The
+      DataFrames then only select which image ids go to the train, valid and test sets.
+    - mask_mode (str): "onehot" for float one-hot masks or "index" for uint8 class index
+      masks resized with nearest-neighbour interpolation (default: "onehot").
+    - cache_bytes (int): Byte budget of a shared-memory LRU cache of decoded samples used by
+      all workers of the train, valid and test loaders, 0 disables it (default: 0).
+    - batch_transforms (bool): Let the workers return raw uint8 tensors and run float
+      conversion and encoder normalisation once per batch in on_after_batch_transfer,
+      instead of per sample through transform and preprocess_fn (default: False). Samples
+      of another size than img_size are still resized by the workers, as uint8, so that
+      images of mixed source sizes can be collated. The
+      batched normalisation is preprocess_fn.normalize_tensor, so preprocess_fn has to be
+      an EncoderNormalizer or None, in which case images are only scaled to [0, 1].
+    - bitmasks (bool): Read the bit-packed binary masks listed in metadata.csv instead of
+      the PNG masks (png backend only, shards carry whichever masks they were written
+      with) (default: False).
+    - num_workers (int): Worker processes per loader, None for WORKERS from src.config.
+    - autotune (bool): Pick num_workers and prefetch_factor of every loader with short
+      timed trials and keep its workers alive across epochs, instead of num_workers workers
+      per loader (default: False).
+    - tuning_file (str): JSON file caching the autotuned settings per machine, required
+      with autotune.
+    - procedural_samples (tuple): (train samples per epoch, valid samples, test samples)
+      of the "procedural" backend. Training draws new samples every epoch (default:
+      (10000, 1000, 1000)).
+    - procedural_seed (int): Seed of the "procedural" samples; valid and test use the
+      following two seeds (default: 0).
+    - channels_last (bool): Deliver image batches in channels_last (NHWC) memory format,
+      matching a SegmentationModel with channels_last, converted once per batch after
+      the device transfer (default: False).
+    - verdicts (pd.DataFrame): Optional verdicts of the integrity checker, from
+      load_verdicts. Pairs it rejected are left out of all three sets (default: None).
         
     """
     def __init__(
@@ -45,21 +96,105 @@ class ISNDataModule(pl.LightningDataModule):
         img_size=(256, 256),
         preprocess_fn=None,
         class_rgb_values=None,
+        backend="png",
+        packed_dir=None,
+        shard_dir=None,
+        mask_mode="onehot",
+        cache_bytes=0,
+        batch_transforms=False,
+        bitmasks=False,
+        num_workers=None,
+        autotune=False,
+        tuning_file=None,
+        procedural_samples=(10000, 1000, 1000),
+        procedural_seed=0,
+        channels_last=False,
+        verdicts=None,
     ):
         super().__init__()
+        if backend not in ("png", "packed", "shards", "procedural"):
+            raise ValueError(f"Unknown data backend '{backend}'.")
+        if backend == "packed" and packed_dir is None:
+            raise ValueError("The 'packed' backend requires packed_dir.")
+        if backend == "shards" and shard_dir is None:
+            raise ValueError("The 'shards' backend requires shard_dir.")
+        if backend in ("shards", "procedural") and cache_bytes > 0:
+            raise ValueError(f"The sample cache is not supported by the '{backend}' backend.")
+        if bitmasks and backend != "png":
+            raise ValueError("bitmasks are only read by the 'png' backend.")
+        if autotune and tuning_file is None:
+            raise ValueError("autotune requires tuning_file.")
+        if batch_transforms and not (
+            preprocess_fn is None or hasattr(preprocess_fn, "normalize_tensor")
+        ):
+            raise ValueError("batch_transforms needs an EncoderNormalizer as preprocess_fn.")
         self.train_df = train_df
         self.valid_df = valid_df
         self.test_df = test_df
         self.batch_size = batch_size
         self.img_size = img_size
-        self.transform = transforms.Compose(
-            [
-                transforms.ToTensor(),
-                transforms.Resize(size=self.img_size),
-            ]
-        )
+        # resizing happens in ISNSet, and only for samples not already at img_size
+        self.transform = transforms.ToTensor()
         self.preprocess_fn = preprocess_fn
         self.class_rgb_values = class_rgb_values
+        self.mask_mode = mask_mode
+        self.backend = backend
+        self.packed_dir = packed_dir
+        self.shard_dir = shard_dir
+        self.cache = SharedSampleCache(cache_bytes) if cache_bytes > 0 else None
+        self.batch_transforms = batch_transforms
+        self.bitmasks = bitmasks
+        self.num_workers = WORKERS if num_workers is None else num_workers
+        self.autotuner = LoaderAutotuner(tuning_file) if autotune else None
+        self.procedural_samples = procedural_samples
+        self.procedural_seed = procedural_seed
+        self.channels_last = channels_last
+        self.verdicts = verdicts
+
+    def _make_dataset(self, df, cache_offset=0, shuffle=False, subset="train"):
+        if self.backend == "procedural":
+            index = SUBSETS.index(subset)
+            samples = self.procedural_samples[index]
+            return ProceduralShapeSet(
+                length=UNBOUNDED_LENGTH if subset == "train" else samples,
+                seed=self.procedural_seed + index,
+                samples_per_epoch=samples if subset == "train" else None,
+                transform=self.transform,
+                preprocess_fn=self.preprocess_fn,
+                class_rgb_values=self.class_rgb_values,
+                mask_mode=self.mask_mode,
+                img_size=self.img_size,
+                raw_output=self.batch_transforms,
+            )
+        if self.backend == "shards":
+            if self.verdicts is not None:
+                df = exclude_invalid(df, self.verdicts)
+            return ISNShardSet(
+                self.shard_dir,
+                df["split"].unique(),
+                image_ids=df["image_id"],
+                shuffle=shuffle,
+                transform=self.transform,
+                preprocess_fn=self.preprocess_fn,
+                class_rgb_values=self.class_rgb_values,
+                mask_mode=self.mask_mode,
+                img_size=self.img_size,
+                raw_output=self.batch_transforms,
+            )
+        return ISNSet(
+            df,
+            transform=self.transform,
+            preprocess_fn=self.preprocess_fn,
+            class_rgb_values=self.class_rgb_values,
+            packed_dir=self.packed_dir if self.backend == "packed" else None,
+            mask_mode=self.mask_mode,
+            img_size=self.img_size,
+            cache=self.cache,
+            cache_offset=cache_offset,
+            raw_output=self.batch_transforms,
+            bitmasks=self.bitmasks,
+            verdicts=self.verdicts,
+        )
 
     def setup(self, stage=None):
         """
@@ -68,51 +203,126 @@ class ISNDataModule(pl.LightningDataModule):
         Args:
         - stage (str): Stage of setup ('fit' for training, 'test' for testing).
         """
-        self.trainset = ISNSet(
-            self.train_df,
-            transform=self.transform,
-            preprocess_fn=self.preprocess_fn,
-            class_rgb_values=self.class_rgb_values,
+        # one cache key range for all three sets: train, then valid, then test
+        self.trainset = self._make_dataset(self.train_df, shuffle=True)
+        self.validset = self._make_dataset(
+            self.valid_df, len(self.trainset), subset="valid"
         )
-        self.validset = ISNSet(
-            self.valid_df,
-            transform=self.transform,
-            preprocess_fn=self.preprocess_fn,
-            class_rgb_values=self.class_rgb_values,
+        self.testset = self._make_dataset(
+            self.test_df, len(self.trainset) + len(self.validset), subset="test"
         )
-        self.testset = ISNSet(
-            self.test_df,
-            transform=self.transform,
-            preprocess_fn=self.preprocess_fn,
-            class_rgb_values=self.class_rgb_values,
+        if self.cache is not None and self.cache.layout is None:
+            probe = next(ds for ds in (self.trainset, self.validset, self.testset) if len(ds))
+            self.cache.bind(
+                len(self.trainset) + len(self.validset) + len(self.testset),
+                probe._load_pair(0),
+            )
+
+    def on_after_batch_transfer(self, batch, dataloader_idx):
+        """
+        Batched transform stage, runs on the training device after the transfer.
+
+        Resizes raw uint8 images (bilinear, antialiased) and masks (nearest) of batches
+        not already at img_size, converts images to float and applies the encoder
+        normalisation in one op per batch.
+        Batches that are not raw uint8 are returned untouched, apart from the
+        channels_last conversion of the images.
+
+        Args:
+        - batch (tuple): Batch of images and masks from the DataLoader.
+        - dataloader_idx (int): Index of the DataLoader the batch came from.
+
+        Returns:
+        - tuple: Batch of normalised images and masks ready for the model.
+        """
+        imgs, masks = batch
+        if not self.batch_transforms or imgs.dtype != torch.uint8:
+            if self.channels_last:
+                imgs = imgs.contiguous(memory_format=torch.channels_last)
+            return imgs, masks
+
+        size = tuple(self.img_size)
+        imgs = imgs.float()
+        if tuple(imgs.shape[-2:]) != size:
+            imgs = F.interpolate(
+                imgs, size=size, mode="bilinear", align_corners=False, antialias=True
+            )
+        if self.preprocess_fn is not None:
+            imgs = self.preprocess_fn.normalize_tensor(imgs)
+        else:
+            imgs = imgs / 255
+
+        if tuple(masks.shape[-2:]) != size:
+            index_masks = masks.ndim == 3
+            masks = F.interpolate(
+                masks.unsqueeze(1) if index_masks else masks, size=size, mode="nearest"
+            )
+            masks = masks.squeeze(1) if index_masks else masks
+        if masks.ndim == 4:
+            masks = masks.float()
+        if self.channels_last:
+            imgs = imgs.contiguous(memory_format=torch.channels_last)
+        return imgs, masks
+
+    def teardown(self, stage=None):
+        """
+        Report the shared cache counters at the end of a stage.
+
+        Args:
+        - stage (str): Stage being torn down ('fit', 'validate', 'test' or 'predict').
+        """
+        if self.cache is not None:
+            print(f"Sample cache after {stage}: {self.cache.stats()}")
+
+    def _loader_settings(self, name, dataset, shuffle):
+        if self.autotuner is None:
+            return {"num_workers": self.num_workers}
+        key = (
+            f"{name}/{self.backend}/batch{self.batch_size}/"
+            f"{self.img_size[0]}x{self.img_size[1]}/"
+            f"{'raw' if self.batch_transforms else 'processed'}"
         )
+        # time decoding, not reads of samples cached by an earlier trial
+        cache = getattr(dataset, "cache", None)
+        if cache is None:
+            return self.autotuner.tune(key, dataset, self.batch_size, shuffle)
+        dataset.cache = None
+        try:
+            return self.autotuner.tune(key, dataset, self.batch_size, shuffle)
+        finally:
+            dataset.cache = cache
 
-    def train_dataloader(self):
+    def _make_loader(self, name, dataset, shuffle):
+        if isinstance(dataset, IterableDataset):
+            # shuffling happens inside the dataset, across shards and in its buffer
+            shuffle = False
+        sampler = None
+        if getattr(dataset, "samples_per_epoch", None):
+            # procedural training draws new indices every epoch instead of shuffling
+            sampler, shuffle = FreshSampleSampler(dataset), False
+        settings = self._loader_settings(name, dataset, shuffle)
+        if isinstance(dataset, IterableDataset) and len(dataset.shards) < settings["num_workers"]:
+            print(
+                f"Only {len(dataset.shards)} shards for {settings['num_workers']} workers, "
+                "some workers will idle. Write smaller shards."
+            )
         return DataLoader(
-            self.trainset,
+            dataset,
             batch_size=self.batch_size,
-            shuffle=True,
-            num_workers=WORKERS,
+            shuffle=shuffle,
+            sampler=sampler,
             pin_memory=True,
+            **settings,
         )
 
+    def train_dataloader(self):
+        return self._make_loader("train", self.trainset, shuffle=True)
+
     def val_dataloader(self):
-        return DataLoader(
-            self.validset,
-            batch_size=self.batch_size,
-            shuffle=False,
-            num_workers=WORKERS,
-            pin_memory=True,
-        )
+        return self._make_loader("valid", self.validset, shuffle=False)
 
     def test_dataloader(self):
-        return DataLoader(
-            self.testset,
-            batch_size=self.batch_size,
-            shuffle=False,
-            num_workers=WORKERS,
-            pin_memory=True,
-        )
+        return self._make_loader("test", self.testset, shuffle=False)
 
 
 def main():
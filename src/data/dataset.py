@@ -11,9 +11,20 @@
 
 import numpy as np
 from PIL import Image
+import torch
 from torch.utils.data import Dataset
+from torchvision import transforms
 import pandas as pd
 
+from src.constants import IGNORE_INDEX
+from src.data.bitmask import decode_bitmask, load_bitmask
+from src.data.integrity import exclude_invalid
+from src.data.packed_store import PackedSampleStore
+
+MASK_MODES = ("onehot", "index")
+# colours of cleared and set bits of a bit-packed mask
+BITMASK_RGB = np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+
 
 def one_hot_encode(label, label_values):
     """
@@ -35,7 +46,198 @@ def one_hot_encode(label, label_values):
     return semantic_map
 
 
-class ISNSet(Dataset):
+class ClassIndexLUT:
+    """
+    Packed-RGB to class index lookup table.
+
+    Every RGB colour is packed into one integer (r << 16 | g << 8 | b) and looked up
+    in the sorted packed palette, so a whole mask is decoded with one vectorised
+    searchsorted instead of a per-class equality pass. Colours that are not in the
+    palette map to IGNORE_INDEX.
+
+    Args:
+    - label_values (list): List of RGB tuples for each class.
+    """
+
+    def __init__(self, label_values):
+        colours = np.asarray(label_values, dtype=np.uint32)
+        if len(colours) > IGNORE_INDEX:
+            raise ValueError(f"At most {IGNORE_INDEX} classes fit in a uint8 index map.")
+        keys = (colours[:, 0] << 16) | (colours[:, 1] << 8) | colours[:, 2]
+        order = np.argsort(keys)
+        self.keys = keys[order]
+        self.classes = order.astype(np.uint8)
+
+    def __call__(self, label):
+        """
+        Convert a mask to class indices.
+
+        Args:
+        - label (np.ndarray): RGB mask of shape (H, W, 3) or greyscale mask of shape (H, W).
+
+        Returns:
+        - np.ndarray: uint8 class index map of shape (H, W).
+        """
+        if label.ndim == 2:
+            packed = label.astype(np.uint32) * 0x010101
+        else:
+            label = label.astype(np.uint32)
+            packed = (label[..., 0] << 16) | (label[..., 1] << 8) | label[..., 2]
+        pos = np.searchsorted(self.keys, packed).clip(max=len(self.keys) - 1)
+        return np.where(self.keys[pos] == packed, self.classes[pos], IGNORE_INDEX).astype(
+            np.uint8
+        )
+
+
+class SampleProcessor:
+    """
+    Decoding and post-processing of image/mask pairs shared by the ISN datasets.
+
+    Subclasses call init_processing() from their constructor, decode with
+    decode_pair() and turn the decoded arrays into model inputs with process_pair().
+    See ISNSet for the meaning of the arguments.
+    """
+
+    def init_processing(
+        self,
+        transform=None,
+        preprocess_fn=None,
+        class_rgb_values=None,
+        mask_mode="onehot",
+        mask_transform=None,
+        raw_output=False,
+        img_size=None,
+    ):
+        if mask_mode not in MASK_MODES:
+            raise ValueError(f"Unknown mask mode '{mask_mode}', expected one of {MASK_MODES}.")
+        self.transform = transform
+        self.preprocess_fn = preprocess_fn
+        self.class_rgb_values = class_rgb_values
+        self.mask_mode = mask_mode
+        self.mask_transform = mask_transform
+        self.class_lut = ClassIndexLUT(class_rgb_values) if mask_mode == "index" else None
+        if self.class_lut:
+            self.bit_classes = self.class_lut(BITMASK_RGB[None, :, 0])[0]
+        self.raw_output = raw_output
+        self.img_size = tuple(img_size) if img_size else None
+        if self.img_size:
+            self.resize = transforms.Resize(size=self.img_size)
+            self.mask_resize = transforms.Resize(
+                size=self.img_size, interpolation=transforms.InterpolationMode.NEAREST
+            )
+
+    def decode_pair(self, img, mask):
+        """
+        Decode an opened image/mask pair.
+
+        Args:
+        - img (PIL.Image.Image): Opened image.
+        - mask (PIL.Image.Image): Opened mask.
+
+        Returns:
+        - tuple: (image, mask) as uint8 arrays. The image has shape (H, W, 3), the mask
+          is RGB (H, W, 3) in "onehot" mode and a class index map (H, W) in "index" mode.
+        """
+        img = self.decode_image(img)
+        if self.class_lut:
+            # greyscale masks are looked up as-is, without expanding them to RGB
+            mask = self.class_lut(np.array(mask if mask.mode == "L" else mask.convert("RGB")))
+        else:
+            mask = np.array(mask.convert("RGB"))
+        return img, mask
+
+    def decode_image(self, img):
+        """Decode an opened image into a uint8 array of shape (H, W, 3)."""
+        return np.array(img.convert("RGB"))
+
+    def bits_to_mask(self, bits):
+        """
+        Map a 0/1 mask to the form of the masks of decode_pair: set bits are white,
+        cleared bits black.
+
+        Args:
+        - bits (np.ndarray): uint8 array of shape (H, W) with values 0 and 1.
+
+        Returns:
+        - np.ndarray: RGB mask (H, W, 3) in "onehot" mode, class index map (H, W) in
+          "index" mode.
+        """
+        if self.class_lut:
+            return self.bit_classes[bits]
+        return BITMASK_RGB[bits]
+
+    def expand_bitmask(self, data):
+        """
+        Decode a bit-packed mask (see src/data/bitmask.py) into the same form as the
+        masks of decode_pair: set bits are white, cleared bits black.
+
+        Args:
+        - data (np.ndarray or bytes): Content of a '.bits' file.
+
+        Returns:
+        - np.ndarray: RGB mask (H, W, 3) in "onehot" mode, class index map (H, W) in
+          "index" mode.
+        """
+        return self.bits_to_mask(decode_bitmask(data))
+
+    def _needs_resize(self, tensor):
+        return self.img_size is not None and tuple(tensor.shape[-2:]) != self.img_size
+
+    def process_pair(self, img, mask):
+        """
+        Turn a decoded pair into model inputs.
+
+        Args:
+        - img (np.ndarray): uint8 image of shape (H, W, 3).
+        - mask (np.ndarray): Mask as returned by decode_pair.
+
+        Returns:
+        - tuple: Tuple containing the processed image and its corresponding mask.
+        """
+        if self.raw_output:
+            img = torch.from_numpy(img).permute(2, 0, 1).contiguous()
+            if self.mask_mode == "onehot":
+                mask = one_hot_encode(mask, self.class_rgb_values).astype(np.uint8)
+                mask = torch.from_numpy(mask).permute(2, 0, 1).contiguous()
+            else:
+                mask = torch.from_numpy(mask)
+            if self._needs_resize(img):
+                # samples of another size, without a pre-resized copy, are resized here
+                # (still uint8) so they can be collated; the batched stage normalises
+                img = self.resize(img)
+                mask = self.mask_resize(mask.unsqueeze(0) if mask.ndim == 2 else mask)
+                mask = mask.squeeze(0) if self.mask_mode == "index" else mask
+            return img, mask
+
+        if self.preprocess_fn:
+            img = np.asarray(self.preprocess_fn(img))
+            # EncoderNormalizer already returns float32/float16, only recast float64
+            if img.dtype == np.float64:
+                img = img.astype(np.float32)
+
+        if self.transform:
+            img = self.transform(img)
+        if self._needs_resize(img):
+            img = self.resize(img)
+
+        if self.mask_mode == "index":
+            mask = torch.from_numpy(mask).unsqueeze(0)
+            if self.mask_transform:
+                mask = self.mask_transform(mask)
+            if self._needs_resize(mask):
+                mask = self.mask_resize(mask)
+            return img, mask.squeeze(0)
+
+        mask = one_hot_encode(mask, self.class_rgb_values).astype("float")
+        if self.transform:
+            mask = self.transform(mask)
+        if self._needs_resize(mask):
+            mask = self.resize(mask)
+
+        return img, mask
+
+
+class ISNSet(SampleProcessor, Dataset):
     """
     Dataset class for ISN dataset.
 
@@ -49,8 +251,46 @@ class ISNSet(Dataset):
     - transform (callable): Optional transformations to apply to images and masks.
     - preprocess_fn (callable): Optional preprocessing function for input images.
     - class_rgb_values (list): List of RGB tuples for each class in the dataset.
+    - mask_mode (str): "onehot" returns float64 one-hot masks of shape (C, H, W), "index"
+      returns uint8 class index maps of shape (H, W) with IGNORE_INDEX for unknown colours.
+    - mask_transform (callable): Optional transform for index masks, applied to a uint8
+      tensor of shape (1, H, W). Resizing should use nearest-neighbour interpolation.
+    - packed_dir (str): Optional directory of packed arrays (see src/data/packed_store.py).
+      When given, samples are read from the memory-mapped arrays instead of the PNGs,
+      and df must contain the 'image_id' and 'split' columns of metadata.csv.
+    - cache (SharedSampleCache): Optional shared-memory cache of decoded samples
+      (see src/data/sample_cache.py), already bound in the main process.
+    - cache_offset (int): Offset of this dataset's indices in the cache key range.
+    - raw_output (bool): Return undecorated uint8 tensors, an image of shape (3, H, W) and
+      an index mask (H, W) or one-hot mask (C, H, W), and leave dtype conversion and
+      normalisation to the batched stage of ISNDataModule. Samples that are not img_size
+      are still resized (as uint8, masks nearest), so batches can be collated. transform, mask_transform
+      and preprocess_fn are ignored.
+    - img_size (tuple): Optional (height, width). Images and masks of another size are
+      resized after transform/mask_transform (bilinear, nearest for index masks); samples
+      that already have this size, e.g. pre-resized copies, skip resizing entirely.
+    - bitmasks (bool): Read the bit-packed masks listed in the 'bitmask_path' column of
+      metadata.csv instead of the PNG masks. Only for binary masks, set bits map to white
+      and cleared bits to black in class_rgb_values. The cache then holds the packed bits.
+    - verdicts (pd.DataFrame): Optional verdicts of the integrity checker (see
+      src/data/integrity.py). Pairs it rejected are dropped from df up front.
     """
-    def __init__(self, df, transform=None, preprocess_fn=None, class_rgb_values=None):
+    def __init__(
+        self,
+        df,
+        transform=None,
+        preprocess_fn=None,
+        class_rgb_values=None,
+        packed_dir=None,
+        mask_mode="onehot",
+        mask_transform=None,
+        cache=None,
+        cache_offset=0,
+        raw_output=False,
+        img_size=None,
+        bitmasks=False,
+        verdicts=None,
+    ):
 
         # Debug STARTS
         # print("DEBUG - df type:", type(df))
@@ -62,43 +302,104 @@ class ISNSet(Dataset):
         #     raise ValueError("DataFrame must contain 'image_path' and 'mask_path' columns.")
         # Debug ENDS
 
+        self.init_processing(
+            transform=transform,
+            preprocess_fn=preprocess_fn,
+            class_rgb_values=class_rgb_values,
+            mask_mode=mask_mode,
+            mask_transform=mask_transform,
+            raw_output=raw_output,
+            img_size=img_size,
+        )
+        if verdicts is not None:
+            df = exclude_invalid(df, verdicts)
         self.image_paths = df["image_path"].tolist()
         self.mask_paths = df["mask_path"].tolist()
-        self.transform = transform
-        self.preprocess_fn = preprocess_fn
-        self.class_rgb_values = class_rgb_values
+        self.bitmasks = bitmasks and packed_dir is None
+        if self.bitmasks:
+            if "bitmask_path" not in df.columns or df["bitmask_path"].isna().any():
+                raise ValueError(
+                    "bitmasks needs a 'bitmask_path' for every sample, run "
+                    "dataset_preprocessing.py --bitmasks and metadata_generator.py."
+                )
+            self.mask_paths = df["bitmask_path"].tolist()
+        self.cache = cache
+        self.cache_offset = cache_offset
+
+        self.packed_stores = None
+        if packed_dir is not None:
+            self.packed_stores = {
+                split: PackedSampleStore(packed_dir, split)
+                for split in df["split"].unique()
+            }
+            self.packed_splits = df["split"].tolist()
+            self.packed_rows = np.empty(len(df), dtype=np.int64)
+            for split, store in self.packed_stores.items():
+                in_split = (df["split"] == split).to_numpy()
+                self.packed_rows[in_split] = store.rows_for(df["image_id"][in_split])
 
     def __len__(self):
         return len(self.image_paths)
 
-    def __getitem__(self, idx):
+    def _load_pair(self, idx):
         """
-        Retrieves the image and mask for a given index.
+        Decode the raw image and mask for a given index.
 
         Args:
         - idx (int): Index to retrieve image and mask.
 
         Returns:
-        - tuple: Tuple containing the processed image and its corresponding mask.
+        - tuple: (image, mask) as uint8 arrays, see SampleProcessor.decode_pair. With
+          bitmasks the mask is the still packed content of the '.bits' file.
         """
-        img_file = self.image_paths[idx]
-        mask_file = self.mask_paths[idx]
+        if self.packed_stores is not None:
+            store = self.packed_stores[self.packed_splits[idx]]
+            img, mask = store.get(self.packed_rows[idx])
+            # single copy out of the page cache, no decoding
+            img = np.array(img)
+            if store.mask_bits:
+                mask = self.bits_to_mask(mask)
+            else:
+                mask = self.class_lut(mask) if self.class_lut else np.array(mask)
+            return img, mask
 
-        img = Image.open(img_file).convert("RGB")
-        img = np.array(img)
+        if self.bitmasks:
+            return (
+                self.decode_image(Image.open(self.image_paths[idx])),
+                load_bitmask(self.mask_paths[idx]),
+            )
 
-        mask = Image.open(mask_file).convert("RGB")
-        mask = one_hot_encode(mask, self.class_rgb_values).astype("float")
+        return self.decode_pair(
+            Image.open(self.image_paths[idx]), Image.open(self.mask_paths[idx])
+        )
 
-        if self.preprocess_fn:
-            img = self.preprocess_fn(img)
-            img = np.array(img, dtype=np.float32)
+    def _load_cached_pair(self, idx):
+        """
+        Same as _load_pair, but served from the shared cache when one is set.
+        """
+        if self.cache is None:
+            return self._load_pair(idx)
+        key = self.cache_offset + idx
+        pair = self.cache.get(key)
+        if pair is None:
+            pair = self._load_pair(idx)
+            self.cache.put(key, pair)
+        return pair
 
-        if self.transform:
-            img = self.transform(img)
-            mask = self.transform(mask)
+    def __getitem__(self, idx):
+        """
+        Retrieves the image and mask for a given index.
 
-        return img, mask
+        Args:
+        - idx (int): Index to retrieve image and mask.
+
+        Returns:
+        - tuple: Tuple containing the processed image and its corresponding mask.
+        """
+        img, mask = self._load_cached_pair(idx)
+        if self.bitmasks:
+            mask = self.expand_bitmask(mask)
+        return self.process_pair(img, mask)
 
 
 def main():
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Reading the verdicts of the integrity checker (src/data_preparation/integrity_checker.py).
+
+The checker writes one row per image/mask pair of metadata.csv to integrity.csv in
+the data directory, with the size and mtime of the image, the mask and the bit-packed
+mask when they were checked and whether the pair is usable.
+
+Functions:
+- load_verdicts(data_dir): Verdicts with paths joined like load_metadata does.
+- exclude_invalid(df, verdicts): Drop the pairs the checker rejected.
+"""
+
+import os
+
+import pandas as pd
+
+VERDICT_FILE = "integrity.csv"
+
+
+def load_verdicts(data_dir):
+    """
+    Load the integrity verdicts of a data directory.
+
+    Args:
+    - data_dir (str): Directory containing metadata.csv and integrity.csv.
+
+    Returns:
+    - pd.DataFrame or None: Verdicts with image_path and mask_path joined to data_dir,
+      None if the checker has not been run.
+    """
+    verdict_path = os.path.join(data_dir, VERDICT_FILE)
+    if not os.path.exists(verdict_path):
+        return None
+    verdicts = pd.read_csv(verdict_path, keep_default_na=False)
+    for column in ("image_path", "mask_path"):
+        verdicts[column] = data_dir + os.sep + verdicts[column]
+        verdicts[column] = verdicts[column].map(os.path.normpath)
+    return verdicts
+
+
+def exclude_invalid(df, verdicts):
+    """
+    Drop the rows whose image/mask pair was rejected by the integrity checker. Rows
+    the checker has not seen are kept, as are rows without an image_path (packed
+    splits), which the checker never covers.
+
+    Args:
+    - df (pd.DataFrame): Metadata with image_path and mask_path columns.
+    - verdicts (pd.DataFrame): Verdicts from load_verdicts.
+
+    Returns:
+    - pd.DataFrame: df without the rejected pairs.
+    """
+    rejected = verdicts[~verdicts["ok"]]
+    if rejected.empty:
+        return df
+    bad_images = set(rejected["image_path"])
+    paths = df["image_path"].map(
+        lambda path: os.path.normpath(path) if isinstance(path, str) and path else None
+    )
+    keep = ~paths.isin(bad_images)
+    if not keep.all():
+        print(f"Excluding {int((~keep).sum())} samples rejected by the integrity check.")
+    return df[keep.to_numpy()]
+
+
+def main():
+    print("Integrity verdict reader is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+DataLoader autotuning for ISNDataModule.
+
+Instead of starting mp.cpu_count() workers for every loader, short timed trials
+are run over worker counts and prefetch depths, and the fastest configuration is
+kept. Results are cached in a JSON file per machine and loader, so only the first
+run on a machine pays for the trials.
+
+Classes:
+- LoaderAutotuner: Runs the trials and reads/writes the per-machine cache.
+
+Functions:
+- machine_key(): Identifier of the current machine in the cache file.
+"""
+
+import json
+import math
+import multiprocessing as mp
+import os
+import platform
+import time
+
+from torch.utils.data import DataLoader
+
+
+def machine_key():
+    """
+    Identifier of the current machine in the tuning cache.
+
+    Returns:
+    - str: Host name and CPU count, e.g. 'gpu-box-07/64cpu'.
+    """
+    return f"{platform.node()}/{mp.cpu_count()}cpu"
+
+
+class LoaderAutotuner:
+    """
+    Pick num_workers and prefetch_factor for a DataLoader by timing short trials.
+
+    Worker counts are tried in powers of two up to the CPU count, and never more than
+    the loader has batches, so a small validation set does not fan out to every core.
+    Workers of the chosen configuration are kept persistent across epochs.
+
+    Args:
+    - tuning_file (str): JSON file caching the chosen settings per machine.
+    - max_workers (int): Largest worker count to try (default: mp.cpu_count()).
+    - prefetch_factors (tuple): Prefetch depths to try with workers (default: (2, 4)).
+    - trial_batches (int): Timed batches per trial, after one warm-up batch (default: 20).
+    - trial_seconds (float): Time limit of a single trial (default: 10).
+    """
+
+    def __init__(
+        self,
+        tuning_file,
+        max_workers=None,
+        prefetch_factors=(2, 4),
+        trial_batches=20,
+        trial_seconds=10.0,
+    ):
+        self.tuning_file = tuning_file
+        self.max_workers = max_workers or mp.cpu_count()
+        self.prefetch_factors = prefetch_factors
+        self.trial_batches = trial_batches
+        self.trial_seconds = trial_seconds
+
+    def _load_cache(self):
+        if not os.path.exists(self.tuning_file):
+            return {}
+        with open(self.tuning_file) as file:
+            return json.load(file)
+
+    def _save_cache(self, cache):
+        directory = os.path.dirname(self.tuning_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.tuning_file + ".tmp", "w") as file:
+            json.dump(cache, file, indent=2, sort_keys=True)
+        os.replace(self.tuning_file + ".tmp", self.tuning_file)
+
+    def candidates(self, num_batches):
+        """
+        Loader configurations to try.
+
+        Args:
+        - num_batches (int): Number of batches of the loader per epoch.
+
+        Returns:
+        - list: (num_workers, prefetch_factor) pairs, prefetch_factor None without workers.
+        """
+        limit = min(self.max_workers, num_batches)
+        workers = [0]
+        count = 1
+        while count <= limit:
+            workers.append(count)
+            count *= 2
+        if limit not in workers:
+            workers.append(limit)
+        return [(0, None)] + [
+            (num_workers, prefetch)
+            for num_workers in workers[1:]
+            for prefetch in self.prefetch_factors
+        ]
+
+    def trial(self, dataset, batch_size, shuffle, num_workers, prefetch_factor):
+        """
+        Time one loader configuration.
+
+        Args:
+        - dataset (Dataset): Dataset to load.
+        - batch_size (int): Batch size of the loader.
+        - shuffle (bool): Whether the loader shuffles.
+        - num_workers (int): Number of worker processes.
+        - prefetch_factor (int): Batches prefetched per worker, None without workers.
+
+        Returns:
+        - float: Samples per second, not counting the first (start-up) batch.
+        """
+        loader = DataLoader(
+            dataset,
+            batch_size=batch_size,
+            shuffle=shuffle,
+            num_workers=num_workers,
+            prefetch_factor=prefetch_factor,
+        )
+        samples = 0
+        start = None
+        for step, (imgs, _) in enumerate(loader):
+            if start is None:
+                start = time.perf_counter()
+                continue
+            samples += len(imgs)
+            if step >= self.trial_batches or time.perf_counter() - start > self.trial_seconds:
+                break
+        elapsed = time.perf_counter() - start if start is not None else 0.0
+        del loader
+        return samples / elapsed if elapsed > 0 else 0.0
+
+    def tune(self, key, dataset, batch_size, shuffle=False):
+        """
+        Get the loader settings for a dataset, running the trials on a cache miss.
+
+        Args:
+        - key (str): Name of the loader configuration in the cache, should change with
+          anything that changes the per-sample cost (backend, batch size, image size).
+        - dataset (Dataset): Dataset to load.
+        - batch_size (int): Batch size of the loader.
+        - shuffle (bool): Whether the loader shuffles.
+
+        Returns:
+        - dict: DataLoader keyword arguments num_workers, prefetch_factor and
+          persistent_workers.
+        """
+        cache = self._load_cache()
+        machine = machine_key()
+        settings = cache.get(machine, {}).get(key)
+        if settings is None:
+            num_batches = max(1, math.ceil(len(dataset) / batch_size))
+            results = []
+            for num_workers, prefetch_factor in self.candidates(num_batches):
+                rate = self.trial(dataset, batch_size, shuffle, num_workers, prefetch_factor)
+                print(
+                    f"Loader '{key}': {num_workers} workers, prefetch {prefetch_factor}: "
+                    f"{rate:.1f} samples/s"
+                )
+                results.append((rate, -num_workers, num_workers, prefetch_factor))
+            # fastest first, fewer workers on ties
+            rate, _, num_workers, prefetch_factor = max(results)
+            settings = {
+                "num_workers": num_workers,
+                "prefetch_factor": prefetch_factor,
+                "samples_per_sec": round(rate, 1),
+            }
+            cache.setdefault(machine, {})[key] = settings
+            self._save_cache(cache)
+        print(
+            f"Loader '{key}': using {settings['num_workers']} workers, "
+            f"prefetch {settings['prefetch_factor']}"
+        )
+        return {
+            "num_workers": settings["num_workers"],
+            "prefetch_factor": settings["prefetch_factor"],
+            "persistent_workers": settings["num_workers"] > 0,
+        }
+
+
+def main():
+    print(f"Loader autotuner is ready to use on {machine_key()}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Columnar index of metadata.csv, built by metadata_generator.py.
+
+The index is a directory of .npy columns plus an index.json manifest. Rows are
+sorted by split and resolution, so every (split, resolution) group is one
+contiguous row range listed in the manifest; split and resolution are never
+stored per row. Paths are stored as a categorical directory code and a file
+name, and the data directory is joined once per directory instead of once per
+row. Columns are memory-mapped, so loading a split only reads its own rows.
+
+The train/valid/test subset and cross-validation fold of every row (see
+src/data/splits.py) are computed once when the index is built and stored with it,
+so every run and every fold job reads the same membership.
+
+Classes:
+- MetadataIndex: Reader returning the rows of one split as a DataFrame.
+
+Functions:
+- write_metadata_index(metadata_df, index_dir): Build the index from metadata rows.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.constants import NATIVE_RESOLUTION, SPLIT_RATIOS, NUM_FOLDS
+from src.data.splits import SUBSETS, assign_subsets, add_split_columns
+
+METADATA_INDEX_DIR = "metadata_index"
+MANIFEST_FILE = "index.json"
+PATH_COLUMNS = ("image_path", "mask_path", "bitmask_path")
+
+
+def write_metadata_index(
+    metadata_df, index_dir, ratios=SPLIT_RATIOS, num_folds=NUM_FOLDS
+):
+    """
+    Build the columnar index. It is written next to index_dir and moved into place
+    once complete.
+
+    Args:
+    - metadata_df (pd.DataFrame): Rows of metadata.csv.
+    - index_dir (str): Directory to write the index to.
+    - ratios (tuple): (train, valid, test) fractions of the subset assignment.
+    - num_folds (int): Number of cross-validation folds, 0 for none.
+    """
+    df = metadata_df.copy()
+    if "resolution" not in df.columns:
+        df["resolution"] = NATIVE_RESOLUTION
+    df = df.sort_values(["split", "resolution"], kind="stable").reset_index(drop=True)
+
+    tmp_dir = index_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    groups = df.groupby(["split", "resolution"], sort=False).indices
+    manifest = {
+        "num_rows": len(df),
+        "groups": [
+            [split, resolution, int(rows[0]), int(rows[-1]) + 1]
+            for (split, resolution), rows in groups.items()
+        ],
+        "path_dirs": {},
+        "split_ratios": list(ratios),
+        "num_folds": num_folds,
+    }
+    image_ids = df["image_id"].astype(str).to_numpy("U")
+    subsets, folds = assign_subsets(image_ids, ratios, num_folds)
+    np.save(os.path.join(tmp_dir, "image_id.npy"), image_ids)
+    np.save(os.path.join(tmp_dir, "subset.npy"), subsets)
+    np.save(os.path.join(tmp_dir, "fold.npy"), folds)
+    for column in PATH_COLUMNS:
+        if column not in df.columns:
+            continue
+        parts = df[column].fillna("").astype(str).str.rpartition("/")
+        dirs = pd.Categorical(parts[0])
+        manifest["path_dirs"][column] = dirs.categories.tolist()
+        np.save(os.path.join(tmp_dir, f"{column}_dir.npy"), dirs.codes)
+        np.save(os.path.join(tmp_dir, f"{column}_name.npy"), parts[2].to_numpy("U"))
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    old_dir = index_dir.rstrip(os.sep) + ".old"
+    if os.path.isdir(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(tmp_dir, index_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class MetadataIndex:
+    """
+    Reader of the columnar metadata index.
+
+    Args:
+    - index_dir (str): Directory written by write_metadata_index.
+    """
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST_FILE)) as file:
+            self.manifest = json.load(file)
+        self._columns = {}
+
+    def _column(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(
+                os.path.join(self.index_dir, f"{name}.npy"), mmap_mode="r"
+            )
+        return self._columns[name]
+
+    def rows(self, split, img_size=None):
+        """
+        Rows of one split, per image at the resolution select_resolution would pick: the
+        pre-resized copy of img_size, or the original file of images without one.
+
+        Args:
+        - split (str): Split name (e.g. "experiment").
+        - img_size (tuple): Wanted (height, width), None for the original files.
+
+        Returns:
+        - tuple: (resolution of every row, row numbers), both empty for an unknown split.
+        """
+        ranges = {
+            resolution: np.arange(start, end)
+            for group_split, resolution, start, end in self.manifest["groups"]
+            if group_split == split
+        }
+        native = ranges.get(NATIVE_RESOLUTION, np.arange(0))
+        resolution = f"{img_size[0]}x{img_size[1]}" if img_size else NATIVE_RESOLUTION
+        if resolution == NATIVE_RESOLUTION or resolution not in ranges:
+            return np.full(len(native), NATIVE_RESOLUTION, dtype=object), native
+        variant = ranges[resolution]
+        image_ids = self._column("image_id")
+        fallback = native[~np.isin(image_ids[native], image_ids[variant])]
+        resolutions = np.full(len(variant) + len(fallback), resolution, dtype=object)
+        resolutions[len(variant):] = NATIVE_RESOLUTION
+        return resolutions, np.concatenate([variant, fallback])
+
+    def frame(self, data_dir, split, img_size=None):
+        """
+        Metadata rows of one split with paths joined to data_dir, like load_metadata.
+
+        Args:
+        - data_dir (str): Directory the stored paths are relative to.
+        - split (str): Split name (e.g. "experiment").
+        - img_size (tuple): Wanted (height, width), None for the original files.
+
+        Returns:
+        - pd.DataFrame: image_id, split, resolution, the path columns and the stored
+          'subset' and 'fold' assignment.
+        """
+        resolutions, rows = self.rows(split, img_size)
+        columns = {
+            "image_id": np.asarray(self._column("image_id")[rows]).astype(object),
+            "split": split,
+        }
+        for column, dirs in self.manifest["path_dirs"].items():
+            prefixes = np.array([os.path.join(data_dir, path_dir, "") for path_dir in dirs])
+            names = np.asarray(self._column(f"{column}_name")[rows])
+            paths = np.char.add(prefixes[self._column(f"{column}_dir")[rows]], names)
+            paths = paths.astype(object)
+            # rows without such a file (e.g. no bit-packed mask) stay empty
+            paths[names == ""] = np.nan
+            columns[column] = paths
+        columns["resolution"] = resolutions
+        if "split_ratios" not in self.manifest:
+            # index written before subsets were stored
+            df = pd.DataFrame(columns, index=pd.RangeIndex(len(rows)))
+            return add_split_columns(df)
+        columns["subset"] = pd.Categorical.from_codes(
+            np.asarray(self._column("subset")[rows]), categories=SUBSETS
+        )
+        columns["fold"] = np.asarray(self._column("fold")[rows])
+        return pd.DataFrame(columns, index=pd.RangeIndex(len(rows)))
+
+
+def main():
+    print("Metadata index is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Encoder input normalisation for 8-bit images.
+
+Drop-in replacement for smp.encoders.get_preprocessing_fn. smp normalises every
+pixel with float64 arithmetic; since our inputs are always uint8, every channel
+has only 256 possible outputs, which are computed once into a lookup table.
+
+Classes:
+- EncoderNormalizer: Per-channel 256-entry lookup table for numpy images and a
+  fused scale+bias for batched tensors.
+"""
+
+import numpy as np
+import segmentation_models_pytorch as smp
+import torch
+
+
+class EncoderNormalizer:
+    """
+    Normalise uint8 images the same way as smp's preprocess_input.
+
+    The table is computed in float64 exactly like smp and then cast, so the numpy
+    path is bit-identical to np.array(preprocess_input(img), dtype=np.float32).
+
+    Args:
+    - mean (list): Per-channel mean, None for no mean subtraction.
+    - std (list): Per-channel std, None for no scaling.
+    - input_range (list): Value range expected by the encoder, [0, 1] or [0, 255].
+    - input_space (str): Channel order expected by the encoder, "RGB" or "BGR".
+    - dtype (str or np.dtype): Output dtype, float32 or float16 (default: float32).
+    """
+
+    def __init__(
+        self, mean=None, std=None, input_range=(0, 1), input_space="RGB", dtype=np.float32
+    ):
+        self.mean = mean
+        self.std = std
+        self.input_range = input_range
+        self.input_space = input_space
+        self.dtype = np.dtype(dtype)
+
+        values = np.arange(256, dtype=np.float64)
+        if input_range is not None and input_range[1] == 1:
+            values = values / 255.0
+        lut = np.repeat(values[None, :], 3, axis=0)
+        if mean is not None:
+            lut = lut - np.asarray(mean, dtype=np.float64)[:, None]
+        if std is not None:
+            lut = lut / np.asarray(std, dtype=np.float64)[:, None]
+        self.lut = lut.astype(self.dtype)
+        # lut[c, v] is affine in v, so its endpoints give the exact per-channel line
+        self._scale = (lut[:, 255] - lut[:, 0]) / 255
+        self._bias = lut[:, 0].copy()
+
+        self.channels = [2, 1, 0] if input_space == "BGR" else [0, 1, 2]
+        self._scale_bias = None
+
+    @classmethod
+    def from_encoder(cls, encoder_name, pretrained="imagenet", dtype=np.float32):
+        """
+        Build the normaliser for an smp encoder.
+
+        Args:
+        - encoder_name (str): smp encoder name (e.g. "efficientnet-b2").
+        - pretrained (str): Pretrained weights name (e.g. "imagenet").
+        - dtype (str or np.dtype): Output dtype, float32 or float16.
+
+        Returns:
+        - EncoderNormalizer: Normaliser matching the encoder's preprocessing.
+        """
+        params = smp.encoders.get_preprocessing_params(encoder_name, pretrained=pretrained)
+        return cls(dtype=dtype, **params)
+
+    def __call__(self, img):
+        """
+        Normalise one image.
+
+        Args:
+        - img (np.ndarray): uint8 image of shape (H, W, 3).
+
+        Returns:
+        - np.ndarray: Normalised image of shape (H, W, 3) in the output dtype.
+        """
+        if img.dtype != np.uint8:
+            raise TypeError(f"EncoderNormalizer expects uint8 images, got {img.dtype}.")
+        out = np.empty(img.shape, dtype=self.dtype)
+        for channel, source in enumerate(self.channels):
+            np.take(self.lut[channel], img[..., source], out=out[..., channel])
+        return out
+
+    def scale_bias(self, device=None):
+        """
+        Get the normalisation as a per-channel scale and bias on the uint8 value range.
+
+        Args:
+        - device (torch.device): Device to place the tensors on.
+
+        Returns:
+        - tuple: (scale, bias) float32 tensors of shape (1, 3, 1, 1).
+        """
+        if self._scale_bias is None or self._scale_bias[0].device != torch.device(
+            device or "cpu"
+        ):
+            scale = torch.tensor(self._scale, dtype=torch.float32).view(1, 3, 1, 1)
+            bias = torch.tensor(self._bias, dtype=torch.float32).view(1, 3, 1, 1)
+            self._scale_bias = (scale.to(device), bias.to(device))
+        return self._scale_bias
+
+    def normalize_tensor(self, imgs):
+        """
+        Normalise a batch of images with one fused multiply-add.
+
+        Args:
+        - imgs (torch.Tensor): uint8 or float batch of shape (B, 3, H, W) on the uint8
+          value range, in RGB order.
+
+        Returns:
+        - torch.Tensor: Normalised batch in float32, or float16 if that is the output dtype.
+        """
+        if self.input_space == "BGR":
+            imgs = imgs.flip(1)
+        scale, bias = self.scale_bias(imgs.device)
+        out = torch.addcmul(bias, imgs.float(), scale)
+        return out.half() if self.dtype == np.float16 else out
+
+
+def main():
+    print("Encoder normaliser is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Read-only access to packed (pre-decoded) ISN samples.
+
+A packed split is written once by ``src/data_preparation/dataset_packer.py`` and
+consists of three files inside the packed directory:
+1. ``{split}_images.npy``: uint8 array of shape (N, H, W, 3).
+2. ``{split}_masks.npy``: uint8 array of shape (N, H, W, 3) holding the RGB masks.
+3. ``{split}_index.csv``: ``image_id`` to ``row`` mapping for the two arrays.
+
+The arrays are opened with ``np.load(mmap_mode="r")`` so every DataLoader worker
+reads straight from the shared page cache, and no PNG decoding happens after the
+pack stage.
+
+The dataset generator (``dataset_generator.py --binary_dir``) writes the same layout
+without any PNG stage, in chunks ``{split}_images_{chunk:05d}.npy`` and
+``{split}_masks_{chunk:05d}.npy`` of equal length (the last one may be shorter),
+with ``row`` in the index counting across chunks. Its masks are bit-packed: uint8
+arrays of shape (N, ceil(H * W / 8)) holding ``np.packbits`` of each flattened
+binary mask.
+
+Classes:
+- PackedSampleStore: Lazily memory-maps one packed split and serves samples by row.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+PACKED_IMAGES_FILE = "{split}_images.npy"
+PACKED_MASKS_FILE = "{split}_masks.npy"
+PACKED_INDEX_FILE = "{split}_index.csv"
+PACKED_CHUNK_IMAGES_FILE = "{split}_images_{chunk:05d}.npy"
+PACKED_CHUNK_MASKS_FILE = "{split}_masks_{chunk:05d}.npy"
+
+
+def packed_paths(packed_dir, split):
+    """
+    Get the file paths of a packed split.
+
+    Args:
+    - packed_dir (str): Directory containing the packed files.
+    - split (str): Split name as used in metadata.csv (e.g. "experiment").
+
+    Returns:
+    - tuple: (images path, masks path, index path).
+    """
+    return (
+        os.path.join(packed_dir, PACKED_IMAGES_FILE.format(split=split)),
+        os.path.join(packed_dir, PACKED_MASKS_FILE.format(split=split)),
+        os.path.join(packed_dir, PACKED_INDEX_FILE.format(split=split)),
+    )
+
+
+def packed_chunk_paths(packed_dir, split, chunk):
+    """
+    Get the file paths of one chunk of a chunked packed split.
+
+    Args:
+    - packed_dir (str): Directory containing the packed files.
+    - split (str): Split name (e.g. "generated").
+    - chunk (int): Chunk number.
+
+    Returns:
+    - tuple: (images path, masks path).
+    """
+    return (
+        os.path.join(packed_dir, PACKED_CHUNK_IMAGES_FILE.format(split=split, chunk=chunk)),
+        os.path.join(packed_dir, PACKED_CHUNK_MASKS_FILE.format(split=split, chunk=chunk)),
+    )
+
+
+class PackedSampleStore:
+    """
+    Memory-mapped reader for one packed split.
+
+    The memory maps are opened on first access and are never pickled, so a store
+    can be handed to DataLoader workers and each worker maps the files itself.
+    Chunked splits map each chunk on first access to one of its rows.
+
+    Args:
+    - packed_dir (str): Directory containing the packed files.
+    - split (str): Split name as used in metadata.csv (e.g. "experiment").
+    """
+
+    def __init__(self, packed_dir, split):
+        self.packed_dir = packed_dir
+        self.split = split
+        self.images_path, self.masks_path, self.index_path = packed_paths(
+            packed_dir, split
+        )
+        if not os.path.isfile(self.index_path):
+            raise FileNotFoundError(
+                f"No packed '{split}' split found in {packed_dir}. "
+                "Run src/data_preparation/dataset_packer.py first."
+            )
+        if os.path.isfile(self.index_path + ".tmp"):
+            raise RuntimeError(
+                f"Packing the '{split}' split in {packed_dir} was interrupted, its arrays "
+                "may not match the index. Rerun src/data_preparation/dataset_packer.py."
+            )
+        index_df = pd.read_csv(self.index_path)
+        self.row_index = pd.Index(index_df["image_id"].astype(str))
+        self.rows = index_df["row"].to_numpy()
+        self.chunked = not os.path.isfile(self.images_path)
+        self.chunk_size = None
+        self.mask_bits = None
+        self._images = None
+        self._masks = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # np.memmap pickles as a full in-memory copy, let each process remap instead
+        state["_images"] = None
+        state["_masks"] = None
+        return state
+
+    def _open(self):
+        if self._images is not None:
+            return
+        if self.chunked:
+            self._images, self._masks = {}, {}
+            self._open_chunk(0)
+            self.chunk_size = len(self._images[0])
+            images, masks = self._images[0], self._masks[0]
+        else:
+            self._images = np.load(self.images_path, mmap_mode="r")
+            self._masks = np.load(self.masks_path, mmap_mode="r")
+            images, masks = self._images, self._masks
+        self.image_shape = images.shape[1:]
+        self.mask_bits = masks.ndim == 2
+
+    def _open_chunk(self, chunk):
+        images_path, masks_path = packed_chunk_paths(self.packed_dir, self.split, chunk)
+        self._images[chunk] = np.load(images_path, mmap_mode="r")
+        self._masks[chunk] = np.load(masks_path, mmap_mode="r")
+
+    def rows_for(self, image_ids):
+        """
+        Look up packed rows for the given image ids.
+
+        Args:
+        - image_ids (iterable): Image ids as listed in metadata.csv.
+
+        Returns:
+        - np.ndarray: Row numbers into the packed arrays.
+        """
+        positions = self.row_index.get_indexer(pd.Index(image_ids).astype(str))
+        if (positions < 0).any():
+            missing = list(pd.Index(image_ids)[positions < 0][:5])
+            raise KeyError(
+                f"Image ids {missing} are not in the packed '{self.split}' split, "
+                "re-run the pack stage."
+            )
+        return self.rows[positions]
+
+    def get(self, row):
+        """
+        Get the image and mask stored at a row.
+
+        Args:
+        - row (int): Row number into the packed arrays.
+
+        Returns:
+        - tuple: (image, mask) as read-only uint8 views of shape (H, W, 3). Bit-packed
+          masks (mask_bits) are returned unpacked, as a 0/1 uint8 array of shape (H, W).
+        """
+        self._open()
+        if self.chunked:
+            chunk, row = divmod(int(row), self.chunk_size)
+            if chunk not in self._images:
+                self._open_chunk(chunk)
+            image, mask = self._images[chunk][row], self._masks[chunk][row]
+        else:
+            image, mask = self._images[row], self._masks[row]
+        if self.mask_bits:
+            height, width = self.image_shape[:2]
+            mask = np.unpackbits(mask, count=height * width).reshape(height, width)
+        return image, mask
+
+
+def main():
+    print("Packed sample store is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
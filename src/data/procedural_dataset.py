@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Synthetic shape samples generated on the fly, without files.
+
+Sample i is drawn by ShapeImageGenerator.create_batch from a NumPy generator seeded
+with (seed, i), so it is the same in every worker, process and run. The index space
+is virtually unbounded; FreshSampleSampler draws a new set of indices from it every
+epoch, so training sees new samples each epoch and stays reproducible under a fixed
+torch seed.
+
+Classes:
+- ProceduralShapeSet: Map-style dataset, drop-in for ISNSet.
+- FreshSampleSampler: Sampler drawing samples_per_epoch new indices every epoch.
+"""
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+
+from src.data.dataset import SampleProcessor
+from src.data_preparation.dataset_generator import ShapeImageGenerator
+
+UNBOUNDED_LENGTH = 2**48
+
+
+class ProceduralShapeSet(SampleProcessor, Dataset):
+    """
+    Dataset generating the image/mask pair of every index on the fly.
+
+    Masks are white rectangles on black, as written by the generator, and are
+    matched to white and black in class_rgb_values like bit-packed masks.
+
+    Args:
+    - length (int): Number of indices (default: UNBOUNDED_LENGTH).
+    - seed (int): Seed of the sample stream, use different seeds for train, valid and
+      test (default: 0).
+    - samples_per_epoch (int): Optional number of samples a training epoch draws with
+      FreshSampleSampler, instead of iterating over all indices.
+    - min_shape_px (int): Minimum size of the shapes (default: 20).
+    - max_shape_px (int): Maximum size of the shapes (default: 40).
+    - **processing: transform, preprocess_fn, class_rgb_values, mask_mode, mask_transform,
+      raw_output and img_size, as for ISNSet. img_size is required and samples are
+      generated at that size.
+    """
+
+    def __init__(
+        self,
+        length=UNBOUNDED_LENGTH,
+        seed=0,
+        samples_per_epoch=None,
+        min_shape_px=20,
+        max_shape_px=40,
+        **processing,
+    ):
+        self.init_processing(**processing)
+        if self.img_size is None:
+            raise ValueError("ProceduralShapeSet needs img_size.")
+        self.length = length
+        self.seed = seed
+        self.samples_per_epoch = samples_per_epoch
+        height, width = self.img_size
+        # the generator canvas is (img_height, img_width) as PIL (width, height)
+        self.generator = ShapeImageGenerator(
+            img_height=width,
+            img_width=height,
+            min_shape_px=min_shape_px,
+            max_shape_px=max_shape_px,
+            num_images=0,
+            image_dir=None,
+            mask_dir=None,
+            seed=seed,
+        )
+
+    def __len__(self):
+        return self.length
+
+    def _load_pair(self, idx):
+        """
+        Generate the raw image and mask of an index.
+
+        Args:
+        - idx (int): Index of the sample.
+
+        Returns:
+        - tuple: uint8 image of shape (H, W, 3) and the mask as decode_pair returns it.
+        """
+        if not 0 <= idx < self.length:
+            raise IndexError(f"Index {idx} out of range for {self.length} samples.")
+        rng = np.random.default_rng([self.seed, idx])
+        images, masks = self.generator.create_batch(1, rng)
+        return np.ascontiguousarray(images[0]), self.bits_to_mask(masks[0] // 255)
+
+    def __getitem__(self, idx):
+        return self.process_pair(*self._load_pair(idx))
+
+
+class FreshSampleSampler(Sampler):
+    """
+    Draw samples_per_epoch indices of a procedural dataset with replacement, new ones
+    every epoch. The draw is seeded from the torch RNG like RandomSampler, so
+    pl.seed_everything makes the sequence of epochs reproducible.
+
+    Args:
+    - dataset (ProceduralShapeSet): Dataset with samples_per_epoch set.
+    """
+
+    def __init__(self, dataset):
+        self.length = len(dataset)
+        self.samples_per_epoch = dataset.samples_per_epoch
+
+    def __len__(self):
+        return self.samples_per_epoch
+
+    def __iter__(self):
+        seed = int(torch.empty((), dtype=torch.int64).random_().item())
+        generator = torch.Generator().manual_seed(seed)
+        yield from torch.randint(
+            self.length, (self.samples_per_epoch,), generator=generator
+        ).tolist()
+
+
+def main():
+    print("Procedural dataset is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Shared-memory LRU cache of decoded samples.
+
+The cache is a fixed pool of equally sized slots held in shared-memory torch
+tensors, together with the key/slot tables, LRU clock and hit/miss counters.
+DataLoader workers inherit the same tensors, so a sample decoded by any worker
+of any loader is a plain memory read for every other worker afterwards.
+
+Classes:
+- SharedSampleCache: Byte-budgeted LRU cache shared between DataLoader workers.
+"""
+
+import multiprocessing as mp
+
+import numpy as np
+import torch
+
+
+class SharedSampleCache:
+    """
+    Byte-budgeted LRU cache of decoded sample arrays shared between processes.
+
+    The cache has to be bound to a key range and a sample layout with bind() in the
+    main process, before the DataLoader workers are started. Every cached sample is
+    a tuple of arrays whose shapes and dtypes match that layout; other samples are
+    simply not cached.
+
+    Args:
+    - budget_bytes (int): Maximum number of bytes to use for cached samples.
+    """
+
+    # counter slots
+    CLOCK, HITS, MISSES, EVICTIONS, USED = range(5)
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = int(budget_bytes)
+        self.lock = mp.Lock()
+        self.layout = None
+        self.num_slots = 0
+
+    def bind(self, num_keys, sample):
+        """
+        Allocate the shared pool for keys in [0, num_keys) and the layout of a sample.
+
+        Args:
+        - num_keys (int): Number of distinct keys that will be used.
+        - sample (tuple): Example sample, a tuple of np.ndarray.
+        """
+        self.layout = []
+        offset = 0
+        for array in sample:
+            self.layout.append((offset, array.nbytes, array.shape, array.dtype))
+            offset += array.nbytes
+        self.slot_nbytes = offset
+        self.num_slots = max(0, min(num_keys, self.budget_bytes // self.slot_nbytes))
+
+        self.data = torch.empty(
+            (self.num_slots, self.slot_nbytes), dtype=torch.uint8
+        ).share_memory_()
+        self.slot_of_key = torch.full((num_keys,), -1, dtype=torch.int64).share_memory_()
+        self.key_of_slot = torch.full(
+            (self.num_slots,), -1, dtype=torch.int64
+        ).share_memory_()
+        self.last_used = torch.zeros(self.num_slots, dtype=torch.int64).share_memory_()
+        self.counters = torch.zeros(5, dtype=torch.int64).share_memory_()
+
+    def _fits(self, sample):
+        return len(sample) == len(self.layout) and all(
+            array.shape == shape and array.dtype == dtype
+            for array, (_, _, shape, dtype) in zip(sample, self.layout)
+        )
+
+    def get(self, key):
+        """
+        Get a cached sample.
+
+        Args:
+        - key (int): Sample key.
+
+        Returns:
+        - tuple or None: Copies of the cached arrays, or None on a miss.
+        """
+        with self.lock:
+            slot = int(self.slot_of_key[key])
+            if slot < 0:
+                self.counters[self.MISSES] += 1
+                return None
+            self.counters[self.HITS] += 1
+            self.counters[self.CLOCK] += 1
+            self.last_used[slot] = self.counters[self.CLOCK]
+            row = self.data[slot].numpy()
+            # copy while holding the lock, the slot may be evicted right after
+            return tuple(
+                row[offset:offset + nbytes].view(dtype).reshape(shape).copy()
+                for offset, nbytes, shape, dtype in self.layout
+            )
+
+    def put(self, key, sample):
+        """
+        Insert a sample, evicting the least recently used one when the pool is full.
+
+        Args:
+        - key (int): Sample key.
+        - sample (tuple): Tuple of np.ndarray matching the bound layout.
+
+        Returns:
+        - bool: True if the sample is cached after the call.
+        """
+        if self.num_slots == 0 or not self._fits(sample):
+            return False
+        with self.lock:
+            if self.slot_of_key[key] >= 0:
+                # another worker got there first
+                return True
+            if self.counters[self.USED] < self.num_slots:
+                slot = int(self.counters[self.USED])
+                self.counters[self.USED] += 1
+            else:
+                slot = int(torch.argmin(self.last_used))
+                self.slot_of_key[self.key_of_slot[slot]] = -1
+                self.counters[self.EVICTIONS] += 1
+            row = self.data[slot].numpy()
+            for array, (offset, nbytes, _, _) in zip(sample, self.layout):
+                row[offset:offset + nbytes] = np.ascontiguousarray(array).reshape(-1).view(
+                    np.uint8
+                )
+            self.key_of_slot[slot] = key
+            self.slot_of_key[key] = slot
+            self.counters[self.CLOCK] += 1
+            self.last_used[slot] = self.counters[self.CLOCK]
+        return True
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+        - dict: hits, misses, evictions, cached samples, slots and bytes in use.
+        """
+        if self.layout is None:
+            return {"hits": 0, "misses": 0, "evictions": 0, "cached": 0, "slots": 0, "bytes": 0}
+        with self.lock:
+            counters = self.counters.tolist()
+        return {
+            "hits": counters[self.HITS],
+            "misses": counters[self.MISSES],
+            "evictions": counters[self.EVICTIONS],
+            "cached": counters[self.USED],
+            "slots": self.num_slots,
+            "bytes": counters[self.USED] * self.slot_nbytes,
+        }
+
+
+def main():
+    print("Shared sample cache is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Streaming dataset over the tar shards written by src/data_preparation/shard_writer.py.
+
+Shards are read front to back, so throughput is bound by sequential read bandwidth
+rather than by per-file open and seek latency. Randomness comes from shuffling the
+shard order every epoch and from an in-memory shuffle buffer of samples.
+
+The shard order of an epoch must be the same in every DataLoader worker and on every
+distributed rank, otherwise the per-worker slices of it overlap. It is therefore
+seeded from the dataset seed and the epoch number, which ShardEpochCallback passes
+to set_epoch at the start of every training epoch.
+
+Classes:
+- ISNShardSet: IterableDataset alternative to ISNSet.
+- ShardEpochCallback: Passes the epoch to the training dataset.
+"""
+
+import io
+import os
+import random
+import tarfile
+
+import pandas as pd
+from PIL import Image
+import pytorch_lightning as pl
+import torch
+import torch.distributed as dist
+from torch.utils.data import IterableDataset, get_worker_info
+
+from src.data.dataset import SampleProcessor
+from src.data_preparation.shard_writer import SHARD_INDEX_FILE
+
+
+class ISNShardSet(SampleProcessor, IterableDataset):
+    """
+    IterableDataset streaming image/mask pairs from tar shards.
+
+    Shards are split between DataLoader workers (and distributed ranks), so every
+    sample is yielded once per epoch. Use more shards than workers times ranks,
+    otherwise some workers idle.
+
+    Args:
+    - shard_dir (str): Directory containing the shards and their index files.
+    - splits (list): metadata.csv split names whose shards are read (e.g. ["experiment"]).
+    - image_ids (iterable): Optional image ids to keep, other samples are skipped and
+      shards without any of them are not read. This is how train, valid and test sets
+      are carved out of the shards of a split.
+    - shuffle (bool): Shuffle the shard order every epoch and samples through the buffer.
+    - shuffle_buffer (int): Number of samples held in memory for shuffling (default: 256).
+    - seed (int): Base seed of the shuffling, combined with the epoch set by set_epoch
+      (default: 0).
+    - **processing: transform, preprocess_fn, class_rgb_values, mask_mode, mask_transform,
+      raw_output and img_size, as for ISNSet.
+    """
+
+    def __init__(
+        self,
+        shard_dir,
+        splits,
+        image_ids=None,
+        shuffle=False,
+        shuffle_buffer=256,
+        seed=0,
+        **processing,
+    ):
+        super().__init__()
+        self.init_processing(**processing)
+        index_df = pd.concat(
+            [
+                pd.read_csv(os.path.join(shard_dir, SHARD_INDEX_FILE.format(split=split)))
+                for split in splits
+            ]
+        )
+        index_df["image_id"] = index_df["image_id"].astype(str)
+        if image_ids is not None:
+            index_df = index_df[index_df["image_id"].isin(pd.Index(image_ids).astype(str))]
+        self.image_ids = frozenset(index_df["image_id"])
+        self.shards = [os.path.join(shard_dir, name) for name in index_df["shard"].unique()]
+        self.num_samples = len(index_df)
+        self.shuffle = shuffle
+        self.shuffle_buffer = shuffle_buffer
+        self.seed = seed
+        # in shared memory, so persistent workers see the epochs set after they started
+        self._epoch = torch.zeros((), dtype=torch.int64).share_memory_()
+
+    def __len__(self):
+        return self.num_samples
+
+    def set_epoch(self, epoch):
+        """
+        Set the epoch whose shard order the next iteration uses. Must be called with
+        the same epoch on every rank before the DataLoader iterator of the epoch is
+        created.
+
+        Args:
+        - epoch (int): Current epoch.
+        """
+        self._epoch.fill_(epoch)
+
+    def _epoch_seed(self):
+        """Seed shared by all workers and ranks of the current epoch."""
+        return self.seed * 1000003 + int(self._epoch)
+
+    def _my_shards(self, epoch_seed):
+        shards = list(self.shards)
+        if self.shuffle:
+            random.Random(epoch_seed).shuffle(shards)
+        info = get_worker_info()
+        num_workers, worker_id = (info.num_workers, info.id) if info else (1, 0)
+        world_size, rank = 1, 0
+        if dist.is_available() and dist.is_initialized():
+            world_size, rank = dist.get_world_size(), dist.get_rank()
+        slot = rank * num_workers + worker_id
+        return shards[slot::world_size * num_workers], slot
+
+    def _decode_members(self, image, mask):
+        (_, image_data), (mask_ext, mask_data) = image, mask
+        if mask_ext == "bits":
+            return (
+                self.decode_image(Image.open(io.BytesIO(image_data))),
+                self.expand_bitmask(mask_data),
+            )
+        return self.decode_pair(
+            Image.open(io.BytesIO(image_data)), Image.open(io.BytesIO(mask_data))
+        )
+
+    def _read_shard(self, path):
+        """Yield decoded (image, mask) pairs of one shard, in file order."""
+        pending = {}
+        with tarfile.open(path, mode="r|") as tar:
+            for member in tar:
+                image_id, kind, ext = member.name.split(".", 2)
+                if image_id not in self.image_ids:
+                    continue
+                pending.setdefault(image_id, {})[kind] = (ext, tar.extractfile(member).read())
+                if len(pending[image_id]) == 2:
+                    pair = pending.pop(image_id)
+                    yield self._decode_members(pair["image"], pair["mask"])
+
+    def _samples(self, shards):
+        for path in shards:
+            yield from self._read_shard(path)
+
+    def __iter__(self):
+        epoch_seed = self._epoch_seed()
+        shards, slot = self._my_shards(epoch_seed)
+        if not self.shuffle:
+            for img, mask in self._samples(shards):
+                yield self.process_pair(img, mask)
+            return
+
+        rng = random.Random(epoch_seed * 1000003 + slot)
+        buffer = []
+        for sample in self._samples(shards):
+            if len(buffer) < self.shuffle_buffer:
+                buffer.append(sample)
+                continue
+            pick = rng.randrange(len(buffer))
+            buffer[pick], sample = sample, buffer[pick]
+            yield self.process_pair(*sample)
+        rng.shuffle(buffer)
+        for sample in buffer:
+            yield self.process_pair(*sample)
+
+
+class ShardEpochCallback(pl.Callback):
+    """
+    Call set_epoch of the training dataset at the start of every training epoch, like
+    Lightning does for the set_epoch of samplers, which an IterableDataset cannot have.
+    A no-op for datasets without set_epoch.
+    """
+
+    def on_train_epoch_start(self, trainer, pl_module):
+        dataset = getattr(trainer.train_dataloader, "dataset", None)
+        if callable(getattr(dataset, "set_epoch", None)):
+            dataset.set_epoch(trainer.current_epoch)
+
+
+def main():
+    print("Shard dataset is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Deterministic train/valid/test and k-fold assignment from a hash of image_id.
+
+Every image_id is hashed to a number u in [0, 1) with pandas' fixed-key SipHash,
+which is the same in every process and on every machine. The subsets are then
+fixed ranges of u: train [0, train), valid [train, train + valid), test the rest.
+For k-fold cross-validation, the non-test range [0, train + valid) is cut into k
+equal folds. Adding or removing samples never moves any other sample.
+
+Functions:
+- hash_fractions(image_ids): Stable number in [0, 1) per image_id.
+- assign_subsets(image_ids, ratios, num_folds): Subset and fold codes per image_id.
+- add_split_columns(df, ratios, num_folds): 'subset' and 'fold' columns for a DataFrame.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.constants import SPLIT_RATIOS, NUM_FOLDS
+
+SUBSETS = ("train", "valid", "test")
+TEST_FOLD = -1  # fold of the test rows, which are never part of a fold
+
+
+def hash_fractions(image_ids):
+    """
+    Map image ids to stable numbers in [0, 1).
+
+    Args:
+    - image_ids (iterable): Image ids, hashed as strings.
+
+    Returns:
+    - np.ndarray: float64 array with one value per id.
+    """
+    hashes = pd.util.hash_pandas_object(
+        pd.Series(image_ids, dtype=str), index=False
+    ).to_numpy()
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
+
+def assign_subsets(image_ids, ratios=SPLIT_RATIOS, num_folds=NUM_FOLDS):
+    """
+    Assign every image id to a subset and, outside the test subset, to a fold.
+
+    Args:
+    - image_ids (iterable): Image ids.
+    - ratios (tuple): (train, valid, test) fractions, summing to 1.
+    - num_folds (int): Number of cross-validation folds, 0 for none.
+
+    Returns:
+    - tuple: (subset codes, fold codes) as int8 arrays; subset codes index SUBSETS and
+      the fold is TEST_FOLD for test rows (and for every row without folds).
+    """
+    if not np.isclose(sum(ratios), 1.0):
+        raise ValueError(f"Split ratios must sum to 1, got {ratios}.")
+    fractions = hash_fractions(image_ids)
+    train_end = ratios[0]
+    test_start = ratios[0] + ratios[1]
+    subsets = np.searchsorted([train_end, test_start], fractions, side="right").astype(
+        np.int8
+    )
+    folds = np.full(len(fractions), TEST_FOLD, dtype=np.int8)
+    if num_folds:
+        not_test = subsets != SUBSETS.index("test")
+        folds[not_test] = np.minimum(
+            fractions[not_test] / test_start * num_folds, num_folds - 1
+        ).astype(np.int8)
+    return subsets, folds
+
+
+def add_split_columns(df, ratios=SPLIT_RATIOS, num_folds=NUM_FOLDS):
+    """
+    Add the categorical 'subset' and integer 'fold' columns to metadata rows.
+
+    Args:
+    - df (pd.DataFrame): Metadata with an 'image_id' column.
+    - ratios (tuple): (train, valid, test) fractions.
+    - num_folds (int): Number of cross-validation folds, 0 for none.
+
+    Returns:
+    - pd.DataFrame: df with the two columns set.
+    """
+    subsets, folds = assign_subsets(df["image_id"].to_numpy(), ratios, num_folds)
+    df["subset"] = pd.Categorical.from_codes(subsets, categories=SUBSETS)
+    df["fold"] = folds
+    return df
+
+
+def main():
+    print("Split assignment is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
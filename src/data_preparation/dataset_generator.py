@@ -17,14 +17,54 @@ Your code has been rated at 9.86/10 (previous run: 8.99/10, +0.87)
    
 Generates random shape images and masks based on provided configurations.
 
+Images are generated in shards of shard_size consecutive image numbers. Every shard
+draws from its own random.Random seeded from the master seed and the shard number,
+so the same seed gives the same files whether the shards run in one process or in
+a pool of --workers processes. File names use the global image number and stay
+unique across shards.
+
+create_batch is a vectorised NumPy version of the PIL drawing path for whole batches
+of images: shape parameters are sampled for all images at once, positions directly
+within bounds with the same distribution as the rejection loop of draw_random_shape,
+and every shape slot is painted into all images at once through precomputed
+shape patches. With --vectorised the shards are generated with it.
+
+With --binary_dir no PNGs are written at all: every shard becomes one chunk of the
+packed format of src/data/packed_store.py, uint8 image arrays and bit-packed masks
+written straight from create_batch, plus an index of all chunks. Training reads it
+with the "packed" backend.
+
 """
 
 
 import argparse
+import glob
 import random
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
 from PIL import Image, ImageDraw
 from tqdm import tqdm
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data.packed_store import (
+    PACKED_CHUNK_IMAGES_FILE,
+    PACKED_CHUNK_MASKS_FILE,
+    packed_chunk_paths,
+    packed_paths,
+)
+
+
+SHAPE_COLOURS = np.array([(255, 0, 0), (0, 255, 0), (0, 0, 255)], dtype=np.uint8)
+MIN_SHAPES, MAX_SHAPES = 5, 10
+
+
+def shard_seed(seed, shard):
+    """Seed of one shard, derived from the master seed with a NumPy SeedSequence."""
+    return int(np.random.SeedSequence([seed, shard]).generate_state(1)[0])
 
 
 class ShapeImageGenerator:
@@ -40,6 +80,12 @@ class ShapeImageGenerator:
     - num_images (int): Number of images to generate.
     - image_dir (str): Directory to save generated images.
     - mask_dir (str): Directory to save generated masks.
+    - seed (int): Master seed of the shard seeds, drawn at random when None.
+    - vectorised (bool): Generate shards in batches with create_batch.
+    - batch_size (int): Images per create_batch call of a vectorised shard.
+    - binary_dir (str): Directory of the packed output, None to write PNGs.
+    - split (str): Split name of the packed output.
+    - rng (random.Random): Random source of the shape drawing methods.
     """
 
     def __init__(
@@ -51,6 +97,11 @@ class ShapeImageGenerator:
         num_images=100,
         image_dir="data/raw/images",
         mask_dir="data/raw/masks",
+        seed=None,
+        vectorised=False,
+        batch_size=256,
+        binary_dir=None,
+        split="generated",
     ):
         self.img_height = img_height
         self.img_width = img_width
@@ -59,32 +110,36 @@ class ShapeImageGenerator:
         self.num_images = num_images
         self.image_dir = image_dir
         self.mask_dir = mask_dir
-
-        os.makedirs(self.image_dir, exist_ok=True)
-        os.makedirs(self.mask_dir, exist_ok=True)
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.vectorised = vectorised
+        self.batch_size = batch_size
+        self.shape_table = None
+        self.binary_dir = binary_dir
+        self.split = split
 
     def random_color(self):
         """Generate a random color from RGB."""
         colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
-        return random.choice(colors)
+        return self.rng.choice(colors)
 
     def random_point(self):
         """Generate a random point within the image dimensions."""
-        return random.randint(0, self.img_height - 1), random.randint(
+        return self.rng.randint(0, self.img_height - 1), self.rng.randint(
             0, self.img_width - 1
         )
 
     def random_size(self):
         """Generate a random size between min_shape_px and
         max_shape_px pixels for both width and height."""
-        width = random.randint(self.min_shape_px, self.max_shape_px)
-        height = random.randint(self.min_shape_px, self.max_shape_px)
+        width = self.rng.randint(self.min_shape_px, self.max_shape_px)
+        height = self.rng.randint(self.min_shape_px, self.max_shape_px)
         return width, height
 
     def draw_random_shape(self, draw, mask_draw):
         """Draw a random shape (ellipse or rectangle) on the given drawing object.
         Also draw rectangles on the mask drawing object."""
-        shape_type = random.choice(["ellipse", "rectangle"])
+        shape_type = self.rng.choice(["ellipse", "rectangle"])
         color = self.random_color()
 
         while True:
@@ -112,15 +167,120 @@ class ShapeImageGenerator:
         mask_draw = ImageDraw.Draw(mask)
 
         # generate min 5 shapes and max 10 shapes
-        for _ in range(random.randint(5, 10)):
+        for _ in range(self.rng.randint(MIN_SHAPES, MAX_SHAPES)):
             self.draw_random_shape(draw, mask_draw)
 
         return image, mask
 
-    def generate_and_save_images_and_masks(self):
-        """Generate and save N images and masks
-        with specified configurations."""
-        for i in tqdm(range(1, self.num_images + 1)):
+    def _sample_extents(self, rng, limit, shape):
+        """
+        Sample (start, size) along one axis as accepted by the rejection loop of
+        draw_random_shape: size uniform in [min_shape_px, max_shape_px], start uniform
+        in [0, limit - 1], kept if start + size <= limit. Accepted sizes are weighted by
+        their number of valid starts, and the start is uniform among those.
+        """
+        sizes = np.arange(self.min_shape_px, self.max_shape_px + 1)
+        weights = np.clip(limit - sizes + 1, 0, None).astype(np.float64)
+        size = rng.choice(sizes, size=shape, p=weights / weights.sum())
+        start = rng.integers(0, limit - size + 1)
+        return start, size
+
+    def _shape_table(self):
+        """
+        Pixels covered by every shape, indexed [is_rectangle, height, width, dy, dx]
+        with sizes counted from min_shape_px and (dy, dx) relative to the top left
+        corner. PIL boxes include both corners, so a shape of size s covers s + 1
+        pixels; ellipses have the box centre and radii (s + 1) / 2.
+        """
+        if self.shape_table is None:
+            sizes = np.arange(self.min_shape_px, self.max_shape_px + 1)[:, None, None]
+            offsets = np.arange(self.max_shape_px + 1)
+            along = offsets[None, None, :] <= sizes  # [size, 1, offset]
+            radial = ((2 * offsets[None, None, :] - sizes) / (sizes + 1)) ** 2
+            # [height, width, dy, dx]
+            box = along[:, None, :, :].transpose(0, 1, 3, 2) & along[None, :, :, :]
+            ellipse = (
+                radial[:, None, :, :].transpose(0, 1, 3, 2) + radial[None, :, :, :]
+            ) <= 1
+            self.shape_table = np.stack([box & ellipse, box])
+        return self.shape_table
+
+    def create_batch(self, num_images, rng=None):
+        """
+        Create a batch of images and masks with the shape statistics of
+        create_image_and_mask_with_random_shapes, without PIL.
+
+        Args:
+        - num_images (int): Number of images N.
+        - rng (np.random.Generator): Random source (default: seeded from self.rng).
+
+        Returns:
+        - tuple: uint8 images of shape (N, H, W, 3) and uint8 masks of shape (N, H, W)
+          with 255 on rectangles, H and W as in the saved PNGs. The images are a view
+          of an (N, H, W, 4) array.
+        """
+        if rng is None:
+            rng = np.random.default_rng(self.rng.getrandbits(64))
+        # the PIL canvas is (img_height, img_width) as (width, height), x is the column
+        rows, cols = self.img_width, self.img_height
+        shape = (num_images, MAX_SHAPES)
+        counts = rng.integers(MIN_SHAPES, MAX_SHAPES + 1, size=num_images)
+        is_rectangle = rng.integers(0, 2, size=shape)
+        colours = rng.integers(0, len(SHAPE_COLOURS), size=shape)
+        x1, width = self._sample_extents(rng, cols, shape)
+        y1, height = self._sample_extents(rng, rows, shape)
+
+        table = self._shape_table()
+        # RGBA pixels are painted as one uint32 each, alpha is dropped at the end
+        pixel_values = np.concatenate(
+            [SHAPE_COLOURS, np.full((len(SHAPE_COLOURS), 1), 255, np.uint8)], axis=1
+        ).view(np.uint32)[:, 0]
+        canvas = np.full((num_images, rows, cols, 4), 255, dtype=np.uint8)
+        flat_canvas = canvas.view(np.uint32).reshape(-1)
+        masks = np.zeros((num_images, rows, cols), dtype=np.uint8)
+        flat_masks = masks.reshape(-1)
+        offsets = np.arange(self.max_shape_px + 1)
+        patch = offsets[:, None] * cols + offsets[None, :]
+        corners = (np.arange(num_images) * rows * cols)[:, None] + y1 * cols + x1
+        for slot in range(MAX_SHAPES):
+            covered = (
+                table[is_rectangle[:, slot], height[:, slot] - self.min_shape_px,
+                      width[:, slot] - self.min_shape_px]
+                & (slot < counts)[:, None, None]
+                & (y1[:, slot, None, None] + offsets[None, :, None] < rows)
+                & (x1[:, slot, None, None] + offsets[None, None, :] < cols)
+            )
+            pixels = (corners[:, slot, None, None] + patch)[covered]
+            per_image = covered.sum(axis=(1, 2))
+            flat_canvas[pixels] = np.repeat(pixel_values[colours[:, slot]], per_image)
+            flat_masks[pixels[np.repeat(is_rectangle[:, slot] == 1, per_image)]] = 255
+        return canvas[..., :3], masks
+
+    def generate_shard(self, shard, start, stop):
+        """
+        Generate and save images start..stop - 1 (1-based) with the seed of the shard.
+
+        Args:
+        - shard (int): Shard number.
+        - start (int): First image number of the shard.
+        - stop (int): Image number after the last one of the shard.
+
+        Returns:
+        - int: Number of saved pairs.
+        """
+        self.rng = random.Random(shard_seed(self.seed, shard))
+        if self.binary_dir:
+            return self.write_chunk(shard, start, stop)
+        if self.vectorised:
+            rng = np.random.default_rng(shard_seed(self.seed, shard))
+            for batch_start in range(start, stop, self.batch_size):
+                batch_stop = min(batch_start + self.batch_size, stop)
+                images, masks = self.create_batch(batch_stop - batch_start, rng)
+                for i, image, mask in zip(range(batch_start, batch_stop), images, masks):
+                    Image.fromarray(image).save(os.path.join(self.image_dir, f"{i}_image.png"))
+                    Image.fromarray(mask).save(os.path.join(self.mask_dir, f"{i}_mask.png"))
+            return stop - start
+        for i in range(start, stop):
             image, mask = self.create_image_and_mask_with_random_shapes()
             image_path = os.path.join(self.image_dir, f"{i}_image.png")
             mask_path = os.path.join(self.mask_dir, f"{i}_mask.png")
@@ -129,6 +289,103 @@ class ShapeImageGenerator:
             mask.save(mask_path)
 
             # print(f"Saved {image_path} and {mask_path}")
+        return stop - start
+
+    def write_chunk(self, shard, start, stop):
+        """
+        Generate images start..stop - 1 with create_batch and write them as chunk
+        number shard of the packed split, images as uint8 arrays and masks
+        bit-packed. Arrays are filled batch by batch through np.memmap and moved into
+        place when complete.
+
+        Returns:
+        - int: Number of written pairs.
+        """
+        rng = np.random.default_rng(shard_seed(self.seed, shard))
+        # same (rows, cols) as the PNGs, see create_batch
+        rows, cols = self.img_width, self.img_height
+        images_path, masks_path = packed_chunk_paths(self.binary_dir, self.split, shard)
+        images = np.lib.format.open_memmap(
+            images_path + ".tmp.npy", mode="w+", dtype=np.uint8,
+            shape=(stop - start, rows, cols, 3),
+        )
+        masks = np.lib.format.open_memmap(
+            masks_path + ".tmp.npy", mode="w+", dtype=np.uint8,
+            shape=(stop - start, (rows * cols + 7) // 8),
+        )
+        for batch_start in range(0, stop - start, self.batch_size):
+            batch_stop = min(batch_start + self.batch_size, stop - start)
+            batch_images, batch_masks = self.create_batch(batch_stop - batch_start, rng)
+            images[batch_start:batch_stop] = batch_images
+            masks[batch_start:batch_stop] = np.packbits(
+                batch_masks.reshape(len(batch_masks), -1) != 0, axis=1
+            )
+        images.flush()
+        masks.flush()
+        del images, masks
+        os.replace(images_path + ".tmp.npy", images_path)
+        os.replace(masks_path + ".tmp.npy", masks_path)
+        return stop - start
+
+    def _clear_binary_split(self):
+        """Remove the chunks and index of an earlier run into the same split."""
+        patterns = [
+            PACKED_CHUNK_IMAGES_FILE.replace("{chunk:05d}", "*"),
+            PACKED_CHUNK_MASKS_FILE.replace("{chunk:05d}", "*"),
+        ]
+        for pattern in patterns:
+            for path in glob.glob(
+                os.path.join(self.binary_dir, pattern.format(split=self.split))
+            ):
+                os.remove(path)
+        index_path = packed_paths(self.binary_dir, self.split)[2]
+        for path in (index_path, index_path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def generate_and_save_images_and_masks(self, workers=1, shard_size=1000):
+        """Generate and save N images and masks
+        with specified configurations.
+
+        Args:
+        - workers (int): Number of processes generating shards, 1 runs them in this
+          process (default: 1).
+        - shard_size (int): Images per shard. Part of what defines the output of a
+          seed, unlike workers (default: 1000).
+        """
+        shards = [
+            (shard, start, min(start + shard_size, self.num_images + 1))
+            for shard, start in enumerate(range(1, self.num_images + 1, shard_size))
+        ]
+        if self.binary_dir:
+            os.makedirs(self.binary_dir, exist_ok=True)
+            self._clear_binary_split()
+        else:
+            os.makedirs(self.image_dir, exist_ok=True)
+            os.makedirs(self.mask_dir, exist_ok=True)
+        print(f"Generating {self.num_images} images in {len(shards)} shards, seed {self.seed}.")
+        with tqdm(total=self.num_images) as progress:
+            if workers <= 1:
+                for args in shards:
+                    progress.update(self.generate_shard(*args))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(self.generate_shard, *args) for args in shards]
+                    for future in futures:
+                        progress.update(future.result())
+
+        if self.binary_dir:
+            # the index goes last, a split without it is incomplete; it is written to
+            # '.tmp' first so an interrupted write never leaves a truncated index
+            index_path = packed_paths(self.binary_dir, self.split)[2]
+            pd.DataFrame(
+                {
+                    "image_id": np.arange(1, self.num_images + 1),
+                    "row": np.arange(self.num_images),
+                }
+            ).to_csv(index_path + ".tmp", index=False)
+            os.replace(index_path + ".tmp", index_path)
+            print(f"Packed {self.num_images} '{self.split}' samples into {self.binary_dir}.")
 
 
 def main():
@@ -164,6 +421,35 @@ def main():
         default="data/raw/masks",
         help="Directory to save generated masks.",
     )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Master seed, the same seed and shard size give the same images.",
+    )
+    parser.add_argument(
+        "--vectorised",
+        action="store_true",
+        help="Draw the shapes of whole batches with NumPy instead of PIL.",
+    )
+    parser.add_argument(
+        "--binary_dir",
+        type=str,
+        default=None,
+        help="Write packed arrays (read by the 'packed' backend) here instead of PNGs.",
+    )
+    parser.add_argument(
+        "--split",
+        type=str,
+        default="generated",
+        help="Split name of the packed arrays written with --binary_dir.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of generating processes."
+    )
+    parser.add_argument(
+        "--shard_size", type=int, default=1000, help="Number of images per shard."
+    )
 
     args = parser.parse_args()
 
@@ -175,9 +461,13 @@ def main():
         num_images=args.num_images,
         image_dir=args.image_dir,
         mask_dir=args.mask_dir,
+        seed=args.seed,
+        vectorised=args.vectorised,
+        binary_dir=args.binary_dir,
+        split=args.split,
     )
 
-    generator.generate_and_save_images_and_masks()
+    generator.generate_and_save_images_and_masks(args.workers, args.shard_size)
 
 
 if __name__ == "__main__":
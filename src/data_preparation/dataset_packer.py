@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+One-time pack stage that decodes the splits listed in metadata.csv into
+contiguous uint8 arrays, so training can read them through np.memmap
+(see src/data/packed_store.py) instead of decoding PNGs every epoch.
+
+Run from the parent directory:
+    python -m src.data_preparation.dataset_packer --splits experiment holding
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from tqdm import tqdm
+
+from src.data.data_preprocessing import select_resolution
+from src.data.packed_store import packed_paths
+from src.data_preparation.dataset_preprocessing import parse_size
+
+
+class DatasetPacker:
+    """
+    Decode image/mask pairs of metadata.csv splits into packed arrays.
+
+    Attributes:
+    - data_dir (str): Directory containing metadata.csv and the split directories.
+    - packed_dir (str): Directory to write the packed files to.
+    - img_size (tuple): Pre-resized variant to pack, None for the original files.
+
+    Args:
+    - data_dir (str): Directory containing metadata.csv and the split directories.
+    - packed_dir (str): Directory to write the packed files to.
+    - img_size (tuple): Optional (height, width); its pre-resized copies are packed
+      when metadata.csv lists them.
+    """
+
+    def __init__(self, data_dir, packed_dir, img_size=None):
+        self.data_dir = data_dir
+        self.packed_dir = packed_dir
+        self.img_size = img_size
+
+    def pack_split(self, metadata_df, split):
+        """
+        Pack all rows of one split. Files are written under temporary names and
+        moved into place at the end, so an interrupted run never leaves a
+        half-written split behind.
+
+        Args:
+        - metadata_df (pd.DataFrame): Content of metadata.csv.
+        - split (str): Split name to pack (e.g. "experiment").
+        """
+        split_df = metadata_df[metadata_df["split"] == split]
+        split_df = select_resolution(split_df, self.img_size).reset_index(drop=True)
+        if split_df.empty:
+            print(f"No rows for split '{split}', skipping.")
+            return
+
+        images_path, masks_path, index_path = packed_paths(self.packed_dir, split)
+        tmp_images_path = images_path + ".tmp.npy"
+        tmp_masks_path = masks_path + ".tmp.npy"
+
+        first = np.array(
+            Image.open(os.path.join(self.data_dir, split_df["image_path"][0])).convert(
+                "RGB"
+            )
+        )
+        shape = (len(split_df),) + first.shape
+        images = np.lib.format.open_memmap(
+            tmp_images_path, mode="w+", dtype=np.uint8, shape=shape
+        )
+        masks = np.lib.format.open_memmap(
+            tmp_masks_path, mode="w+", dtype=np.uint8, shape=shape
+        )
+
+        for row, (image_path, mask_path) in enumerate(
+            tqdm(zip(split_df["image_path"], split_df["mask_path"]), total=len(split_df))
+        ):
+            img = Image.open(os.path.join(self.data_dir, image_path)).convert("RGB")
+            mask = Image.open(os.path.join(self.data_dir, mask_path)).convert("RGB")
+            if img.size != mask.size or img.size != (shape[2], shape[1]):
+                raise ValueError(
+                    f"{image_path}: all packed samples must be {shape[2]}x{shape[1]}, "
+                    f"got image {img.size} and mask {mask.size}."
+                )
+            images[row] = np.asarray(img)
+            masks[row] = np.asarray(mask)
+
+        images.flush()
+        masks.flush()
+        del images, masks
+
+        pd.DataFrame(
+            {"image_id": split_df["image_id"], "row": np.arange(len(split_df))}
+        ).to_csv(index_path + ".tmp", index=False)
+        os.replace(tmp_images_path, images_path)
+        os.replace(tmp_masks_path, masks_path)
+        # the index goes last; a run interrupted before this leaves the '.tmp' index
+        # behind, which PackedSampleStore refuses to open next to mismatched arrays
+        os.replace(index_path + ".tmp", index_path)
+        print(f"Packed {len(split_df)} '{split}' samples into {self.packed_dir}.")
+
+    def pack(self, splits=("experiment", "holding")):
+        """
+        Pack the given splits of metadata.csv.
+
+        Args:
+        - splits (iterable): Split names to pack.
+        """
+        os.makedirs(self.packed_dir, exist_ok=True)
+        metadata_df = pd.read_csv(os.path.join(self.data_dir, "metadata.csv"))
+        for split in splits:
+            self.pack_split(metadata_df, split)
+
+
+def main(args):
+    packer = DatasetPacker(args.data_dir, args.packed_dir, args.resolution)
+    packer.pack(args.splits)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Decode metadata.csv splits into memory-mappable arrays."
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        default="data/preprocessed",
+        help="Path to directory containing metadata.csv",
+    )
+    parser.add_argument(
+        "--packed_dir",
+        type=str,
+        default="data/packed",
+        help="Path to write the packed arrays to",
+    )
+    parser.add_argument(
+        "--splits",
+        type=str,
+        nargs="+",
+        default=["experiment", "holding"],
+        help="Splits from metadata.csv to pack",
+    )
+    parser.add_argument(
+        "--resolution",
+        type=parse_size,
+        default=None,
+        help="Pack the pre-resized HxW copies (e.g. 224x224) instead of the original files",
+    )
+
+    args = parser.parse_args()
+
+    main(args)
@@ -10,9 +10,17 @@
 # ----------------------------------------------------------------------------
 
 import os
+import sys
+import json
 import shutil
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from PIL import Image
 from tqdm import tqdm
 import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data.bitmask import bitmask_path, save_bitmask
 
 
 class DatasetPreProcessor:
@@ -25,21 +33,172 @@ class DatasetPreProcessor:
     - holding_dir (str): Path to save holding dataset (default: 'data/preprocessed/holding').
     - holding_images_dir (str): Path to holding images directory within holding_dir.
     - holding_masks_dir (str): Path to holding masks directory within holding_dir.
+    - target_sizes (list): (height, width) resolutions to write pre-resized copies for.
+    - bitmasks (bool): Whether bit-packed '.bits' copies of the masks are written.
+    - mode (str): "copy" or "link".
+    - workers (int): Number of threads processing pairs.
+    - manifest_path (str): JSON file recording the progress of split_dataset.
+    - manifest_every (int): Number of completed pairs between manifest updates.
      
      Args:
     - data_dir (str): Path to the root data directory containing 'images' and 'masks' subdirectories.
     - experiment_dir (str): Path to save experiment dataset (default: 'data/preprocessed/experiment').
     - holding_dir (str): Path to save holding dataset (default: 'data/preprocessed/holding').
+    - target_sizes (list): Optional (height, width) resolutions. For each one, resized copies
+      are written next to the experiment and holding directories with a '_{H}x{W}' suffix
+      (e.g. 'data/preprocessed/experiment_128x128'), images with area/bilinear filtering and
+      masks with nearest-neighbour.
+    - bitmasks (bool): Also write every mask, pre-resized copies included, as a bit-packed
+      '.bits' file next to the PNG (see src/data/bitmask.py). Masks must be binary (0/255).
+    - mode (str): "copy" to copy the raw files, "link" to hard-link them where the file
+      system allows it and copy otherwise. Linked files share their data with data_dir,
+      so editing one changes both (default: "copy").
+    - workers (int): Number of threads processing pairs (default: os.cpu_count() * 2).
+    - manifest_path (str): Progress file of split_dataset (default:
+      'preprocess_manifest.json' next to experiment_dir).
+    - manifest_every (int): Number of completed pairs between manifest updates
+      (default: 1000).
 
     """
-    def __init__(self, data_dir, experiment_dir, holding_dir):
+    def __init__(
+        self,
+        data_dir,
+        experiment_dir,
+        holding_dir,
+        target_sizes=None,
+        bitmasks=False,
+        mode="copy",
+        workers=None,
+        manifest_path=None,
+        manifest_every=1000,
+    ):
+        if mode not in ("copy", "link"):
+            raise ValueError(f"Unknown transfer mode '{mode}'.")
         self.data_dir = data_dir
         self.experiment_dir = experiment_dir
         self.holding_dir = holding_dir
         self.holding_images_dir = os.path.join(holding_dir, "holding_images")
         self.holding_masks_dir = os.path.join(holding_dir, "holding_masks")
+        self.target_sizes = [tuple(size) for size in target_sizes or []]
+        self.bitmasks = bitmasks
+        self.mode = mode
+        self.workers = workers or (os.cpu_count() or 1) * 2
+        self.manifest_path = manifest_path or os.path.join(
+            os.path.dirname(os.path.normpath(experiment_dir)), "preprocess_manifest.json"
+        )
+        self.manifest_every = manifest_every
+
+    @staticmethod
+    def variant_path(path, base_dir, size):
+        """Path of the '{H}x{W}' copy of a file stored under base_dir."""
+        base_dir = os.path.normpath(base_dir)
+        relative = os.path.relpath(path, base_dir)
+        return os.path.join(f"{base_dir}_{size[0]}x{size[1]}", relative)
+
+    @staticmethod
+    def write_bitmask(mask_path):
+        """Write the bit-packed copy of a binary PNG mask next to it."""
+        mask = np.array(Image.open(mask_path).convert("L"))
+        if not np.isin(mask, (0, 255)).all():
+            raise ValueError(f"{mask_path} is not a binary 0/255 mask, cannot bit-pack it.")
+        save_bitmask(bitmask_path(mask_path), mask)
+
+    def write_resized(self, image_src, mask_src, image_dst, mask_dst, base_dir):
+        """
+        Write the pre-resized copies of one image/mask pair for every target size.
+        Nothing is written for sizes the original already has, training falls back to
+        the original files for those.
+        """
+        if not self.target_sizes:
+            return
+        image = Image.open(image_src)
+        mask = Image.open(mask_src)
+        for size in self.target_sizes:
+            pil_size = (size[1], size[0])
+            if image.size == pil_size:
+                continue
+            image_out = self.variant_path(image_dst, base_dir, size)
+            mask_out = self.variant_path(mask_dst, base_dir, size)
+            os.makedirs(os.path.dirname(image_out), exist_ok=True)
+            os.makedirs(os.path.dirname(mask_out), exist_ok=True)
+            downscale = pil_size[0] < image.size[0] and pil_size[1] < image.size[1]
+            image.resize(
+                pil_size, Image.BOX if downscale else Image.BILINEAR
+            ).save(image_out)
+            mask.resize(pil_size, Image.NEAREST).save(mask_out)
+            if self.bitmasks:
+                self.write_bitmask(mask_out)
+
+    @staticmethod
+    def transfer(src, dst, mode):
+        """
+        Place src at dst. "link" makes a hard link, which takes no extra space and no
+        data copy, and falls back to a copy where linking is not possible (e.g. across
+        file systems). An existing dst, e.g. left behind by an earlier run, is removed
+        first in both modes, so a copy never writes through a hard link shared with src.
+
+        Returns:
+        - bool: True if the file was linked, False if it was copied.
+        """
+        if os.path.lexists(dst):
+            os.remove(dst)
+        if mode == "link":
+            try:
+                os.link(src, dst)
+                return True
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+        return False
 
-    def split_dataset(self):
+    def process_pair(self, image_src, mask_src, image_dst, mask_dst, base_dir):
+        """Transfer one image/mask pair and write its bit-packed and resized copies."""
+        linked = self.transfer(image_src, image_dst, self.mode)
+        linked &= self.transfer(mask_src, mask_dst, self.mode)
+        if self.bitmasks:
+            self.write_bitmask(mask_dst)
+        self.write_resized(image_src, mask_src, image_dst, mask_dst, base_dir)
+        return linked
+
+    def _settings(self, total_samples):
+        # a manifest only resumes a run over the same files with the same outputs
+        return {
+            "data_dir": os.path.abspath(self.data_dir),
+            "total_samples": total_samples,
+            "target_sizes": [list(size) for size in self.target_sizes],
+            "bitmasks": self.bitmasks,
+        }
+
+    def _load_manifest(self, settings):
+        if not os.path.exists(self.manifest_path):
+            return 0
+        with open(self.manifest_path) as file:
+            manifest = json.load(file)
+        if manifest.get("settings") != settings:
+            print(f"{self.manifest_path} belongs to another run, starting over.")
+            return 0
+        return manifest["completed"]
+
+    def _save_manifest(self, settings, completed):
+        with open(self.manifest_path + ".tmp", "w") as file:
+            json.dump({"settings": settings, "completed": completed}, file)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def split_dataset(self, resume=True):
+        """
+        Split the raw pairs into the experiment (first 90% in sorted order) and holding
+        sets.
+
+        Pairs are processed by a thread pool with at most workers * 4 pairs in flight.
+        The manifest stores how many pairs, in sorted order, are completely written;
+        it is updated every manifest_every pairs and on exit, so an interrupted run
+        continues from there instead of starting over. Memory stays bounded by the
+        file name lists and the in-flight window.
+
+        Args:
+        - resume (bool): Continue from the manifest of an earlier run with the same
+          settings (default: True).
+        """
         os.makedirs(self.experiment_dir, exist_ok=True)
         os.makedirs(self.holding_images_dir, exist_ok=True)
         os.makedirs(self.holding_masks_dir, exist_ok=True)
@@ -57,7 +216,12 @@ class DatasetPreProcessor:
         total_samples = len(image_files)
         split_point = int(0.9 * total_samples)
 
-        for i in tqdm(range(total_samples)):
+        settings = self._settings(total_samples)
+        completed = self._load_manifest(settings) if resume else 0
+        if completed:
+            print(f"Resuming after {completed} of {total_samples} completed pairs.")
+
+        def destinations(i):
             prefix = os.path.splitext(image_files[i])[0].split("_")[
                 0
             ]  # Get prefix (e.g., '22')
@@ -66,24 +230,70 @@ class DatasetPreProcessor:
 
             if i < split_point:
                 # Copy to experiment directory
+                base_dir = self.experiment_dir
                 image_dst = os.path.join(self.experiment_dir, f"{prefix}_image.png")
                 mask_dst = os.path.join(self.experiment_dir, f"{prefix}_mask.png")
             else:
                 # Copy to holding directory
+                base_dir = self.holding_dir
                 image_dst = os.path.join(self.holding_images_dir, f"{prefix}_image.png")
                 mask_dst = os.path.join(self.holding_masks_dir, f"{prefix}_mask.png")
+            return image_src, mask_src, image_dst, mask_dst, base_dir
 
-            shutil.copyfile(image_src, image_dst)
-            shutil.copyfile(mask_src, mask_dst)
+        # pairs finish out of order, the manifest only advances over a finished prefix
+        done = set()
+        copied = 0
+        last_saved = completed
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool, tqdm(
+                total=total_samples, initial=completed
+            ) as progress:
+                next_index = completed
+                while next_index < total_samples or pending:
+                    while next_index < total_samples and len(pending) < self.workers * 4:
+                        future = pool.submit(self.process_pair, *destinations(next_index))
+                        pending[future] = next_index
+                        next_index += 1
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        copied += not future.result()
+                        done.add(pending.pop(future))
+                    progress.update(len(finished))
+                    while completed in done:
+                        done.remove(completed)
+                        completed += 1
+                    if completed - last_saved >= self.manifest_every:
+                        self._save_manifest(settings, completed)
+                        last_saved = completed
+        finally:
+            # an interrupted run keeps everything finished so far
+            self._save_manifest(settings, completed)
 
+        if self.mode == "link" and copied:
+            print(f"{copied} pairs could not be hard-linked and were copied.")
         print(
             f"Dataset splitting and creation completed at {self.experiment_dir} and {self.holding_dir}."
         )
 
 
+def parse_size(value):
+    """Parse a '{H}x{W}' command-line size."""
+    height, width = value.lower().split("x")
+    return int(height), int(width)
+
+
 def main(args):
-    splitter = DatasetPreProcessor(args.data_dir, args.experiment_dir, args.holding_dir)
-    splitter.split_dataset()
+    splitter = DatasetPreProcessor(
+        args.data_dir,
+        args.experiment_dir,
+        args.holding_dir,
+        args.resize,
+        args.bitmasks,
+        mode=args.mode,
+        workers=args.workers,
+    )
+    splitter.split_dataset(resume=not args.restart)
 
 
 if __name__ == "__main__":
@@ -105,6 +315,36 @@ if __name__ == "__main__":
         default="data/preprocessed/holding",
         help="Path to holding directory",
     )
+    parser.add_argument(
+        "--resize",
+        type=parse_size,
+        nargs="*",
+        default=[],
+        help="Also write pre-resized copies for these HxW sizes, e.g. --resize 224x224 128x128",
+    )
+    parser.add_argument(
+        "--bitmasks",
+        action="store_true",
+        help="Also write 1-bit packed copies of the (binary) masks as .bits files",
+    )
+
+    parser.add_argument(
+        "--mode",
+        choices=["copy", "link"],
+        default="copy",
+        help="Copy the raw files or hard-link them (falls back to copying where linking fails)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of threads processing pairs",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore the progress manifest of an interrupted run and start over",
+    )
 
     args = parser.parse_args()
 
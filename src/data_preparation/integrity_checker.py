@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Check every image/mask pair of metadata.csv before training, instead of finding
+broken files as crashes inside DataLoader workers.
+
+Per pair it checks, cheapest first:
+1. both files exist,
+2. image and mask headers: same dimensions, and the listed resolution for
+   pre-resized copies (only the PNG header is read),
+3. image PNG chunk checksums (Image.verify, no pixel decoding),
+4. mask pixels: every colour is in class_dict.csv (the only full decode),
+5. the bit-packed mask, if listed, has the same dimensions.
+
+Pairs are checked in a process pool. Verdicts are written to integrity.csv together
+with the size and mtime of the image, the mask and the bit-packed mask and a key of the
+class palette, so later runs only re-check changed files (or everything after
+class_dict.csv changed). Training
+can drop the rejected pairs with src/data/integrity.py.
+
+Run from the parent directory:
+    python -m src.data_preparation.integrity_checker --workers 8
+"""
+
+import argparse
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+from tqdm import tqdm
+
+from src.constants import IGNORE_INDEX, NATIVE_RESOLUTION
+from src.data.bitmask import HEADER_BYTES
+from src.data.data_preprocessing import load_class_info
+from src.data.dataset import ClassIndexLUT
+from src.data.integrity import VERDICT_FILE
+
+STAT_COLUMNS = [
+    "image_size", "image_mtime_ns", "mask_size", "mask_mtime_ns",
+    "bitmask_size", "bitmask_mtime_ns",
+]
+KEY_COLUMNS = ["image_path", "mask_path"]
+
+
+def palette_key(class_rgb_values):
+    """Short key of the class colours, verdicts of another palette are re-checked."""
+    return hashlib.blake2b(
+        np.asarray(class_rgb_values, dtype=np.uint8).tobytes(), digest_size=8
+    ).hexdigest()
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return -1, -1
+    return stat.st_size, stat.st_mtime_ns
+
+
+def check_pair(data_dir, image_path, mask_path, resolution, bitmask_path, class_lut):
+    """
+    Check one image/mask pair.
+
+    Args:
+    - data_dir (str): Directory the metadata paths are relative to.
+    - image_path (str): Relative image path.
+    - mask_path (str): Relative mask path.
+    - resolution (str): '{H}x{W}' of a pre-resized copy or 'native'.
+    - bitmask_path (str): Relative '.bits' path, empty if there is none.
+    - class_lut (ClassIndexLUT): Lookup table of the class colours.
+
+    Returns:
+    - str: Empty string for a good pair, otherwise the reason it was rejected.
+    """
+    image_file = os.path.join(data_dir, image_path)
+    mask_file = os.path.join(data_dir, mask_path)
+    for path in (image_file, mask_file):
+        if not os.path.isfile(path):
+            return f"missing {os.path.basename(path)}"
+    try:
+        with Image.open(image_file) as img, Image.open(mask_file) as mask:
+            if img.size != mask.size:
+                return f"image is {img.size[0]}x{img.size[1]}, mask {mask.size[0]}x{mask.size[1]}"
+            if resolution and resolution != NATIVE_RESOLUTION:
+                height, width = (int(v) for v in resolution.split("x"))
+                if img.size != (width, height):
+                    return f"expected {resolution}, got {img.size[1]}x{img.size[0]}"
+            size = img.size
+            img.verify()
+            mask.load()
+            labels = mask if mask.mode == "L" else mask.convert("RGB")
+            if (class_lut(np.asarray(labels)) == IGNORE_INDEX).any():
+                return "mask has colours missing from class_dict.csv"
+    except Exception as error:
+        return f"unreadable: {error}"
+
+    if bitmask_path:
+        try:
+            with open(os.path.join(data_dir, bitmask_path), "rb") as file:
+                header = np.frombuffer(file.read(HEADER_BYTES), dtype="<u4")
+        except OSError as error:
+            return f"unreadable bit-packed mask: {error}"
+        if len(header) != 2 or (int(header[1]), int(header[0])) != size:
+            return "bit-packed mask has other dimensions"
+    return ""
+
+
+def _check_chunk(args):
+    data_dir, rows, class_rgb_values = args
+    class_lut = ClassIndexLUT(class_rgb_values)
+    return [check_pair(data_dir, *row, class_lut) for row in rows]
+
+
+class IntegrityChecker:
+    """
+    Check the pairs of metadata.csv and keep their verdicts up to date.
+
+    Attributes:
+    - data_dir (str): Directory containing metadata.csv and class_dict.csv.
+    - workers (int): Number of checking processes.
+    - chunk_size (int): Pairs per task sent to a process.
+
+    Args:
+    - data_dir (str): Directory containing metadata.csv and class_dict.csv.
+    - workers (int): Number of checking processes (default: os.cpu_count()).
+    - chunk_size (int): Pairs per task sent to a process (default: 256).
+    """
+
+    def __init__(self, data_dir, workers=None, chunk_size=256):
+        self.data_dir = data_dir
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+
+    def _load_previous(self, palette):
+        verdict_path = os.path.join(self.data_dir, VERDICT_FILE)
+        if not os.path.exists(verdict_path):
+            return None
+        previous = pd.read_csv(verdict_path, keep_default_na=False)
+        if not set(STAT_COLUMNS + ["bitmask_path"]) <= set(previous.columns):
+            # written before the bit-packed masks were tracked, re-check everything
+            return None
+        return previous[previous["palette"] == palette]
+
+    def check(self, full=False):
+        """
+        Check all pairs that changed since the last run and write integrity.csv.
+
+        Args:
+        - full (bool): Re-check every pair, ignoring earlier verdicts.
+
+        Returns:
+        - pd.DataFrame: All verdicts.
+        """
+        _, class_rgb_values = load_class_info(self.data_dir)
+        palette = palette_key(class_rgb_values)
+        metadata_df = pd.read_csv(
+            os.path.join(self.data_dir, "metadata.csv"), keep_default_na=False
+        )
+        if "resolution" not in metadata_df.columns:
+            metadata_df["resolution"] = NATIVE_RESOLUTION
+        if "bitmask_path" not in metadata_df.columns:
+            metadata_df["bitmask_path"] = ""
+
+        verdicts = metadata_df[KEY_COLUMNS + ["resolution", "bitmask_path"]].copy()
+        image_stats = [_file_stat(os.path.join(self.data_dir, p)) for p in verdicts["image_path"]]
+        mask_stats = [_file_stat(os.path.join(self.data_dir, p)) for p in verdicts["mask_path"]]
+        verdicts[["image_size", "image_mtime_ns"]] = image_stats
+        verdicts[["mask_size", "mask_mtime_ns"]] = mask_stats
+        verdicts[["bitmask_size", "bitmask_mtime_ns"]] = [
+            _file_stat(os.path.join(self.data_dir, p)) if p else (0, 0)
+            for p in verdicts["bitmask_path"]
+        ]
+        verdicts["palette"] = palette
+
+        previous = None if full else self._load_previous(palette)
+        if previous is not None:
+            verdicts = verdicts.merge(
+                previous[KEY_COLUMNS + ["bitmask_path"] + STAT_COLUMNS + ["ok", "reason"]],
+                on=KEY_COLUMNS + ["bitmask_path"] + STAT_COLUMNS,
+                how="left",
+            )
+        else:
+            verdicts["ok"] = np.nan
+            verdicts["reason"] = ""
+        todo = verdicts["ok"].isna().to_numpy()
+        print(f"{int(todo.sum())} of {len(verdicts)} pairs to check.")
+
+        rows = list(
+            verdicts.loc[todo, KEY_COLUMNS + ["resolution", "bitmask_path"]].itertuples(
+                index=False, name=None
+            )
+        )
+        chunks = [
+            (self.data_dir, rows[i:i + self.chunk_size], class_rgb_values)
+            for i in range(0, len(rows), self.chunk_size)
+        ]
+        reasons = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for chunk_reasons in tqdm(pool.map(_check_chunk, chunks), total=len(chunks)):
+                reasons.extend(chunk_reasons)
+
+        verdicts["reason"] = verdicts["reason"].fillna("").astype(object)
+        verdicts.loc[todo, "reason"] = reasons
+        verdicts["ok"] = verdicts["reason"] == ""
+        verdicts = verdicts[
+            KEY_COLUMNS + ["bitmask_path"] + STAT_COLUMNS + ["palette", "ok", "reason"]
+        ]
+
+        verdict_path = os.path.join(self.data_dir, VERDICT_FILE)
+        verdicts.to_csv(verdict_path + ".tmp", index=False)
+        os.replace(verdict_path + ".tmp", verdict_path)
+
+        rejected = verdicts[~verdicts["ok"]]
+        for image_path, reason in zip(rejected["image_path"][:20], rejected["reason"][:20]):
+            print(f"  {image_path}: {reason}")
+        print(
+            f"{len(rejected)} of {len(verdicts)} pairs rejected, verdicts written to "
+            f"{verdict_path}."
+        )
+        return verdicts
+
+
+def main(args):
+    checker = IntegrityChecker(args.data_dir, args.workers)
+    rejected = ~checker.check(full=args.full)["ok"]
+    if args.strict and rejected.any():
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the image/mask pairs listed in metadata.csv."
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        default="data/preprocessed",
+        help="Path to directory containing metadata.csv and class_dict.csv",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of checking processes",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-check every pair instead of only the changed ones",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Exit with status 1 when any pair is rejected",
+    )
+
+    args = parser.parse_args()
+
+    main(args)
@@ -1,82 +1,325 @@
-#!/usr/bin/env python3  
-# -*- coding: utf-8 -*- 
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
 # ----------------------------------------------------------------------------
 # Created By   : Tashin Ahmed
 # Created Date : "15/06/2024"
 # email        : tashinahmed.contact@gmail.com
-# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed   
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
 # version      : "0.0.1"
 # status       : "PoC"
 # ----------------------------------------------------------------------------
 
 """
 Script to collect metadata for experiment and holding datasets and save it to a CSV file named metadata.csv
+
+Pre-resized copies written by dataset_preprocessing.py --resize (directories with a '_{H}x{W}'
+suffix) are collected as well, one row per image and resolution. The original files have the
+resolution 'native'. Bit-packed masks written by dataset_preprocessing.py --bitmasks are
+listed in the 'bitmask_path' column, which stays empty for masks without one.
+
+Next to metadata.csv, a columnar index (metadata_index/, see src/data/metadata_index.py)
+is written that load_metadata reads instead of the CSV.
+
+Directories are listed with os.scandir and the files are stat'ed by a thread pool. By
+default the run is incremental: rows of an existing metadata.csv whose scanned columns
+(paths, and the size and mtime of the image, the mask and the bit-packed mask) are all
+the same are kept as they are (including their content hashes with --hash), only new,
+changed and deleted files are processed. Both outputs are written under temporary names
+and moved into place.
+
+Run from the parent directory:
+    python src/data_preparation/metadata_generator.py [--full] [--hash] [--workers 16]
 """
 
+import argparse
+import hashlib
 import os
-import csv
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.constants import NATIVE_RESOLUTION
+from src.data.bitmask import BITMASK_EXT
+from src.data.metadata_index import METADATA_INDEX_DIR, write_metadata_index
+
+METADATA_COLUMNS = ["image_id", "split", "image_path", "mask_path", "resolution", "bitmask_path"]
+FILE_COLUMNS = [
+    "image_size", "image_mtime_ns", "mask_size", "mask_mtime_ns",
+    "bitmask_size", "bitmask_mtime_ns",
+]
+HASH_COLUMNS = ["image_hash", "mask_hash"]
+KEY_COLUMNS = ["split", "resolution", "image_id"]
+VARIANT_PATTERN = re.compile(r"^(experiment|holding)_(\d+x\d+)$")
+
+
+def list_sources(base_dir):
+    """
+    Directories to collect, including the pre-resized variants.
+
+    Args:
+    - base_dir (str): Preprocessed data directory.
+
+    Returns:
+    - list: (split, images_dir, masks_dir, resolution) tuples, directories relative to
+      base_dir.
+    """
+    sources = [
+        ("experiment", "experiment", "experiment", NATIVE_RESOLUTION),
+        ("holding", "holding/holding_images", "holding/holding_masks", NATIVE_RESOLUTION),
+    ]
+    with os.scandir(base_dir) as entries:
+        variants = sorted(entry.name for entry in entries if entry.is_dir())
+    for variant in variants:
+        match = VARIANT_PATTERN.match(variant)
+        if not match:
+            continue
+        split, resolution = match.groups()
+        if split == "experiment":
+            sources.append((split, variant, variant, resolution))
+        else:
+            sources.append(
+                (split, f"{variant}/holding_images", f"{variant}/holding_masks", resolution)
+            )
+    return sources
 
-base_dir = "data/preprocessed"
 
-experiment_path = os.path.join(base_dir, "experiment")
-holding_images_path = os.path.join(base_dir, "holding/holding_images")
-holding_masks_path = os.path.join(base_dir, "holding/holding_masks")
+def _stat_entries(entries):
+    return {entry.name: entry.stat() for entry in entries}
 
-metadata = []
 
+def stat_directory(directory, pool, chunk_size=4096):
+    """
+    List a directory and stat its files in parallel.
 
-def collect_metadata(
-    split, images_dir, masks_dir, relative_image_prefix, relative_mask_prefix
-):
+    Args:
+    - directory (str): Directory to list.
+    - pool (ThreadPoolExecutor): Pool running the stat calls.
+    - chunk_size (int): Number of files stat'ed per task.
+
+    Returns:
+    - dict: File name to os.stat_result, empty if the directory does not exist.
+    """
+    if not os.path.isdir(directory):
+        return {}
+    with os.scandir(directory) as entries:
+        files = [entry for entry in entries if entry.is_file()]
+    stats = {}
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    for chunk_stats in pool.map(_stat_entries, chunks):
+        stats.update(chunk_stats)
+    return stats
+
+
+def collect_metadata(base_dir, split, images_dir, masks_dir, resolution, pool):
     """
     Collects metadata for images and masks in the specified directories.
 
     Args:
+    - base_dir (str): Preprocessed data directory.
     - split (str): The split type (e.g., "experiment" or "holding").
-    - images_dir (str): Directory path containing images.
-    - masks_dir (str): Directory path containing masks.
-    - relative_image_prefix (str): Relative prefix for image paths in metadata.
-    - relative_mask_prefix (str): Relative prefix for mask paths in metadata.
+    - images_dir (str): Directory containing images, relative to base_dir.
+    - masks_dir (str): Directory containing masks, relative to base_dir.
+    - resolution (str): '{H}x{W}' of a pre-resized copy, or 'native' for the original files.
+    - pool (ThreadPoolExecutor): Pool running the stat calls.
+
+    Returns:
+    - list: One metadata dict per image that has a mask.
     """
-    for image_file in os.listdir(images_dir):
-        if image_file.endswith("_image.png"):
-            image_id = image_file.split("_")[0]
-            image_path = os.path.join(relative_image_prefix, image_file).replace(
-                "\\", "/"
+    image_stats = stat_directory(os.path.join(base_dir, images_dir), pool)
+    mask_stats = (
+        image_stats
+        if masks_dir == images_dir
+        else stat_directory(os.path.join(base_dir, masks_dir), pool)
+    )
+    rows = []
+    for image_file, image_stat in image_stats.items():
+        if not image_file.endswith("_image.png"):
+            continue
+        image_id = image_file.split("_")[0]
+        mask_file = f"{image_id}_mask.png"
+        mask_stat = mask_stats.get(mask_file)
+        if mask_stat is None:
+            continue
+        bitmask_file = f"{image_id}_mask{BITMASK_EXT}"
+        bitmask_stat = mask_stats.get(bitmask_file)
+        rows.append(
+            {
+                "image_id": image_id,
+                "split": split,
+                "image_path": f"{images_dir}/{image_file}",
+                "mask_path": f"{masks_dir}/{mask_file}",
+                "resolution": resolution,
+                "bitmask_path": (
+                    f"{masks_dir}/{bitmask_file}" if bitmask_stat is not None else ""
+                ),
+                "image_size": image_stat.st_size,
+                "image_mtime_ns": image_stat.st_mtime_ns,
+                "mask_size": mask_stat.st_size,
+                "mask_mtime_ns": mask_stat.st_mtime_ns,
+                # 0 without a bit-packed mask, so adding one later changes the row
+                "bitmask_size": bitmask_stat.st_size if bitmask_stat is not None else 0,
+                "bitmask_mtime_ns": bitmask_stat.st_mtime_ns if bitmask_stat is not None else 0,
+            }
+        )
+    return rows
+
+
+def file_hash(path):
+    """blake2b hex digest of a file's content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def reuse_unchanged(scanned_df, previous_df):
+    """
+    Split scanned rows into rows whose scanned columns (paths and file stats) all
+    equal those of the previous run and rows that are new or changed.
+
+    Args:
+    - scanned_df (pd.DataFrame): Rows of the current scan.
+    - previous_df (pd.DataFrame): Rows of the previous metadata.csv.
+
+    Returns:
+    - tuple: (unchanged rows, with their previous hashes; new or changed rows).
+    """
+    if previous_df is None or not set(FILE_COLUMNS) <= set(previous_df.columns):
+        return scanned_df.iloc[:0], scanned_df
+    previous_df = previous_df.astype({"image_id": str, "bitmask_path": str})
+    compared_columns = [
+        column for column in METADATA_COLUMNS + FILE_COLUMNS if column not in KEY_COLUMNS
+    ]
+    previous_columns = KEY_COLUMNS + compared_columns + [
+        column for column in HASH_COLUMNS if column in previous_df.columns
+    ]
+    merged = scanned_df.merge(
+        previous_df[previous_columns], on=KEY_COLUMNS, how="left", suffixes=("", "_old")
+    )
+    unchanged = pd.Series(True, index=merged.index)
+    for column in compared_columns:
+        unchanged &= merged[column] == merged[f"{column}_old"]
+    merged = merged.drop(columns=[f"{column}_old" for column in compared_columns])
+    return merged[unchanged], merged[~unchanged].drop(
+        columns=[column for column in HASH_COLUMNS if column in merged.columns]
+    )
+
+
+def generate_metadata(base_dir, incremental=True, with_hash=False, workers=None):
+    """
+    Scan base_dir and write metadata.csv and the metadata index.
+
+    Args:
+    - base_dir (str): Preprocessed data directory.
+    - incremental (bool): Keep unchanged rows of an existing metadata.csv.
+    - with_hash (bool): Store blake2b content hashes of the images and masks.
+    - workers (int): Number of threads for listing, stat and hashing.
+
+    Returns:
+    - pd.DataFrame: The written metadata.
+    """
+    metadata_csv_path = os.path.join(base_dir, "metadata.csv")
+    previous_df = None
+    if incremental and os.path.exists(metadata_csv_path):
+        previous_df = pd.read_csv(metadata_csv_path, keep_default_na=False)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sources = list_sources(base_dir)
+        rows = []
+        for split, images_dir, masks_dir, resolution in sources:
+            rows.extend(
+                collect_metadata(base_dir, split, images_dir, masks_dir, resolution, pool)
             )
-            mask_file = f"{image_id}_mask.png"
-            mask_path = os.path.join(relative_mask_prefix, mask_file).replace("\\", "/")
-            metadata.append(
-                {
-                    "image_id": image_id,
-                    "split": split,
-                    "image_path": image_path,
-                    "mask_path": mask_path,
-                }
+        scanned_df = pd.DataFrame(rows, columns=METADATA_COLUMNS + FILE_COLUMNS)
+
+        unchanged_df, changed_df = reuse_unchanged(scanned_df, previous_df)
+        hash_df = changed_df
+        if with_hash:
+            # unchanged rows of a run without --hash have no hashes yet
+            missing = (
+                unchanged_df["image_hash"] == ""
+                if "image_hash" in unchanged_df.columns
+                else pd.Series(True, index=unchanged_df.index)
+            )
+            hash_df = pd.concat(
+                [changed_df, unchanged_df[missing].drop(columns=HASH_COLUMNS, errors="ignore")],
+                ignore_index=True,
             )
+            unchanged_df = unchanged_df[~missing]
+            for column, path_column in zip(HASH_COLUMNS, ["image_path", "mask_path"]):
+                paths = [os.path.join(base_dir, path) for path in hash_df[path_column]]
+                hash_df[column] = list(pool.map(file_hash, paths))
+
+    metadata_df = pd.concat([unchanged_df, hash_df], ignore_index=True)
+    if not with_hash:
+        metadata_df = metadata_df.drop(
+            columns=[column for column in HASH_COLUMNS if column in metadata_df.columns]
+        )
+    metadata_df = metadata_df.sort_values(KEY_COLUMNS, kind="stable", ignore_index=True)
 
+    metadata_index_path = os.path.join(base_dir, METADATA_INDEX_DIR)
+    if previous_df is not None:
+        kept = previous_df.astype({"image_id": str})[KEY_COLUMNS].merge(
+            scanned_df[KEY_COLUMNS], on=KEY_COLUMNS
+        )
+        removed = len(previous_df) - len(kept)
+        print(
+            f"{len(scanned_df) - len(changed_df)} unchanged, {len(changed_df)} new or "
+            f"changed, {removed} removed rows."
+        )
+        if (
+            len(hash_df) == 0
+            and removed == 0
+            and list(metadata_df.columns) == list(previous_df.columns)
+            and os.path.isdir(metadata_index_path)
+        ):
+            print(f"{metadata_csv_path} is up to date.")
+            return metadata_df
 
-collect_metadata(
-    "experiment", experiment_path, experiment_path, "experiment", "experiment"
-)
+    metadata_df.to_csv(metadata_csv_path + ".tmp", index=False)
+    os.replace(metadata_csv_path + ".tmp", metadata_csv_path)
+    print(f"metadata.csv has been created at {metadata_csv_path}")
 
-collect_metadata(
-    "holding",
-    holding_images_path,
-    holding_masks_path,
-    "holding/holding_images",
-    "holding/holding_masks",
-)
+    write_metadata_index(metadata_df, metadata_index_path)
+    print(f"metadata index has been created at {metadata_index_path}")
+    return metadata_df
 
-metadata_csv_path = os.path.join(base_dir, "metadata.csv")
 
+def main(args):
+    generate_metadata(args.base_dir, not args.full, args.hash, args.workers)
 
-with open(metadata_csv_path, mode="w", newline="") as file:
-    writer = csv.DictWriter(
-        file, fieldnames=["image_id", "split", "image_path", "mask_path"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Collect metadata.csv and the metadata index of the preprocessed data."
+    )
+    parser.add_argument(
+        "--base_dir",
+        type=str,
+        default="data/preprocessed",
+        help="Path to the preprocessed data directory",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Rebuild from scratch instead of updating the existing metadata.csv",
     )
-    writer.writeheader()
-    for data in metadata:
-        writer.writerow(data)
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="Also store content hashes of new and changed files",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of threads for listing, stat and hashing",
+    )
+
+    args = parser.parse_args()
 
-print(f"metadata.csv has been created at {metadata_csv_path}")
+    main(args)
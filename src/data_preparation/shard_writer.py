@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Pack the image/mask pairs listed in metadata.csv into fixed-size tar shards, so
+that training can stream them sequentially (see src/data/shard_dataset.py)
+instead of opening thousands of small files.
+
+Every shard is named '{split}-{subset}-{number:05d}.tar' and holds the original PNG
+bytes as '{image_id}.image.png' followed by '{image_id}.mask.png', or
+'{image_id}.mask.bits' with --bitmasks. A '{split}_shards.csv' file lists the image ids
+and the subset of every shard.
+
+Shards never mix the train, valid and test subsets of src/data/splits.py, so the
+valid and test sets only read their own shards. Within a subset the pairs are ordered
+by their image_id hash, which makes every cross-validation fold a contiguous range of
+the train shards as well.
+
+Run from the parent directory:
+    python -m src.data_preparation.shard_writer --samples_per_shard 1000
+"""
+
+import argparse
+import os
+import tarfile
+
+import pandas as pd
+from tqdm import tqdm
+
+from src.data.data_preprocessing import select_resolution
+from src.data.splits import add_split_columns, hash_fractions
+from src.data_preparation.dataset_preprocessing import parse_size
+
+SHARD_FILE = "{split}-{subset}-{number:05d}.tar"
+SHARD_INDEX_FILE = "{split}_shards.csv"
+
+
+class ShardWriter:
+    """
+    Write metadata.csv splits as tar shards.
+
+    Attributes:
+    - data_dir (str): Directory containing metadata.csv and the split directories.
+    - shard_dir (str): Directory to write the shards to.
+    - samples_per_shard (int): Number of image/mask pairs per shard.
+    - img_size (tuple): Pre-resized variant to shard, None for the original files.
+    - bitmasks (bool): Store the bit-packed masks instead of the PNG masks.
+
+    Args:
+    - data_dir (str): Directory containing metadata.csv and the split directories.
+    - shard_dir (str): Directory to write the shards to.
+    - samples_per_shard (int): Number of image/mask pairs per shard (default: 1000).
+    - img_size (tuple): Optional (height, width); its pre-resized copies are sharded
+      when metadata.csv lists them.
+    - bitmasks (bool): Store the '.bits' files of the 'bitmask_path' column instead of the
+      PNG masks (default: False).
+    """
+
+    def __init__(
+        self, data_dir, shard_dir, samples_per_shard=1000, img_size=None, bitmasks=False
+    ):
+        self.data_dir = data_dir
+        self.shard_dir = shard_dir
+        self.samples_per_shard = samples_per_shard
+        self.img_size = img_size
+        self.bitmasks = bitmasks
+
+    def write_split(self, metadata_df, split):
+        """
+        Write all rows of one split as shards, separately per subset. Each shard is
+        written under a temporary name and renamed once complete, the index last.
+
+        Args:
+        - metadata_df (pd.DataFrame): Content of metadata.csv.
+        - split (str): Split name to shard (e.g. "experiment").
+        """
+        split_df = metadata_df[metadata_df["split"] == split]
+        split_df = select_resolution(split_df, self.img_size).reset_index(drop=True)
+        if split_df.empty:
+            print(f"No rows for split '{split}', skipping.")
+            return
+
+        if self.bitmasks and (
+            "bitmask_path" not in split_df.columns
+            or split_df["bitmask_path"].isna().any()
+            or (split_df["bitmask_path"].astype(str) == "").any()
+        ):
+            raise ValueError(
+                f"bitmasks needs a 'bitmask_path' for every '{split}' sample, run "
+                "dataset_preprocessing.py --bitmasks and metadata_generator.py."
+            )
+
+        split_df = add_split_columns(split_df)
+        split_df["order"] = hash_fractions(split_df["image_id"])
+        split_df = split_df.sort_values(["subset", "order"], kind="stable")
+
+        mask_column, mask_ext = (
+            ("bitmask_path", "bits") if self.bitmasks else ("mask_path", "png")
+        )
+        index_rows = []
+        for subset, subset_df in split_df.groupby("subset", observed=True, sort=False):
+            for start in tqdm(range(0, len(subset_df), self.samples_per_shard), desc=subset):
+                shard_name = SHARD_FILE.format(
+                    split=split, subset=subset, number=start // self.samples_per_shard
+                )
+                shard_path = os.path.join(self.shard_dir, shard_name)
+                chunk = subset_df.iloc[start:start + self.samples_per_shard]
+                with tarfile.open(shard_path + ".tmp", "w") as tar:
+                    for image_id, image_path, mask_path in zip(
+                        chunk["image_id"], chunk["image_path"], chunk[mask_column]
+                    ):
+                        tar.add(
+                            os.path.join(self.data_dir, image_path),
+                            arcname=f"{image_id}.image.png",
+                        )
+                        tar.add(
+                            os.path.join(self.data_dir, mask_path),
+                            arcname=f"{image_id}.mask.{mask_ext}",
+                        )
+                        index_rows.append(
+                            {"image_id": image_id, "shard": shard_name, "subset": subset}
+                        )
+                os.replace(shard_path + ".tmp", shard_path)
+
+        index_path = os.path.join(self.shard_dir, SHARD_INDEX_FILE.format(split=split))
+        pd.DataFrame(index_rows).to_csv(index_path + ".tmp", index=False)
+        os.replace(index_path + ".tmp", index_path)
+        print(f"Wrote {len(split_df)} '{split}' samples as shards into {self.shard_dir}.")
+
+    def write(self, splits=("experiment", "holding")):
+        """
+        Write the given splits of metadata.csv as shards.
+
+        Args:
+        - splits (iterable): Split names to shard.
+        """
+        os.makedirs(self.shard_dir, exist_ok=True)
+        metadata_df = pd.read_csv(os.path.join(self.data_dir, "metadata.csv"))
+        for split in splits:
+            self.write_split(metadata_df, split)
+
+
+def main(args):
+    writer = ShardWriter(
+        args.data_dir, args.shard_dir, args.samples_per_shard, args.resolution, args.bitmasks
+    )
+    writer.write(args.splits)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pack metadata.csv image/mask pairs into tar shards."
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        default="data/preprocessed",
+        help="Path to directory containing metadata.csv",
+    )
+    parser.add_argument(
+        "--shard_dir",
+        type=str,
+        default="data/shards",
+        help="Path to write the shards to",
+    )
+    parser.add_argument(
+        "--samples_per_shard",
+        type=int,
+        default=1000,
+        help="Number of image/mask pairs per shard",
+    )
+    parser.add_argument(
+        "--splits",
+        type=str,
+        nargs="+",
+        default=["experiment", "holding"],
+        help="Splits from metadata.csv to shard",
+    )
+    parser.add_argument(
+        "--resolution",
+        type=parse_size,
+        default=None,
+        help="Shard the pre-resized HxW copies (e.g. 224x224) instead of the original files",
+    )
+    parser.add_argument(
+        "--bitmasks",
+        action="store_true",
+        help="Store the bit-packed masks (dataset_preprocessing.py --bitmasks) instead of PNGs",
+    )
+
+    args = parser.parse_args()
+
+    main(args)
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Batched offline inference on folders or lists of images.
+
+The checkpoint is loaded once and images stream through three stages:
+1. a thread pool decodes the images and resizes them to IMG_SIZE,
+2. the model runs on fixed-size batches (a short last batch is padded, so a compiled
+   model keeps its single static shape),
+3. a thread pool upsamples the probabilities to the original image size and writes
+   the predicted class colours as '{name}_pred.png'.
+
+Each stage only runs a bounded number of batches ahead of the next one: decoding
+stops when queue_batches batches wait for the model, and the model waits when
+queue_batches batches wait to be written. Memory therefore stays constant for any
+number of images, and the slowest stage sets the pace. Images that cannot be decoded
+are reported and skipped.
+
+With tiled, images are not resized: every image is predicted at full resolution by
+SlidingWindowPredictor (src/inference/tiling.py) in overlapping IMG_SIZE windows, and
+decoding runs queue_batches images ahead instead of batches.
+
+Run from the parent directory:
+    python scripts/run_inference.py --input path/to/images --output_dir working/predictions
+    python scripts/run_inference.py --split holding
+    python scripts/run_inference.py --input path/to/large_images --tiled --overlap 0.25
+
+Classes:
+- Predictor: Streams images through a SegmentationModel.
+
+Functions:
+- list_images(inputs): Image files of directories and explicit paths.
+- decode_image(path, img_size): Decode and resize one image.
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from src.config import (
+    BATCH_SIZE,
+    CHANNELS,
+    CHANNELS_LAST,
+    CHECKPOINT_DIR,
+    COMPILE,
+    COMPILE_CACHE_DIR,
+    DATA_DIR,
+    DEVICE,
+    ENCODER,
+    ENCODER_WEIGHTS,
+    IMG_SIZE,
+    OUTPUT_DIR,
+    PRECISION,
+)
+from src.data.data_preprocessing import load_class_info, load_metadata
+from src.data.normalization import EncoderNormalizer
+from src.inference.tiling import SlidingWindowPredictor
+from src.models.segmentation_model import SegmentationModel
+from src.utils.checkpoint_utils import get_next_checkpoint_filename
+from src.utils.compile_cache import enable_compile_cache
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def list_images(inputs):
+    """
+    Image files of directories and explicit paths.
+
+    Args:
+    - inputs (list): Directories, whose image files are listed in name order (masks,
+      '*_mask.*', are skipped), and image paths, taken as they are.
+
+    Returns:
+    - list: Image paths.
+    """
+    paths = []
+    for item in inputs:
+        if not os.path.isdir(item):
+            paths.append(item)
+            continue
+        with os.scandir(item) as entries:
+            names = sorted(
+                entry.name
+                for entry in entries
+                if entry.is_file()
+                and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+                and "_mask" not in entry.name
+            )
+        paths.extend(os.path.join(item, name) for name in names)
+    return paths
+
+
+def decode_image(path, img_size):
+    """
+    Decode an image and resize it to the model input size.
+
+    Args:
+    - path (str): Image path.
+    - img_size (tuple): (height, width) of the model input, None to keep the size.
+
+    Returns:
+    - tuple: uint8 image of shape (height, width, 3) and the original (width, height),
+      or None if the image cannot be read.
+    """
+    try:
+        with Image.open(path) as img:
+            img = img.convert("RGB")
+            size = img.size
+            if img_size is not None and size != (img_size[1], img_size[0]):
+                img = img.resize((img_size[1], img_size[0]), Image.BILINEAR)
+            return np.asarray(img), size
+    except (OSError, ValueError) as error:
+        print(f"Skipping {path}: {error}")
+        return None
+
+
+class Predictor:
+    """
+    Streams images through a SegmentationModel and writes the predicted masks.
+
+    Args:
+    - model (SegmentationModel): Trained model.
+    - normalizer (EncoderNormalizer): Encoder normalisation of the model input.
+    - class_rgb_values (list): RGB colour of every class, used for the written masks.
+    - img_size (tuple): (height, width) of the model input (default: IMG_SIZE).
+    - batch_size (int): Images per forward pass (default: BATCH_SIZE).
+    - decode_workers (int): Decoding threads (default: os.cpu_count()).
+    - write_workers (int): Writing threads (default: 2).
+    - queue_batches (int): Batches a stage may run ahead of the next one (default: 2).
+    - device (str): Device of the model (default: DEVICE).
+    - precision (str): Lightning precision, "bf16-mixed" runs under bfloat16 autocast
+      (default: PRECISION).
+    - tiled (bool): Predict full-resolution images in sliding windows of img_size
+      instead of resizing them (default: False).
+    - overlap (float): Window overlap of the tiled mode (default: 0.25).
+    """
+
+    def __init__(
+        self,
+        model,
+        normalizer,
+        class_rgb_values,
+        img_size=IMG_SIZE,
+        batch_size=BATCH_SIZE,
+        decode_workers=None,
+        write_workers=2,
+        queue_batches=2,
+        device=DEVICE,
+        precision=PRECISION,
+        tiled=False,
+        overlap=0.25,
+    ):
+        self.model = model.eval().to(device)
+        self.normalizer = normalizer
+        self.palette = np.asarray(class_rgb_values, dtype=np.uint8)
+        self.img_size = tuple(img_size)
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers or os.cpu_count()
+        self.write_workers = write_workers
+        self.queue_batches = queue_batches
+        self.device = torch.device(device)
+        self.bf16 = precision.startswith("bf16")
+        self.tiler = (
+            SlidingWindowPredictor(
+                self.model, normalizer, self.img_size, overlap, batch_size, device, precision
+            )
+            if tiled
+            else None
+        )
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_path, model_kwargs=None, **kwargs):
+        """
+        Build a predictor from a SegmentationModel checkpoint.
+
+        Args:
+        - checkpoint_path (str): Checkpoint written by train.py.
+        - model_kwargs (dict): Overrides of the saved hyperparameters, e.g. channels_last.
+        - **kwargs: normalizer, class_rgb_values and the other Predictor arguments.
+
+        Returns:
+        - Predictor: Predictor of the checkpoint.
+        """
+        # the network is pickled in the hyperparameters, so the checkpoint is not
+        # weights-only: only load checkpoints you trust
+        model = SegmentationModel.load_from_checkpoint(
+            checkpoint_path,
+            map_location=kwargs.get("device", DEVICE),
+            weights_only=False,
+            **(model_kwargs or {}),
+        )
+        return cls(model, **kwargs)
+
+    def predict_batch(self, images):
+        """
+        Class probabilities of a batch, padded to batch_size for the forward pass.
+
+        Args:
+        - images (list): uint8 images of shape (height, width, 3) at img_size.
+
+        Returns:
+        - torch.Tensor: float32 probabilities of shape (len(images), C, height, width)
+          on the CPU.
+        """
+        count = len(images)
+        images = images + [images[-1]] * (self.batch_size - count)
+        # NHWC memory permuted to NCHW is already channels_last
+        batch = torch.from_numpy(np.stack(images)).to(self.device).permute(0, 3, 1, 2)
+        batch = self.normalizer.normalize_tensor(batch)
+        autocast = (
+            torch.autocast(self.device.type, dtype=torch.bfloat16) if self.bf16 else nullcontext()
+        )
+        with torch.inference_mode(), autocast:
+            probs = self.model.predict_proba(batch)
+        return probs[:count].float().cpu()
+
+    def write_mask(self, probs, size, output_path):
+        """
+        Write the predicted classes of one image at its original size.
+
+        Args:
+        - probs (torch.Tensor): Probabilities of shape (C, height, width).
+        - size (tuple): Original (width, height) of the image.
+        - output_path (str): Path of the PNG to write.
+        """
+        if probs.shape[-2:] != (size[1], size[0]):
+            probs = F.interpolate(
+                probs[None], size=(size[1], size[0]), mode="bilinear", align_corners=False
+            )[0]
+        self.write_classes(probs.argmax(0).numpy().astype(np.uint8), output_path)
+
+    def write_classes(self, classes, output_path):
+        """
+        Write class indices as class colours.
+
+        Args:
+        - classes (np.ndarray): uint8 class indices of shape (H, W).
+        - output_path (str): Path of the PNG to write.
+        """
+        Image.fromarray(self.palette[classes]).save(output_path)
+
+    def _decoded(self, paths, pool):
+        """Decode paths in order, at most queue_batches batches ahead of the consumer."""
+        # full-resolution images of the tiled mode are queued per image, not per batch
+        img_size = None if self.tiler else self.img_size
+        ahead = self.queue_batches * (1 if self.tiler else self.batch_size)
+        paths = iter(paths)
+        window = deque(
+            (path, pool.submit(decode_image, path, img_size)) for path in islice(paths, ahead)
+        )
+        while window:
+            path, future = window.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                window.append((next_path, pool.submit(decode_image, next_path, img_size)))
+            yield path, future.result()
+
+    def run(self, paths, output_dir):
+        """
+        Predict the masks of all images.
+
+        Args:
+        - paths (list): Image paths.
+        - output_dir (str): Directory for the '{name}_pred.png' masks.
+
+        Returns:
+        - dict: Number of predicted and skipped images, total and model seconds and
+          images per second.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        stats = {"images": 0, "skipped": 0, "seconds": 0.0, "model_seconds": 0.0}
+        start = time.perf_counter()
+        pending = deque()
+
+        def output_path(path):
+            name = os.path.splitext(os.path.basename(path))[0].removesuffix("_image")
+            return os.path.join(output_dir, f"{name}_pred.png")
+
+        def flush(batch):
+            batch_paths, images, sizes = zip(*batch)
+            model_start = time.perf_counter()
+            if self.tiler:
+                for path, image in zip(batch_paths, images):
+                    classes = self.tiler.predict(image)
+                    pending.append(
+                        write_pool.submit(self.write_classes, classes, output_path(path))
+                    )
+            else:
+                probs = self.predict_batch(list(images))
+                for path, image_probs, size in zip(batch_paths, probs, sizes):
+                    pending.append(
+                        write_pool.submit(self.write_mask, image_probs, size, output_path(path))
+                    )
+            stats["model_seconds"] += time.perf_counter() - model_start
+            stats["images"] += len(batch)
+            # backpressure: wait for the oldest writes before predicting further
+            while len(pending) > self.queue_batches * (1 if self.tiler else self.batch_size):
+                pending.popleft().result()
+
+        with ThreadPoolExecutor(self.decode_workers) as decode_pool, ThreadPoolExecutor(
+            self.write_workers
+        ) as write_pool:
+            batch = []
+            for path, decoded in self._decoded(paths, decode_pool):
+                if decoded is None:
+                    stats["skipped"] += 1
+                    continue
+                batch.append((path, *decoded))
+                # the tiler batches the windows of one image itself
+                if self.tiler or len(batch) == self.batch_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+            for future in pending:
+                future.result()
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["images_per_sec"] = stats["images"] / stats["seconds"] if stats["images"] else 0.0
+        print(
+            f"Predicted {stats['images']} images in {stats['seconds']:.1f} s "
+            f"({stats['images_per_sec']:.1f} images/s, model {stats['model_seconds']:.1f} s), "
+            f"{stats['skipped']} skipped, masks written to {output_dir}."
+        )
+        return stats
+
+
+def main():
+    """Predict the masks of an image folder, a list of images or a metadata split."""
+    parser = argparse.ArgumentParser(description="Predict segmentation masks of images.")
+    parser.add_argument(
+        "--input", type=str, nargs="+", default=[], help="Image directories and/or image paths."
+    )
+    parser.add_argument(
+        "--split",
+        type=str,
+        default=None,
+        help="Predict the images of a metadata.csv split instead, e.g. holding.",
+    )
+    parser.add_argument(
+        "--data_dir", type=str, default=DATA_DIR, help="Directory containing metadata.csv."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="Checkpoint to load, the latest one in CHECKPOINT_DIR by default.",
+    )
+    parser.add_argument(
+        "--output_dir",
+        type=str,
+        default=os.path.join(OUTPUT_DIR, "predictions"),
+        help="Directory for the predicted masks.",
+    )
+    parser.add_argument("--batch_size", type=int, default=BATCH_SIZE, help="Images per batch.")
+    parser.add_argument("--decode_workers", type=int, default=None, help="Decoding threads.")
+    parser.add_argument("--write_workers", type=int, default=2, help="Writing threads.")
+    parser.add_argument(
+        "--queue_batches", type=int, default=2, help="Batches a stage may run ahead."
+    )
+    parser.add_argument(
+        "--tiled",
+        action="store_true",
+        help="Predict images at full resolution in overlapping IMG_SIZE windows.",
+    )
+    parser.add_argument("--overlap", type=float, default=0.25, help="Window overlap of --tiled.")
+
+    args = parser.parse_args()
+
+    if args.split:
+        paths = load_metadata(args.data_dir, split=args.split)["image_path"].tolist()
+    else:
+        paths = list_images(args.input)
+    if not paths:
+        parser.error("No images given, use --input or --split.")
+
+    checkpoint_path = args.checkpoint
+    if checkpoint_path is None:
+        _, latest_checkpoint = get_next_checkpoint_filename(CHECKPOINT_DIR, "lightning_trained")
+        if latest_checkpoint is None:
+            raise FileNotFoundError("No checkpoint file found.")
+        checkpoint_path = os.path.join(CHECKPOINT_DIR, latest_checkpoint)
+    print(f"Loading checkpoint: {checkpoint_path}")
+
+    if COMPILE:
+        enable_compile_cache(COMPILE_CACHE_DIR)
+    _, class_rgb_values = load_class_info(args.data_dir)
+    predictor = Predictor.from_checkpoint(
+        checkpoint_path,
+        model_kwargs={
+            "channels_last": CHANNELS_LAST,
+            "compile_net": COMPILE,
+            # batches are padded to batch_size, so every batch has this shape
+            "compile_shape": (args.batch_size, CHANNELS, *IMG_SIZE),
+        },
+        normalizer=EncoderNormalizer.from_encoder(ENCODER, pretrained=ENCODER_WEIGHTS),
+        class_rgb_values=class_rgb_values,
+        batch_size=args.batch_size,
+        decode_workers=args.decode_workers,
+        write_workers=args.write_workers,
+        queue_batches=args.queue_batches,
+        tiled=args.tiled,
+        overlap=args.overlap,
+    )
+    predictor.run(paths, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Sliding-window inference of images larger than the training size.
+
+Resizing a large image down to IMG_SIZE erases small shapes. Instead, the image is
+cut into overlapping windows of IMG_SIZE, the windows are predicted in full batches
+in row-major order, and their logits are blended with a precomputed separable Hann
+weight map, so window borders, where the network sees the least context, count the
+least.
+
+A window row starting at y only touches image rows [y, y + tile height), and once all
+windows of a row are done no later window touches the rows above the next window row,
+so those rows are final. The logits are therefore accumulated in a rolling buffer as
+wide as the image and one window high, plus a stride for every further window row a
+batch can reach, and the rows finished by a batch are emitted as class indices right
+away. Besides the uint8 input image, memory is classes * buffer height * image width
+floats plus one batch of windows: about 31 MB for a 10000 x 10000 image with two
+classes, 224 px windows and batches of 8, independent of the image height. predict
+collects the rows in an (H, W) uint8 array, 100 MB for that image; pass a memory map
+as out to keep it on disk.
+
+Classes:
+- SlidingWindowPredictor: Tiled inference with a SegmentationModel.
+
+Functions:
+- blend_weights(tile_size): Weight map of the window logits.
+- window_starts(length, tile, stride): Window offsets along one axis.
+"""
+
+from contextlib import nullcontext
+
+import numpy as np
+import torch
+
+from src.config import BATCH_SIZE, DEVICE, IMG_SIZE, PRECISION
+
+
+def blend_weights(tile_size):
+    """
+    Separable Hann weight map of a window, largest in the centre and small but
+    positive at the border, so image borders covered by one window keep a weight.
+
+    Args:
+    - tile_size (tuple): (height, width) of a window.
+
+    Returns:
+    - torch.Tensor: float32 weights of shape (height, width).
+    """
+    height, width = tile_size
+    rows = np.hanning(height + 2)[1:-1]
+    cols = np.hanning(width + 2)[1:-1]
+    return torch.from_numpy(np.outer(rows, cols).astype(np.float32))
+
+
+def window_starts(length, tile, stride):
+    """
+    Offsets of the windows along one axis, the last one flush with the end.
+
+    Args:
+    - length (int): Image size along the axis, at least tile.
+    - tile (int): Window size.
+    - stride (int): Distance between windows.
+
+    Returns:
+    - list: Window offsets.
+    """
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+class SlidingWindowPredictor:
+    """
+    Predict large images window by window with a SegmentationModel.
+
+    Args:
+    - model (SegmentationModel): Trained model, in eval mode.
+    - normalizer (EncoderNormalizer): Encoder normalisation of the model input.
+    - tile_size (tuple): (height, width) of the windows (default: IMG_SIZE).
+    - overlap (float): Fraction of a window shared with its neighbour (default: 0.25).
+    - batch_size (int): Windows per forward pass. Batches run across window rows and
+      only the short last batch of an image is padded, so a compiled model keeps its
+      static shape (default: BATCH_SIZE).
+    - device (str): Device of the model (default: DEVICE).
+    - precision (str): Lightning precision, "bf16-mixed" runs under bfloat16 autocast
+      (default: PRECISION).
+    """
+
+    def __init__(
+        self,
+        model,
+        normalizer,
+        tile_size=IMG_SIZE,
+        overlap=0.25,
+        batch_size=BATCH_SIZE,
+        device=DEVICE,
+        precision=PRECISION,
+    ):
+        if not 0 <= overlap < 1:
+            raise ValueError(f"overlap must be in [0, 1), got {overlap}.")
+        self.model = model
+        self.normalizer = normalizer
+        self.tile_size = tuple(tile_size)
+        self.stride = tuple(max(1, round(size * (1 - overlap))) for size in self.tile_size)
+        self.batch_size = batch_size
+        self.device = torch.device(device)
+        self.bf16 = precision.startswith("bf16")
+        self.weights = blend_weights(self.tile_size).to(self.device)
+
+    def _logits(self, windows):
+        """float32 logits of shape (len(windows), C, tile height, tile width)."""
+        count = len(windows)
+        windows = windows + [windows[-1]] * (self.batch_size - count)
+        batch = torch.from_numpy(np.stack(windows)).to(self.device).permute(0, 3, 1, 2)
+        batch = self.normalizer.normalize_tensor(batch)
+        autocast = (
+            torch.autocast(self.device.type, dtype=torch.bfloat16) if self.bf16 else nullcontext()
+        )
+        with torch.inference_mode(), autocast:
+            logits = self.model(batch)
+        return logits[:count].float()
+
+    def predict_rows(self, image):
+        """
+        Predict an image, emitting the class indices of finished rows as they are done.
+
+        Args:
+        - image (np.ndarray): uint8 image of shape (H, W, 3), may be a memory map.
+
+        Yields:
+        - tuple: (first row, uint8 class indices of shape (rows, W)).
+        """
+        height, width = image.shape[:2]
+        tile_h, tile_w = self.tile_size
+        if height < tile_h or width < tile_w:
+            # images smaller than a window are padded to one window
+            image = np.pad(
+                image,
+                ((0, max(0, tile_h - height)), (0, max(0, tile_w - width)), (0, 0)),
+                mode="edge",
+            )
+        ys = window_starts(image.shape[0], tile_h, self.stride[0])
+        xs = window_starts(image.shape[1], tile_w, self.stride[1])
+
+        count = len(ys) * len(xs)
+        # window rows a batch reaches beyond its first one
+        span = -(-(self.batch_size - 1) // len(xs))
+        logits_sum = None
+        top = 0  # image row of the first buffer row
+        finished = 0  # window rows whose windows are all done
+        for start in range(0, count, self.batch_size):
+            batch = [
+                (ys[index // len(xs)], xs[index % len(xs)])
+                for index in range(start, min(start + self.batch_size, count))
+            ]
+            windows = [np.ascontiguousarray(image[y:y + tile_h, x:x + tile_w]) for y, x in batch]
+            logits = self._logits(windows)
+            if logits_sum is None:
+                logits_sum = torch.zeros(
+                    logits.shape[1],
+                    tile_h + span * self.stride[0],
+                    image.shape[1],
+                    device=self.device,
+                )
+            for (y, x), window_logits in zip(batch, logits):
+                logits_sum[:, y - top:y - top + tile_h, x:x + tile_w] += (
+                    window_logits * self.weights
+                )
+
+            done = (start + len(batch)) // len(xs)
+            if done == finished:
+                continue
+            finished = done
+            end = ys[finished] if finished < len(ys) else image.shape[0]
+            rows = min(end, height) - top
+            if rows > 0:
+                # the weight sum of a pixel is the same for every class, so the argmax
+                # of the weighted logit sum is that of the blended logits
+                classes = logits_sum[:, :rows, :width].argmax(0)
+                yield top, classes.to(torch.uint8).cpu().numpy()
+
+            # roll the buffer down to the first unfinished window row
+            shift = end - top
+            logits_sum[:, :logits_sum.shape[1] - shift] = logits_sum[:, shift:].clone()
+            logits_sum[:, logits_sum.shape[1] - shift:] = 0
+            top = end
+
+    def predict(self, image, out=None):
+        """
+        Predict the class indices of a whole image.
+
+        Args:
+        - image (np.ndarray): uint8 image of shape (H, W, 3).
+        - out (np.ndarray): Optional uint8 array of shape (H, W) to write the classes
+          to, e.g. a np.lib.format.open_memmap for images whose classes do not fit in
+          memory. A new array is allocated when None (default: None).
+
+        Returns:
+        - np.ndarray: uint8 class indices of shape (H, W), out if given.
+        """
+        classes = np.empty(image.shape[:2], dtype=np.uint8) if out is None else out
+        for y, rows in self.predict_rows(image):
+            classes[y:y + len(rows)] = rows
+        return classes
+
+
+def main():
+    print("Sliding-window predictor is ready to use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,15 +14,31 @@ PyTorch Lightning Segmentation Model for training, validation, and testing.
 
 This module defines a segmentation model using segmentation_models_pytorch, incorporating metrics
 such as IoU score, F1 score, accuracy, and recall for evaluation during training, validation, and testing.
+
+The network returns raw logits and the loss works on them directly. The activation is
+applied only where probabilities are needed: predict_proba and predict_step apply it.
+The metrics count the argmax class of the logits, the class the CrossEntropyLoss
+trains for, so training and evaluation never compute it.
+
+With compile_net the network runs through torch.compile for training, validation and
+inference. Graphs are compiled for one fixed input shape, compile_shape, usually
+(BATCH_SIZE, CHANNELS, *IMG_SIZE); inputs of any other shape, like the ragged last
+batch of an epoch, run eagerly instead of triggering a recompilation. While fitting,
+the first compilation waits for a training batch, so it is the graph of the training
+step (with gradients) that is compiled and timed, not that of the sanity check.
 """
 
+import time
+
 import pytorch_lightning as pl
+from pytorch_lightning.trainer.states import TrainerFn
 import segmentation_models_pytorch as smp
+from segmentation_models_pytorch.base.modules import Activation
 
 import torch
 from torch import nn
 
-from src.utils.metrics import compute_metrics, log_metrics_and_loss
+from src.utils.metrics import ConfusionMatrixState, log_metrics_and_loss
 
 
 class SegmentationModel(pl.LightningModule):
@@ -33,22 +49,73 @@ class SegmentationModel(pl.LightningModule):
     - net (torch.nn.Module): Segmentation network model.
     - loss (torch.nn.Module): Loss function for training.
     - lr (float): Learning rate for optimizer.
+    - activation (str): Activation turning the logits of net into probabilities, any
+      name smp accepts; "softmax2d" matches a CrossEntropyLoss. None for a net that
+      applies its own activation, like the ones of older checkpoints (default: None).
+    - channels_last (bool): Keep the network weights and inputs in channels_last (NHWC)
+      memory format, which the CPU convolution kernels (oneDNN) run faster, especially
+      under bfloat16 autocast (default: False).
+    - compile_net (bool): Run the network through torch.compile with static shapes
+      (default: False). Call enable_compile_cache first to keep the compiled graphs
+      across runs.
+    - compile_shape (tuple): (batch, channels, height, width) of the inputs that run
+      compiled, required with compile_net (default: None).
+    - compile_benchmark_steps (int): Forward passes timed eagerly and compiled on the
+      first compiled batch, logged as eager/compiled samples per second; 0 disables
+      (default: 3).
+    - metric_every_n_steps (int): Add every Nth training batch to the training metrics,
+      validation and test use every batch (default: 1).
+    - num_classes (int): Number of output classes of net, None to take it from its last
+      convolution (default: None).
 
     Methods:
     - forward(x): Forward pass through the network.
-    - shared_step(preds, labels): Calculates segmentation metrics (IoU, F1, accuracy, recall).
+    - predict_proba(x): Forward pass followed by the activation.
+    - shared_step(preds, labels, phase): Adds a batch to the metric counts of a phase.
     - training_step(batch, batch_idx): Defines the training step.
     - validation_step(batch, batch_idx): Defines the validation step.
     - test_step(batch, batch_idx): Defines the test step.
     - configure_optimizers(): Configures the optimizer for training.
     """
 
-    def __init__(self, net, loss, lr):
+    def __init__(
+        self,
+        net,
+        loss,
+        lr,
+        activation=None,
+        channels_last=False,
+        compile_net=False,
+        compile_shape=None,
+        compile_benchmark_steps=3,
+        metric_every_n_steps=1,
+        num_classes=None,
+    ):
         super().__init__()
         self.save_hyperparameters()
         self.lr = lr
         self.loss = loss
-        self.net = net
+        self.activation = Activation(activation)
+        self.channels_last = channels_last
+        self.net = net.to(memory_format=torch.channels_last) if channels_last else net
+        self.compile_benchmark_steps = compile_benchmark_steps
+        # a compiled function rather than a module, so the weights and the state_dict
+        # keys stay those of self.net
+        self._compiled_forward = (
+            torch.compile(self.net.forward, dynamic=False) if compile_net else None
+        )
+        if compile_net and compile_shape is None:
+            raise ValueError("compile_net requires compile_shape, e.g. (8, 3, 224, 224).")
+        self.compile_shape = tuple(compile_shape) if compile_shape is not None else None
+        self._compiled = False
+        self.metric_every_n_steps = metric_every_n_steps
+        if num_classes is None:
+            # output channels of the last convolution, the segmentation head of smp nets
+            convs = [module for module in net.modules() if isinstance(module, nn.Conv2d)]
+            num_classes = convs[-1].out_channels
+        self.metric_states = {
+            phase: ConfusionMatrixState(num_classes) for phase in ("train", "valid", "test")
+        }
 
     def forward(self, x):
         """
@@ -60,22 +127,112 @@ class SegmentationModel(pl.LightningModule):
         Returns:
         - torch.Tensor: Output tensor from the network.
         """
-        return self.net(x)
-
-    def shared_step(self, preds, labels):
+        if not torch.is_autocast_enabled(x.device.type):
+            # float16 inputs (INPUT_DTYPE) only halve the host memory and the transfer;
+            # outside autocast the convolutions need the dtype of the weights
+            x = x.to(next(self.net.parameters()).dtype)
+        if self.channels_last:
+            # no copy when the data module already delivers channels_last batches
+            x = x.contiguous(memory_format=torch.channels_last)
+        if self._compiled_forward is None or tuple(x.shape) != self.compile_shape:
+            # other shapes, like ragged batches, run eagerly instead of compiling
+            # another static graph
+            return self.net(x)
+        if not self._compiled:
+            fitting = self._trainer is not None and self.trainer.state.fn == TrainerFn.FITTING
+            if fitting and not torch.is_grad_enabled():
+                # the sanity check and validation before the first training step
+                return self.net(x)
+            self._compiled = True
+            start = time.perf_counter()
+            preds = self._compiled_forward(x)
+            warmup_sec = time.perf_counter() - start
+            print(f"Compiled the network for input shape {tuple(x.shape)} in {warmup_sec:.1f} s.")
+            self._log_compile_stats({"compile_warmup_sec": warmup_sec}, x)
+            return preds
+        return self._compiled_forward(x)
+
+    def predict_proba(self, x):
         """
-        Calculates segmentation metrics (IoU, F1, accuracy, recall).
+        Forward pass followed by the activation.
 
         Args:
-        - preds (torch.Tensor): Predictions from the network.
-        - labels (torch.Tensor): Ground truth labels.
+        - x (torch.Tensor): Input tensor.
 
         Returns:
-        - dict: Dictionary containing computed metrics.
+        - torch.Tensor: Class probabilities.
+        """
+        return self.activation(self(x))
+
+    def _log_compile_stats(self, stats, x):
+        """
+        Time eager and compiled inference on the first compiled batch and log the
+        throughput of both, together with stats.
+
+        Args:
+        - stats (dict): Further values to log.
+        - x (torch.Tensor): Input batch.
+        """
+        if self.compile_benchmark_steps:
+            was_training = self.net.training
+            # eval mode, so the timing passes leave the batch norm statistics alone
+            self.net.eval()
+            with torch.no_grad():
+                for path, fn in (("compiled", self._compiled_forward), ("eager", self.net)):
+                    fn(x)
+                    start = time.perf_counter()
+                    for _ in range(self.compile_benchmark_steps):
+                        fn(x)
+                    if x.is_cuda:
+                        torch.cuda.synchronize()
+                    seconds = time.perf_counter() - start
+                    stats[f"{path}_samples_per_sec"] = (
+                        self.compile_benchmark_steps * len(x) / seconds
+                    )
+            self.net.train(was_training)
+            stats["compile_speedup"] = (
+                stats["compiled_samples_per_sec"] / stats["eager_samples_per_sec"]
+            )
+            print(
+                f"Inference throughput: {stats['eager_samples_per_sec']:.1f} samples/s eager, "
+                f"{stats['compiled_samples_per_sec']:.1f} samples/s compiled "
+                f"({stats['compile_speedup']:.2f}x)."
+            )
+        if self._trainer is not None and not self.trainer.predicting:
+            self.log_dict(stats, on_step=True, on_epoch=False)
+
+    def shared_step(self, preds, labels, phase):
+        """
+        Adds a batch to the tp/fp/fn/tn counts of a phase, from which the segmentation
+        metrics (IoU, F1, accuracy, recall) are computed at epoch end.
+
+        Args:
+        - preds (torch.Tensor): Logits from the network, counted by their argmax class.
+        - labels (torch.Tensor): Ground truth labels, one-hot (B, C, H, W) or class
+          indices (B, H, W).
+        - phase (str): Phase of the model ('train', 'valid', or 'test').
+        """
+
+        self.metric_states[phase].update(preds, labels)
+
+    def log_epoch_metrics(self, phase):
         """
+        Computes the metrics of a phase from the counts of the epoch, summed over all
+        processes with one all-reduce, logs them and resets the counts.
 
-        metrics_dict = compute_metrics(preds, labels)
-        return metrics_dict
+        Args:
+        - phase (str): Phase of the model ('train', 'valid', or 'test').
+        """
+        state = self.metric_states[phase]
+        # called on every process, also those without batches in this epoch, which
+        # join the all-reduce with zero counts
+        metrics = state.compute(
+            lambda counts: self.trainer.strategy.reduce(counts, reduce_op="sum"),
+            device=self.device,
+        )
+        state.reset()
+        for name, value in metrics.items():
+            self.log(f"{phase}_{name}", value)
 
     def training_step(self, batch, batch_idx):
         """
@@ -89,7 +246,9 @@ class SegmentationModel(pl.LightningModule):
         - torch.Tensor: Loss tensor for the batch.
         """
 
-        return log_metrics_and_loss(self, batch, "train")
+        return log_metrics_and_loss(
+            self, batch, "train", batch_idx % self.metric_every_n_steps == 0
+        )
 
     def validation_step(self, batch, batch_idx):
         """
@@ -113,6 +272,30 @@ class SegmentationModel(pl.LightningModule):
 
         log_metrics_and_loss(self, batch, "test")
 
+    def predict_step(self, batch, batch_idx):
+        """
+        Defines the prediction step.
+
+        Args:
+        - batch (tuple or torch.Tensor): Batch of input images, optionally with labels.
+        - batch_idx (int): Index of the batch.
+
+        Returns:
+        - torch.Tensor: Class probabilities for the batch.
+        """
+
+        imgs = batch[0] if isinstance(batch, (tuple, list)) else batch
+        return self.predict_proba(imgs)
+
+    def on_train_epoch_end(self):
+        self.log_epoch_metrics("train")
+
+    def on_validation_epoch_end(self):
+        self.log_epoch_metrics("valid")
+
+    def on_test_epoch_end(self):
+        self.log_epoch_metrics("test")
+
     def configure_optimizers(self):
         """
         Configures the optimizer for training.
@@ -13,14 +13,15 @@
 Utilized UNet++ model using segmentation_models_pytorch library.
 
 This script defines a function to create a UNet++ model for semantic segmentation.
-It utilizes configurations imported from src.config module.
+It utilizes configurations imported from src.config module. The network has no final
+activation and returns raw logits: the loss works on logits, and ACTIVATION is applied
+by SegmentationModel only where probabilities are needed (inference).
 
 Attributes:
 - ENCODER (str): Name of the encoder backbone.
 - ENCODER_WEIGHTS (str): Type of weights to use for encoder initialization.
 - CHANNELS (int): Number of input channels.
 - CLASSES (int): Number of output classes.
-- ACTIVATION (str): Activation function to use for the final layer.
 
 Functions:
 - create_unet_model(): Creates and returns a UNet++ model using the specified configurations.
@@ -28,7 +29,7 @@ Functions:
 """
 
 import segmentation_models_pytorch as smp
-from src.config import ENCODER, ENCODER_WEIGHTS, CHANNELS, CLASSES, ACTIVATION
+from src.config import ENCODER, ENCODER_WEIGHTS, CHANNELS, CLASSES
 
 
 def create_unet_model():
@@ -36,14 +37,14 @@ def create_unet_model():
     Create UNet++ model based on the imported configurations.
 
     Returns:
-    - torch.nn.Module: UNet++ model instance.
+    - torch.nn.Module: UNet++ model instance returning logits.
     """
     net = smp.UnetPlusPlus(
         encoder_name=ENCODER,
         encoder_weights=ENCODER_WEIGHTS,
         in_channels=CHANNELS,
         classes=CLASSES,
-        activation=ACTIVATION,
+        activation=None,
     )
     return net
 
@@ -20,11 +20,11 @@ This script:
 
 Imports:
 - os: Provides functionalities for interacting with the operating system.
-- segmentation_models_pytorch as smp: Imports the segmentation model library.
 - torch.nn: Imports neural network modules from PyTorch.
 - pytorch_lightning as pl: Imports PyTorch Lightning for training and testing.
 - src.models.unet_model.create_unet_model: Imports function to create a UNet model.
 - src.models.segmentation_model.SegmentationModel: Imports SegmentationModel class for loading checkpoints.
+- src.data.normalization.EncoderNormalizer: Imports the lookup-table encoder input normalisation.
 - src.data.datamodule.ISNDataModule: Imports data module for preparing dataset.
 - src.data.data_preprocessing: Imports functions for loading metadata and class information.
 - src.config: Imports configuration variables for the experiment.
@@ -43,27 +43,43 @@ Exceptions:
 
 import os
 
-import segmentation_models_pytorch as smp
 from torch import nn
 
 import pytorch_lightning as pl
 from src.models.unet_model import create_unet_model
 from src.models.segmentation_model import SegmentationModel
 from src.data.datamodule import ISNDataModule
-from src.data.data_preprocessing import load_metadata, split_data, load_class_info
+from src.data.normalization import EncoderNormalizer
+from src.data.integrity import load_verdicts
+from src.data.data_preprocessing import (
+    load_metadata,
+    load_packed_metadata,
+    split_data,
+    load_class_info,
+)
 from src.config import *
+from src.constants import IGNORE_INDEX
 from src.utils.checkpoint_utils import get_next_checkpoint_filename
+from src.utils.compile_cache import enable_compile_cache
 
 
 def test():
-    metadata_df = load_metadata(DATA_DIR)
-    FOO, BAR, test_df = split_data(metadata_df)
+    if DATA_BACKEND == "procedural":
+        # samples are generated on the fly, there is no metadata to split
+        FOO = BAR = test_df = None
+    elif DATA_BACKEND == "packed" and PACKED_SPLIT:
+        metadata_df = load_packed_metadata(PACKED_DIR, PACKED_SPLIT)
+        FOO, BAR, test_df = split_data(metadata_df, FOLD)
+    else:
+        metadata_df = load_metadata(DATA_DIR, IMG_SIZE)
+        FOO, BAR, test_df = split_data(metadata_df, FOLD)
     class_names, class_rgb_values = load_class_info(DATA_DIR)
 
     net = create_unet_model()
-    loss = nn.CrossEntropyLoss()
-    preprocess_input = smp.encoders.get_preprocessing_fn(
-        ENCODER, pretrained=ENCODER_WEIGHTS
+    # ignore_index only applies to class index targets, -100 is the torch default
+    loss = nn.CrossEntropyLoss(ignore_index=IGNORE_INDEX if MASK_MODE == "index" else -100)
+    preprocess_input = EncoderNormalizer.from_encoder(
+        ENCODER, pretrained=ENCODER_WEIGHTS, dtype=INPUT_DTYPE
     )
     isn_data = ISNDataModule(
         train_df=FOO,
@@ -73,6 +89,19 @@ def test():
         img_size=IMG_SIZE,
         preprocess_fn=preprocess_input,
         class_rgb_values=class_rgb_values,
+        backend=DATA_BACKEND,
+        packed_dir=PACKED_DIR,
+        shard_dir=SHARD_DIR,
+        mask_mode=MASK_MODE,
+        cache_bytes=CACHE_BYTES,
+        batch_transforms=BATCH_TRANSFORMS,
+        bitmasks=BITMASKS,
+        autotune=LOADER_AUTOTUNE,
+        tuning_file=LOADER_TUNING_FILE,
+        procedural_samples=PROCEDURAL_SAMPLES,
+        procedural_seed=PROCEDURAL_SEED,
+        channels_last=CHANNELS_LAST,
+        verdicts=load_verdicts(DATA_DIR) if EXCLUDE_INVALID else None,
     )
 
     # segmodel = SegmentationModel.load_from_checkpoint(checkpoint_path=checkpoint_path)
@@ -87,6 +116,8 @@ def test():
     # else:
     #     raise FileNotFoundError("No checkpoint file found.")
 
+    if COMPILE:
+        enable_compile_cache(COMPILE_CACHE_DIR)
     next_checkpoint, latest_checkpoint = get_next_checkpoint_filename(
         CHECKPOINT_DIR, "lightning_trained"
     )
@@ -95,7 +126,11 @@ def test():
         checkpoint_path = os.path.join(CHECKPOINT_DIR, latest_checkpoint)
         print(f"Loading checkpoint: {checkpoint_path}")
         segmodel = SegmentationModel.load_from_checkpoint(
-            checkpoint_path=checkpoint_path
+            checkpoint_path=checkpoint_path,
+            channels_last=CHANNELS_LAST,
+            compile_net=COMPILE,
+            compile_shape=(BATCH_SIZE, CHANNELS, *IMG_SIZE),
+            compile_benchmark_steps=COMPILE_BENCHMARK_STEPS,
         )
     else:
         raise FileNotFoundError("No checkpoint file found.")
@@ -104,12 +139,16 @@ def test():
     if os.path.exists(next_checkpoint_path):
         print(f"Loading next checkpoint: {next_checkpoint_path}")
         segmodel = SegmentationModel.load_from_checkpoint(
-            checkpoint_path=next_checkpoint_path
+            checkpoint_path=next_checkpoint_path,
+            channels_last=CHANNELS_LAST,
+            compile_net=COMPILE,
+            compile_shape=(BATCH_SIZE, CHANNELS, *IMG_SIZE),
+            compile_benchmark_steps=COMPILE_BENCHMARK_STEPS,
         )
     else:
         print(f"Next checkpoint not found. Falling back to: {checkpoint_path}")
 
-    trainer = pl.Trainer(accelerator=DEVICE, devices=NUM_DEVICES)
+    trainer = pl.Trainer(accelerator=DEVICE, devices=NUM_DEVICES, precision=PRECISION)
     trainer.test(segmodel, datamodule=isn_data)
 
 
@@ -23,10 +23,10 @@ Imports:
 - pytorch_lightning as pl: Imports PyTorch Lightning for training and callbacks.
 - pytorch_lightning.callbacks: Imports EarlyStopping and ModelCheckpoint callbacks.
 - pytorch_lightning.loggers: Imports CSVLogger for logging training metrics.
-- segmentation_models_pytorch as smp: Imports the segmentation model library.
 - torch.nn: Imports neural network modules from PyTorch.
 - src.models.unet_model.create_unet_model: Imports function to create a UNet model.
 - src.models.segmentation_model.SegmentationModel: Imports SegmentationModel class for training.
+- src.data.normalization.EncoderNormalizer: Imports the lookup-table encoder input normalisation.
 - src.data.datamodule.ISNDataModule: Imports data module for preparing datasets.
 - src.data.data_preprocessing: Imports functions for loading metadata and class information.
 - src.config: Imports configuration variables for the experiment.
@@ -48,24 +48,41 @@ import os
 import pytorch_lightning as pl
 from pytorch_lightning.callbacks import EarlyStopping, ModelCheckpoint
 from pytorch_lightning.loggers import CSVLogger
-import segmentation_models_pytorch as smp
 from torch import nn
 
 from src.models.unet_model import create_unet_model
 from src.models.segmentation_model import SegmentationModel
 from src.data.datamodule import ISNDataModule
-from src.data.data_preprocessing import load_metadata, split_data, load_class_info
+from src.data.normalization import EncoderNormalizer
+from src.data.integrity import load_verdicts
+from src.data.shard_dataset import ShardEpochCallback
+from src.data.data_preprocessing import (
+    load_metadata,
+    load_packed_metadata,
+    split_data,
+    load_class_info,
+)
 from src.config import *
+from src.constants import IGNORE_INDEX
 from src.utils.checkpoint_utils import get_next_checkpoint_filename_train
+from src.utils.compile_cache import enable_compile_cache
 
 
 def train():
-    metadata_df = load_metadata(DATA_DIR)
-    train_df, valid_df, test_df = split_data(metadata_df)
+    if DATA_BACKEND == "procedural":
+        # samples are generated on the fly, there is no metadata to split
+        train_df = valid_df = test_df = None
+    elif DATA_BACKEND == "packed" and PACKED_SPLIT:
+        metadata_df = load_packed_metadata(PACKED_DIR, PACKED_SPLIT)
+        train_df, valid_df, test_df = split_data(metadata_df, FOLD)
+    else:
+        metadata_df = load_metadata(DATA_DIR, IMG_SIZE)
+        train_df, valid_df, test_df = split_data(metadata_df, FOLD)
     class_names, class_rgb_values = load_class_info(DATA_DIR)
 
     net = create_unet_model()
-    loss = nn.CrossEntropyLoss()
+    # ignore_index only applies to class index targets, -100 is the torch default
+    loss = nn.CrossEntropyLoss(ignore_index=IGNORE_INDEX if MASK_MODE == "index" else -100)
 
     early_stop_callback = EarlyStopping(
         monitor="valid_loss", min_delta=0.00001, patience=5, mode="min"
@@ -88,13 +105,27 @@ def train():
         accelerator=DEVICE,
         devices=NUM_DEVICES,
         max_epochs=EPOCHS,
-        callbacks=[early_stop_callback, checkpoint_callback],
+        precision=PRECISION,
+        callbacks=[early_stop_callback, checkpoint_callback, ShardEpochCallback()],
         logger=logger,
     )
 
-    segmodel = SegmentationModel(net, loss, LR)
-    preprocess_input = smp.encoders.get_preprocessing_fn(
-        ENCODER, pretrained=ENCODER_WEIGHTS
+    if COMPILE:
+        enable_compile_cache(COMPILE_CACHE_DIR)
+    segmodel = SegmentationModel(
+        net,
+        loss,
+        LR,
+        activation=ACTIVATION,
+        channels_last=CHANNELS_LAST,
+        compile_net=COMPILE,
+        compile_shape=(BATCH_SIZE, CHANNELS, *IMG_SIZE),
+        compile_benchmark_steps=COMPILE_BENCHMARK_STEPS,
+        metric_every_n_steps=METRIC_EVERY_N_STEPS,
+        num_classes=CLASSES,
+    )
+    preprocess_input = EncoderNormalizer.from_encoder(
+        ENCODER, pretrained=ENCODER_WEIGHTS, dtype=INPUT_DTYPE
     )
     isn_data = ISNDataModule(
         train_df,
@@ -104,6 +135,19 @@ def train():
         IMG_SIZE,
         preprocess_input,
         class_rgb_values,
+        backend=DATA_BACKEND,
+        packed_dir=PACKED_DIR,
+        shard_dir=SHARD_DIR,
+        mask_mode=MASK_MODE,
+        cache_bytes=CACHE_BYTES,
+        batch_transforms=BATCH_TRANSFORMS,
+        bitmasks=BITMASKS,
+        autotune=LOADER_AUTOTUNE,
+        tuning_file=LOADER_TUNING_FILE,
+        procedural_samples=PROCEDURAL_SAMPLES,
+        procedural_seed=PROCEDURAL_SEED,
+        channels_last=CHANNELS_LAST,
+        verdicts=load_verdicts(DATA_DIR) if EXCLUDE_INVALID else None,
     )
 
     # checkpoint_file = os.path.join(CHECKPOINT_DIR, "lightning_trained-v1.ckpt")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ----------------------------------------------------------------------------
+# Created By   : Tashin Ahmed
+# Created Date : "18/10/2026"
+# email        : tashinahmed.contact@gmail.com
+# copyright    : MIT License Copyright (c) 2024 Tashin Ahmed
+# version      : "0.0.1"
+# status       : "PoC"
+# ----------------------------------------------------------------------------
+
+"""
+Persistent cache of torch.compile output.
+
+Most of the torch.compile warm-up is Inductor lowering the traced graphs and
+compiling the generated kernels. Inductor can store both on disk (the FX graph
+cache and its kernel cache), but by default under /tmp, which does not survive a
+reboot or a new container. enable_compile_cache points it to a directory of the
+project, so repeated run_training.py/run_evaluation.py runs of the same model,
+input shape and torch version load the compiled graphs instead of rebuilding them.
+Dynamo still traces the model in every process; only the much slower compilation
+is skipped.
+
+Functions:
+- enable_compile_cache(cache_dir): Keep the Inductor caches in cache_dir.
+"""
+
+import os
+
+import torch._inductor.config as inductor_config
+
+
+def enable_compile_cache(cache_dir):
+    """
+    Keep the Inductor graph and kernel caches in cache_dir. Must run before the first
+    compiled call.
+
+    Args:
+    - cache_dir (str): Directory of the cache, created if missing.
+
+    Returns:
+    - str: Absolute path of the cache directory.
+    """
+    cache_dir = os.path.abspath(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ["TORCHINDUCTOR_CACHE_DIR"] = cache_dir
+    os.environ["TRITON_CACHE_DIR"] = os.path.join(cache_dir, "triton")
+    inductor_config.fx_graph_cache = True
+    inductor_config.autotune_local_cache = True
+    return cache_dir
+
+
+def main():
+    print("Compile cache utilities are ready to use.")
+
+
+if __name__ == "__main__":
+    main()
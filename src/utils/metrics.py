@@ -18,13 +18,28 @@ This script contains a utility function to compute segmentation metrics:
 3. Accuracy
 4. Recall
 
-The metrics are computed using segmentation_models_pytorch library functions.
+The metrics are computed using segmentation_models_pytorch library functions. The
+predicted class of a pixel is the argmax over the channels, as for the CrossEntropyLoss
+the network is trained with, so logits and probabilities give the same counts. IoU, F1
+and recall are computed per class and averaged over the classes, accuracy is the
+fraction of correctly predicted pixels, and the IoU of every class is reported too.
+
+During training, validation and testing the metrics are not computed per batch: a
+ConfusionMatrixState per phase accumulates the per-class tp/fp/fn/tn counts of every
+batch in place and the metrics are computed from the counts once per epoch, after a
+single all-reduce of the counts in multi-process training.
 
 Imports:
 - segmentation_models_pytorch as smp: Importing the library for segmentation metrics.
 
+Classes:
+- ConfusionMatrixState: Streaming tp/fp/fn/tn counts of one phase.
+
 Functions:
+- one_hot_targets(labels, num_classes): Expands a batch of class index masks to one-hot masks.
+- one_hot_predictions(preds): One-hot masks of the predicted (argmax) classes.
 - compute_metrics(preds, labels): Computes segmentation metrics given predicted and ground truth labels.
+- log_metrics_and_loss(model, batch, phase, update_metrics): Logs the loss and accumulates the metric counts.
 - main(): Entry point of the script, prints a message indicating that metrics utilities are ready.
 
 Usage:
@@ -36,6 +51,42 @@ Exceptions:
 """
 
 import segmentation_models_pytorch as smp
+import torch
+import torch.nn.functional as F
+
+from src.constants import IGNORE_INDEX
+
+
+def one_hot_targets(labels, num_classes):
+    """
+    Expand a batch of class index masks to one-hot masks.
+
+    Args:
+    - labels (torch.Tensor): Class index masks of shape (B, H, W).
+    - num_classes (int): Number of classes.
+
+    Returns:
+    - torch.Tensor: One-hot masks of shape (B, C, H, W), all zero where labels
+      hold IGNORE_INDEX.
+    """
+    labels = labels.long()
+    valid = labels != IGNORE_INDEX
+    one_hot = F.one_hot(labels.where(valid, 0), num_classes) * valid.unsqueeze(-1)
+    return one_hot.permute(0, 3, 1, 2)
+
+
+def one_hot_predictions(preds):
+    """
+    One-hot masks of the predicted classes, the argmax over the channels.
+
+    Args:
+    - preds (torch.Tensor): Logits or probabilities of shape (B, C, H, W).
+
+    Returns:
+    - torch.Tensor: bool masks of shape (B, C, H, W), one channel set per pixel.
+    """
+    classes = torch.arange(preds.shape[1], device=preds.device)
+    return preds.argmax(1, keepdim=True) == classes.view(1, -1, *([1] * (preds.ndim - 2)))
 
 
 def compute_metrics(preds, labels):
@@ -43,50 +94,154 @@ def compute_metrics(preds, labels):
     Compute segmentation metrics (IOU score, F1 score, accuracy, recall).
 
     Args:
-    - preds (np.ndarray): Predicted segmentation mask of shape (B, H, W).
-    - labels (np.ndarray): Ground truth segmentation mask of shape (B, H, W).
+    - preds (torch.Tensor): Logits or probabilities of shape (B, C, H, W).
+    - labels (torch.Tensor): Ground truth segmentation mask, either one-hot of shape
+      (B, C, H, W) or class indices of shape (B, H, W).
 
     Returns:
-    - dict: Dictionary containing computed metrics:
-    - "iou_score" (float): IOU score.
-    - "f1_score" (float): F1 score.
-    - "accuracy" (float): Accuracy.
-    - "recall" (float): Recall.
+    - dict: Dictionary containing computed metrics, see ConfusionMatrixState.compute:
+    - "iou_score" (float): IOU score, mean over the classes.
+    - "f1_score" (float): F1 score, mean over the classes.
+    - "accuracy" (float): Pixel accuracy.
+    - "recall" (float): Recall, mean over the classes.
+    - "iou_score_{c}" (float): IOU score of class c.
     """
-    tp, fp, fn, tn = smp.metrics.get_stats(
-        preds, labels.long(), mode="binary", threshold=0.5
-    )
-    metrics = {
-        "iou_score": smp.metrics.iou_score(tp, fp, fn, tn, reduction="micro"),
-        "f1_score": smp.metrics.f1_score(tp, fp, fn, tn, reduction="micro"),
-        "accuracy": smp.metrics.accuracy(tp, fp, fn, tn, reduction="macro"),
-        "recall": smp.metrics.recall(tp, fp, fn, tn, reduction="micro-imagewise"),
-    }
-    return metrics
-
-
-def log_metrics_and_loss(model, batch, phase):
+    state = ConfusionMatrixState(preds.shape[1])
+    state.update(preds, labels)
+    return state.compute()
+
+
+class ConfusionMatrixState:
     """
-    Log metrics and loss for a given phase (train, valid, test).
+    Per-class tp/fp/fn/tn counts of one phase, accumulated batch by batch.
+
+    Every pixel is predicted as its argmax class and counted per class, one class
+    against the rest (smp.metrics.get_stats in multiclass mode), pixels labelled
+    IGNORE_INDEX not at all. As every wrong pixel is a false positive of one class and
+    a false negative of another, counts summed over the classes (micro averaging) would
+    make F1, recall and accuracy the same number, so the metrics are per class and
+    averaged over the classes instead. They are computed from the counts of the whole
+    epoch at once, instead of an average of per-batch values. All counts live in one
+    float64 tensor on the device of the predictions, so they are updated without a host
+    sync and reduced across processes with a single all-reduce.
+
+    Attributes:
+    - num_classes (int): Number of classes, None to take it from the first update.
+    - counts (torch.Tensor): [tp (C), fp (C), fn (C), tn (C)], None before the first
+      update.
+
+    Args:
+    - num_classes (int): Number of classes. Needed to reduce across processes, where a
+      process that saw no batch still takes part in the all-reduce with zero counts
+      (default: None).
+    """
+
+    def __init__(self, num_classes=None):
+        self.num_classes = num_classes
+        self.counts = None
+
+    @torch.no_grad()
+    def update(self, preds, labels):
+        """
+        Add the counts of a batch.
+
+        Args:
+        - preds (torch.Tensor): Logits or probabilities of shape (B, C, H, W).
+        - labels (torch.Tensor): Ground truth segmentation mask, either one-hot of shape
+          (B, C, H, W) or class indices of shape (B, H, W).
+        """
+        num_classes = preds.shape[1]
+        spatial = (0,) + tuple(range(2, preds.ndim))
+        if labels.ndim == preds.ndim - 1:
+            # compared per class instead of expanded to one-hot, IGNORE_INDEX matches none
+            classes = torch.arange(num_classes, device=labels.device)
+            target = labels.unsqueeze(1) == classes.view(1, -1, *([1] * (preds.ndim - 2)))
+            valid = (labels != IGNORE_INDEX).unsqueeze(1)
+        else:
+            target = labels.bool()
+            # all-zero one-hot pixels are ignored
+            valid = target.any(1, keepdim=True)
+        positive = one_hot_predictions(preds) & valid
+        tp = (positive & target).sum(spatial)
+        fp = positive.sum(spatial) - tp
+        fn = target.sum(spatial) - tp
+        tn = valid.sum() - tp - fp - fn
+        batch_counts = torch.cat([tp, fp, fn, tn]).double()
+        if self.counts is None:
+            self.counts = batch_counts
+        else:
+            self.counts += batch_counts
+
+    def compute(self, reduce_fn=None, device=None):
+        """
+        Compute the metrics of everything added since the last reset.
+
+        With reduce_fn, every process must call compute, also those that added nothing:
+        they contribute zero counts, so no process is left waiting in the all-reduce.
+
+        Args:
+        - reduce_fn (callable): Sums the counts over processes, e.g. the strategy's
+          reduce; None for a single process.
+        - device (torch.device): Device of the zero counts of a process that added
+          nothing (default: None, the CPU).
+
+        Returns:
+        - dict: 0-dim tensors "iou_score", "f1_score" and "recall", the means over the
+          classes of the per-class values, "accuracy", the fraction of correctly
+          predicted pixels, and "iou_score_{c}" per class c; empty if nothing was added
+          (by any process).
+        """
+        counts = self.counts
+        if counts is None:
+            if reduce_fn is None:
+                return {}
+            if self.num_classes is None:
+                raise ValueError("Reducing counts needs num_classes when nothing was added.")
+            counts = torch.zeros(4 * self.num_classes, dtype=torch.float64, device=device)
+        if reduce_fn is not None:
+            counts = reduce_fn(counts)
+        if not counts.any():
+            # no process added a batch
+            return {}
+        tp, fp, fn, tn = counts.long().view(4, 1, -1)
+        class_iou = smp.metrics.iou_score(tp, fp, fn, tn, reduction="none")[0]
+        metrics = {
+            "iou_score": smp.metrics.iou_score(tp, fp, fn, tn, reduction="macro"),
+            "f1_score": smp.metrics.f1_score(tp, fp, fn, tn, reduction="macro"),
+            "accuracy": (tp.sum() / (tp + fn).sum().clamp(min=1)).float(),
+            "recall": smp.metrics.recall(tp, fp, fn, tn, reduction="macro"),
+        }
+        for class_index, iou in enumerate(class_iou):
+            metrics[f"iou_score_{class_index}"] = iou
+        return metrics
+
+    def reset(self):
+        """Drop the accumulated counts."""
+        self.counts = None
+
+
+def log_metrics_and_loss(model, batch, phase, update_metrics=True):
+    """
+    Log the loss for a given phase (train, valid, test) and add the batch to the
+    phase's metric counts, which are logged at epoch end.
 
     Args:
     - model (SegmentationModel): Instance of the segmentation model.
     - batch (tuple): Batch of input images and labels.
     - phase (str): Phase of the model ('train', 'valid', or 'test').
+    - update_metrics (bool): Add the batch to the metric counts (default: True).
 
     Returns:
     - torch.Tensor: Loss for the given batch.
     """
     imgs, labels = batch
+    # logits, the metrics only need their argmax
     preds = model(imgs)
-    metrics = model.shared_step(preds, labels)
-
-    model.log(f"{phase}_iou_score", metrics["iou_score"], on_epoch=True)
-    model.log(f"{phase}_f1_score", metrics["f1_score"], on_epoch=True)
-    model.log(f"{phase}_accuracy", metrics["accuracy"], on_epoch=True)
-    model.log(f"{phase}_recall", metrics["recall"], on_epoch=True)
+    if update_metrics:
+        model.shared_step(preds, labels, phase)
 
-    loss = model.loss(preds, labels)
+    # class index masks go to the loss as-is, one-hot masks stay float
+    loss = model.loss(preds, labels.long() if labels.ndim == preds.ndim - 1 else labels)
     model.log(f"{phase}_loss", loss)
 
     return loss
@@ -0,0 +1,62 @@
+import torch
+
+from src.constants import IGNORE_INDEX
+from src.utils.metrics import ConfusionMatrixState, compute_metrics, one_hot_targets
+
+
+def _background_only():
+    """10 foreground pixels of 100, all predicted as background."""
+    labels = torch.zeros(1, 10, 10, dtype=torch.long)
+    labels[0, 0] = 1
+    logits = torch.zeros(1, 2, 10, 10)
+    logits[:, 0] = 1.0
+    return logits, labels
+
+
+def test_metrics_are_per_class():
+    logits, labels = _background_only()
+    metrics = compute_metrics(logits, labels)
+    assert torch.isclose(metrics["accuracy"], torch.tensor(0.9))
+    assert torch.isclose(metrics["recall"], torch.tensor(0.5))
+    assert torch.isclose(metrics["f1_score"], torch.tensor(0.9 / 1.9))
+    assert torch.isclose(metrics["iou_score"], torch.tensor(0.45))
+    assert metrics["iou_score_1"] == 0
+    assert not torch.isclose(metrics["accuracy"], metrics["f1_score"])
+
+
+def test_logit_shift_and_label_format_do_not_change_metrics():
+    torch.manual_seed(0)
+    logits = torch.randn(2, 3, 8, 8)
+    labels = torch.randint(0, 3, (2, 8, 8))
+    labels[:, 0] = IGNORE_INDEX
+    metrics = compute_metrics(logits, labels)
+    for other in (
+        compute_metrics(logits + 5.0, labels),
+        compute_metrics(logits, one_hot_targets(labels, 3).float()),
+    ):
+        assert all(torch.isclose(metrics[name], other[name]) for name in metrics)
+
+
+def test_streaming_counts_match_compute_metrics():
+    torch.manual_seed(0)
+    logits = torch.randn(4, 2, 8, 8)
+    labels = torch.randint(0, 2, (4, 8, 8))
+    state = ConfusionMatrixState()
+    for start in range(0, 4, 2):
+        state.update(logits[start:start + 2], labels[start:start + 2])
+    streamed = state.compute()
+    metrics = compute_metrics(logits, labels)
+    assert all(torch.isclose(streamed[name], metrics[name]) for name in metrics)
+
+
+def test_empty_state_joins_the_reduction():
+    reduced = []
+
+    def reduce_fn(counts):
+        reduced.append(counts.clone())
+        return counts + 1
+
+    metrics = ConfusionMatrixState(num_classes=2).compute(reduce_fn)
+    assert len(reduced) == 1 and reduced[0].shape == (8,) and not reduced[0].any()
+    assert "iou_score" in metrics
+    assert ConfusionMatrixState(num_classes=2).compute(lambda counts: counts) == {}